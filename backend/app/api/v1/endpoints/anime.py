@@ -1,5 +1,5 @@
 
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional, Tuple
 import math
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -7,16 +7,35 @@ from sqlalchemy import func, select
 from uuid import UUID
 
 from app.api import deps
-from app.crud.crud_anime import anime as crud_anime
+from app.crud.crud_anime import anime as crud_anime, CATALOG_TAG, FACETS_TAG, decode_cursor
 from app.crud.crud_episode import episode as crud_episode
-from app.schemas.anime import Anime, AnimeCreate, AnimeUpdate
+from app.schemas.anime import Anime, AnimeCreate, AnimeUpdate, AnimeDetail, AnimeFacets, AnimeSuggestion
 from app.schemas.episode import Episode
 from app.schemas.common import DataResponse, PaginatedResponse, ResponseMeta
 from app.core.cache import cache
+from app.services.suggest_service import suggest_service
 from app.models.anime import Anime as AnimeModel
 
 router = APIRouter()
 
+async def _catalog_total(
+    db: AsyncSession, mode: str, *, search: Optional[str] = None, **filters
+) -> Tuple[Optional[int], Optional[bool]]:
+    """Resolve ``total`` for a catalog page: exact, estimated or skipped."""
+    if mode == "none":
+        return None, None
+    if mode == "exact":
+        return await crud_anime.count_filtered(db, search=search, **filters), False
+    if not search and not any(v is not None for v in filters.values()):
+        return await crud_anime.estimate_total(db), True
+
+    # Filtered estimate: exact count shared across pages, cached longer than pages
+    async def count():
+        return await crud_anime.count_filtered(db, search=search, **filters)
+    key = "catalog:count:" + ":".join(f"{k}={v}" for k, v in sorted(filters.items())) + f":{search}"
+    tags = crud_anime.list_cache_tags((), search=search, **filters)
+    return await cache.get_or_set(key, count, expire=600, tags=tags), True
+
 @router.get("/", response_model=PaginatedResponse[Anime])
 async def read_anime_list(
     db: AsyncSession = Depends(deps.get_db),
@@ -28,39 +47,53 @@ async def read_anime_list(
     year: Optional[int] = None,
     min_score: Optional[float] = None,
     q: Optional[str] = None,
+    cursor: Optional[str] = Query(
+        None, description="Keyset pagination cursor from meta.next_cursor; pass it empty for the first page"
+    ),
+    count: Optional[Literal["exact", "estimate", "none"]] = Query(
+        None, description="How to compute meta.total (default: exact for pages, estimate for cursors)"
+    ),
 ) -> Any:
-    # Check Cache
-    cache_key = f"catalog:{page}:{limit}:{kind}:{status}:{genre}:{year}:{min_score}:{q}"
-    cached_data = await cache.get(cache_key)
-    if cached_data:
-        return cached_data
-
-    skip = (page - 1) * limit
-    items, total = await crud_anime.get_multi_paginated(
-        db, 
-        skip=skip, 
-        limit=limit,
-        kind=kind,
-        status=status,
-        genre=genre,
-        year=year,
-        min_score=min_score,
-        search=q
+    filters = dict(kind=kind, status=status, genre=genre, year=year, min_score=min_score)
+    if cursor is not None:
+        if q:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported for search queries")
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    count = count or ("exact" if cursor is None else "estimate")
+    cache_key = f"catalog:{page}:{limit}:{kind}:{status}:{genre}:{year}:{min_score}:{q}:{cursor}:{count}"
+
+    async def load_page():
+        next_cursor = None
+        if cursor is not None:
+            items, next_cursor = await crud_anime.get_multi_keyset(db, after=after, limit=limit, **filters)
+        else:
+            items, _ = await crud_anime.get_multi_paginated(
+                db, skip=(page - 1) * limit, limit=limit, search=q, with_total=False, **filters
+            )
+        total, estimated = await _catalog_total(db, count, search=q, **filters)
+        return {
+            "data": [Anime.model_validate(i) for i in items],
+            "meta": ResponseMeta(
+                page=page if cursor is None else None,
+                per_page=limit,
+                total=total,
+                total_pages=math.ceil(total / limit) if total is not None else None,
+                next_cursor=next_cursor,
+                estimated=estimated
+            )
+        }
+
+    # Cached for 5 minutes; concurrent misses share one query
+    return await cache.get_or_set(
+        cache_key,
+        load_page,
+        expire=300,
+        tags=crud_anime.list_cache_tags((), genre=genre, search=q, kind=kind, status=status, year=year),
+        tags_from=lambda result: crud_anime.list_cache_tags(result["data"])
     )
-    
-    result = {
-        "data": items,
-        "meta": ResponseMeta(
-            page=page,
-            per_page=limit,
-            total=total,
-            total_pages=math.ceil(total / limit) if total > 0 else 0
-        )
-    }
-
-    # Store in Cache (5 minutes)
-    await cache.set(cache_key, result, expire=300)
-    return result
 
 @router.get("/genres", response_model=List[str])
 async def get_unique_genres(
@@ -71,22 +104,56 @@ async def get_unique_genres(
     result = await db.execute(query)
     return [row[0] for row in result.all()]
 
-@router.get("/{slug}", response_model=DataResponse[Anime])
+@router.get("/suggest", response_model=List[AnimeSuggestion])
+async def suggest_anime(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncSession = Depends(deps.get_db),
+) -> Any:
+    """Prefix autocomplete for the search box, served from the Redis prefix index."""
+    return await suggest_service.suggest(db, q, limit=limit)
+
+@router.get("/facets", response_model=DataResponse[AnimeFacets])
+async def read_anime_facets(
+    db: AsyncSession = Depends(deps.get_db),
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+    genre: Optional[str] = None,
+    year: Optional[int] = None,
+    min_score: Optional[float] = None,
+    q: Optional[str] = None,
+) -> Any:
+    """Genre, kind, status and year counts for the current catalog filters."""
+    filters = dict(kind=kind, status=status, genre=genre, year=year, min_score=min_score)
+
+    async def load_facets():
+        return {"data": await crud_anime.get_facets(db, search=q, **filters)}
+
+    cache_key = f"catalog:facets:{kind}:{status}:{genre}:{year}:{min_score}:{q}"
+    tags = crud_anime.list_cache_tags((), search=q, **filters) + [FACETS_TAG]
+    return await cache.get_or_set(cache_key, load_facets, expire=600, tags=tags)
+
+@router.get("/{slug}", response_model=DataResponse[AnimeDetail])
 async def read_anime(
     slug: str,
     db: AsyncSession = Depends(deps.get_db),
+    include_episodes: bool = False,
 ) -> Any:
-    anime = await crud_anime.get_by_slug(db, slug=slug)
+    anime = await crud_anime.get_by_slug(db, slug=slug, with_episodes=include_episodes)
     if not anime:
         try:
             uuid_obj = UUID(slug)
-            anime = await crud_anime.get(db, id=uuid_obj)
+            anime = await crud_anime.get(db, id=uuid_obj, with_episodes=include_episodes)
         except ValueError:
             pass
             
     if not anime:
         raise HTTPException(status_code=404, detail="Anime not found")
-    return {"data": anime}
+
+    data = Anime.model_validate(anime).model_dump()
+    if include_episodes:
+        data["episodes"] = sorted(anime.episodes, key=lambda e: (e.season, e.episode))
+    return {"data": data}
 
 @router.get("/{id}/episodes", response_model=List[Episode])
 async def read_anime_episodes(
@@ -112,7 +179,8 @@ async def create_anime(
         raise HTTPException(status_code=400, detail="Anime with this slug already exists")
     
     anime = await crud_anime.create(db, obj_in=anime_in)
-    await cache.clear_prefix("catalog")
+    await cache.invalidate(CATALOG_TAG)
+    await suggest_service.index(anime)
     
     return {"data": anime}
 
@@ -128,8 +196,10 @@ async def update_anime(
     if not anime:
         raise HTTPException(status_code=404, detail="Anime not found")
     
+    stale_tags = crud_anime.invalidation_tags(anime, anime_in.model_dump(exclude_unset=True))
     anime = await crud_anime.update(db, db_obj=anime, obj_in=anime_in)
-    await cache.clear_prefix("catalog")
+    await cache.invalidate(*stale_tags)
+    await suggest_service.index(anime)
     
     return {"data": anime}
 
@@ -144,4 +214,5 @@ async def delete_anime(
         raise HTTPException(status_code=404, detail="Anime not found")
     
     await crud_anime.delete(db, id=id)
-    await cache.clear_prefix("catalog")
+    await cache.invalidate(CATALOG_TAG)
+    await suggest_service.remove(id)
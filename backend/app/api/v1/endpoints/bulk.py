@@ -1,7 +1,7 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete, update
+from sqlalchemy import delete, update, select
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -11,6 +11,8 @@ from app.models.episode import Episode
 from app.models.release import Release
 from app.core.logging import logger
 from app.core.cache import cache
+from app.services.suggest_service import suggest_service
+from app.crud.crud_anime import CATALOG_TAG, FACETS_TAG, anime_tag, filter_tag
 
 router = APIRouter()
 
@@ -33,15 +35,22 @@ async def bulk_anime_ops(
         stmt = delete(Anime).where(Anime.id.in_(request.ids))
         result = await db.execute(stmt)
         await db.commit()
-        await cache.clear_prefix("catalog")
+        await cache.invalidate(CATALOG_TAG)
+        await suggest_service.remove(*request.ids)
         logger.info("Bulk Op: Anime Registry Purge", count=result.rowcount, actor=u.id)
         return {"processed": result.rowcount, "cache": "invalidated"}
     
     if request.action == 'update_status' and request.new_status:
+        prev = await db.execute(select(Anime.status).where(Anime.id.in_(request.ids)).distinct())
+        statuses = set(prev.scalars().all()) | {request.new_status}
         stmt = update(Anime).where(Anime.id.in_(request.ids)).values(status=request.new_status)
         result = await db.execute(stmt)
         await db.commit()
-        await cache.clear_prefix("catalog")
+        await cache.invalidate(
+            FACETS_TAG,
+            *(anime_tag(i) for i in request.ids),
+            *(filter_tag("status", s) for s in statuses)
+        )
         return {"processed": result.rowcount}
 
     raise HTTPException(status_code=400, detail="Unsupported bulk action or missing metadata")
@@ -9,7 +9,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
 from app.core.config import settings
 from app.core.celery_app import celery_app
+from app.core.cache import cache
 from app.core.logging import logger
+from app.core.pubsub import notification_hub, job_progress_hub
+from app.services.audit_service import audit_service
 
 router = APIRouter()
 
@@ -59,8 +62,10 @@ async def get_detailed_health(
         "timestamp": time.time(),
         "services": {
             "database": {"status": db_status, "latency_ms": round(db_latency, 2)},
-            "cache": {"status": "online"},
-            "worker": {"status": worker_status, "count": active_workers}
+            "cache": {"status": "online" if cache.redis else "offline", "tiers": cache.get_stats()},
+            "push": {"notifications": notification_hub.get_stats(), "job_progress": job_progress_hub.get_stats()},
+            "worker": {"status": worker_status, "count": active_workers},
+            "audit_writer": audit_service.get_stats()
         },
         "resources": {
             "cpu_percent": cpu_usage,
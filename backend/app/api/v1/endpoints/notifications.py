@@ -1,15 +1,21 @@
 
+import json
+import asyncio
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 from app.api import deps
+from app.core.pubsub import notification_hub, notification_channel, HubUnavailable
 from app.crud.crud_notification import notification as crud_notification
 from app.schemas.notification import Notification
 
 router = APIRouter()
 
+SSE_HEARTBEAT_SECONDS = 15
+
 @router.get("/", response_model=List[Notification])
 async def read_notifications(
     db: AsyncSession = Depends(deps.get_db),
@@ -24,6 +30,45 @@ async def read_notifications(
         db, user_id=current_user.id, skip=skip, limit=limit
     )
 
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Server-sent events with new notifications and the unread count.
+    Starts with the current count; the polling endpoints remain as fallback.
+    """
+    unread = await crud_notification.get_unread_count(db, user_id=current_user.id)
+    # Don't hold a pooled DB connection for the life of the stream
+    await db.close()
+    channel = notification_channel(current_user.id)
+
+    try:
+        queue = notification_hub.subscribe(channel)
+    except HubUnavailable:
+        raise HTTPException(status_code=503, detail="Notification stream unavailable")
+
+    async def events():
+        try:
+            yield f"event: unread\ndata: {json.dumps({'unread': unread})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: notification\ndata: {data}\n\n"
+        finally:
+            notification_hub.unsubscribe(channel, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/unread-count", response_model=int)
 async def get_unread_count(
     db: AsyncSession = Depends(deps.get_db),
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from uuid import UUID
-from redis.asyncio import Redis
+from app.core.pubsub import job_progress_hub, HubUnavailable
 import Levenshtein
 from datetime import datetime
 
@@ -19,9 +19,15 @@ from app.crud.crud_parser import (
     parser_job_log as crud_parser_logs
 )
 from app.crud.crud_anime import anime as crud_anime
+from app.core.cache import cache
+from app.core.logging import logger
+from app.core.celery_app import job_snapshot_key
+from app.core.throttling import upstream
+from app.services.suggest_service import suggest_service
 from app.models.parser import ParserConflict, ParserJobLog
 from app.schemas.parser import (
     ParserJob, 
+    ParserJobProgress,
     ResolveConflictRequest,
     SearchQuery,
     FetchFullQuery,
@@ -33,6 +39,7 @@ from app.schemas.parser import (
 from app.tasks.parsers import run_full_sync_task, run_incremental_sync_task, run_release_updates_task
 from app.services.parsers.shikimori import ShikimoriParserService
 from app.services.parsers.kodik import KodikParserService
+from app.services.parsers.control import job_control, ControlUnavailable
 
 router = APIRouter()
 
@@ -129,6 +136,22 @@ async def read_parser_job(
     if not job: raise HTTPException(status_code=404)
     return job
 
+@router.get("/jobs/{id}/progress", response_model=ParserJobProgress)
+async def read_job_progress(
+    id: UUID,
+    u = Depends(deps.get_current_active_superuser)
+) -> Any:
+    """Latest progress snapshot from Redis, without opening a telemetry socket."""
+    snapshot = await cache.redis.hgetall(job_snapshot_key(str(id))) if cache.redis else None
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="No progress reported for this job")
+    return {
+        "job_id": id,
+        "progress": int(snapshot[b"progress"]),
+        "stats": json.loads(snapshot[b"stats"]),
+        "updated_at": datetime.utcfromtimestamp(int(snapshot[b"updated_at"]))
+    }
+
 @router.get("/jobs/{id}/logs", response_model=List[ParserJobLogSchema])
 async def read_job_logs(
     id: UUID,
@@ -168,7 +191,10 @@ async def resolve_conflict(
     if req.strategy == "replace":
         anime = await crud_anime.get(db, id=conflict.item_id)
         if anime:
-            await crud_anime.update(db, db_obj=anime, obj_in=conflict.incoming_data)
+            stale_tags = crud_anime.invalidation_tags(anime, conflict.incoming_data)
+            anime = await crud_anime.update(db, db_obj=anime, obj_in=conflict.incoming_data)
+            await cache.invalidate(*stale_tags)
+            await suggest_service.index(anime)
     
     await crud_conflicts.update(db, db_obj=conflict, obj_in={
         "status": "resolved",
@@ -194,8 +220,8 @@ async def search_live_orchestrator(query: SearchQuery, u = Depends(deps.get_curr
     shiki = ShikimoriParserService()
     kodik = KodikParserService()
     try:
-        s_task = shiki.client.get('/api/animes', params={'search': query.query, 'limit': 15})
-        k_task = kodik.client.get('/search', params={'token': kodik.api_key, 'title': query.query, 'types': 'anime-serial,anime'})
+        s_task = upstream.request(shiki.client, 'GET', '/api/animes', params={'search': query.query, 'limit': 15})
+        k_task = upstream.request(kodik.client, 'GET', '/search', params={'token': kodik.api_key, 'title': query.query, 'types': 'anime-serial,anime'})
         s_res, k_res = await asyncio.gather(s_task, k_task)
         merged_data = merge_search_results(k_res.json().get('results', []), s_res.json())
         return {"data": merged_data}
@@ -220,29 +246,88 @@ async def fetch_full_node(query: FetchFullQuery, u = Depends(deps.get_current_ac
     finally:
         await asyncio.gather(shiki.close(), kodik.close())
 
+def _dispatch_job(job) -> None:
+    if job.parser_name == "shikimori":
+        if job.job_type == "full_sync": run_full_sync_task.delay(str(job.id))
+        else: run_incremental_sync_task.delay(str(job.id))
+    elif job.parser_name == "kodik":
+        run_release_updates_task.delay(str(job.id))
+
 @router.post("/jobs/trigger")
 async def trigger_manual_job(job_in: ParserJobCreate, db: AsyncSession = Depends(deps.get_db), u = Depends(deps.get_current_active_superuser)):
     job = await crud_jobs.create(db, obj_in=job_in)
-    if job_in.parser_name == "shikimori":
-        if job_in.job_type == "full_sync": run_full_sync_task.delay(str(job.id))
-        else: run_incremental_sync_task.delay(str(job.id))
-    elif job_in.parser_name == "kodik":
-        run_release_updates_task.delay(str(job.id))
+    _dispatch_job(job)
     return {"job_id": job.id, "status": "dispatched"}
 
+async def _get_job_or_404(db: AsyncSession, id: UUID):
+    job = await crud_jobs.get(db, id=id)
+    if not job: raise HTTPException(status_code=404)
+    return job
+
+async def _request_control(id: UUID, action: str):
+    try:
+        await job_control.request(str(id), action)
+    except ControlUnavailable:
+        raise HTTPException(status_code=503, detail="Job control is unavailable")
+
+@router.post("/jobs/{id}/cancel")
+async def cancel_parser_job(id: UUID, db: AsyncSession = Depends(deps.get_db), u = Depends(deps.get_current_active_superuser)):
+    """Cancel a job; a running sync stops between items and keeps what it committed."""
+    job = await _get_job_or_404(db, id)
+    if job.status in ("completed", "failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    if job.status == "running":
+        await _request_control(id, "cancel")
+        return {"job_id": id, "status": "cancelling"}
+    # Not running: settle it here; a queued task sees the status and exits
+    await crud_jobs.update(db, db_obj=job, obj_in={"status": "cancelled", "completed_at": datetime.utcnow()})
+    return {"job_id": id, "status": "cancelled"}
+
+@router.post("/jobs/{id}/pause")
+async def pause_parser_job(id: UUID, db: AsyncSession = Depends(deps.get_db), u = Depends(deps.get_current_active_superuser)):
+    """Pause a running sync at its next checkpoint-safe point."""
+    job = await _get_job_or_404(db, id)
+    if job.status != "running" or job.parser_name != "shikimori":
+        raise HTTPException(status_code=409, detail="Only running sync jobs can be paused")
+    await _request_control(id, "pause")
+    return {"job_id": id, "status": "pausing"}
+
+@router.post("/jobs/{id}/resume")
+async def resume_parser_job(id: UUID, db: AsyncSession = Depends(deps.get_db), u = Depends(deps.get_current_active_superuser)):
+    """Re-dispatch a paused or failed job; it continues from its checkpoint."""
+    job = await _get_job_or_404(db, id)
+    if job.status not in ("paused", "failed"):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, not paused or failed")
+    await job_control.clear(str(id))
+    await crud_jobs.update(db, db_obj=job, obj_in={"status": "pending", "error_message": None})
+    _dispatch_job(job)
+    return {"job_id": id, "status": "dispatched", "checkpoint": job.checkpoint}
+
 @router.websocket("/ws/jobs/{job_id}")
 async def job_telemetry_ws(websocket: WebSocket, job_id: str):
     await websocket.accept()
-    redis = Redis.from_url(str(settings.REDIS_URL))
-    pubsub = redis.pubsub()
-    await pubsub.subscribe(f"job_progress:{job_id}")
+    channel = f"job_progress:{job_id}"
+    try:
+        queue = job_progress_hub.subscribe(channel)
+    except HubUnavailable:
+        await websocket.close(code=1013)
+        return
+
+    async def forward():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    # Updates are pushed as they arrive; the receive loop only detects disconnects
+    sender = asyncio.create_task(forward())
     try:
         while True:
-            message = await pubsub.get_message(ignore_subscribe_status=True, timeout=1.0)
-            if message and message['type'] == 'message':
-                await websocket.send_text(message['data'].decode('utf-8'))
-            await asyncio.sleep(0.5)
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        await pubsub.unsubscribe(f"job_progress:{job_id}")
+        pass
     finally:
-        await redis.close()
+        sender.cancel()
+        job_progress_hub.unsubscribe(channel, queue)
+        # A send that failed before the disconnect would otherwise go unreported
+        result, = await asyncio.gather(sender, return_exceptions=True)
+        if isinstance(result, Exception):
+            logger.warning("Job telemetry sender failed", job_id=job_id, error=str(result))
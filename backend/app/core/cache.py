@@ -1,67 +1,476 @@
 import json
+import math
+import time
+import uuid
+import random
+import asyncio
 import functools
-from typing import Any, Optional, Union
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from datetime import timedelta
 from redis.asyncio import Redis
 from app.core.config import settings
+from app.core.codecs import CacheSerializer, CodecError
 from app.core.logging import logger
 
+# Tag version counters outlive any entry that references them.
+TAG_KEY_PREFIX = "cache:tag:"
+TAG_VERSION_TTL = int(timedelta(days=7).total_seconds())
+
+# Every worker listens here to drop L1 entries made stale by another worker.
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Cross-worker recompute lock, released only by the holder of the token.
+LOCK_KEY_PREFIX = "cache:lock:"
+LOCK_POLL_INTERVAL = 0.05
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class FlightAborted(Exception):
+    """The coroutine computing a value for waiters was cancelled."""
+
+class LocalCache:
+    """
+    Bounded in-process LRU with per-entry TTL (the L1 tier).
+
+    Values are shared by reference, callers must treat them as read-only.
+    ``generation`` moves on every invalidation so a reader can tell whether
+    a value fetched from Redis may have gone stale while it was in flight.
+    """
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._data: "OrderedDict[str, Tuple[float, Any, FrozenSet[str]]]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl: Optional[int] = None):
+        if self.max_entries <= 0:
+            return
+        self._remove(key)
+        tag_set = frozenset(tags)
+        self._data[key] = (time.monotonic() + min(ttl or self.ttl, self.ttl), value, tag_set)
+        for tag in tag_set:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries:
+            self._remove(next(iter(self._data)))
+
+    def discard(self, *keys: str):
+        self.generation += 1
+        for key in keys:
+            self._remove(key)
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        for tag in tags:
+            for key in list(self._by_tag.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+        self._by_tag.clear()
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
 class CacheService:
+    """
+    Two-tier cache: a per-worker LRU (L1) in front of Redis (L2).
+
+    Each Redis entry records the version of every tag it depends on
+    (``catalog``, ``anime:<id>``, ``genre:<name>`` ...). Invalidating a tag is
+    a single INCR, after which every entry that recorded the old version reads
+    as a miss and simply expires on its own TTL. The same invalidation is
+    published on ``INVALIDATION_CHANNEL`` so every worker drops its L1 copies.
+
+    ``get_or_set`` adds stampede protection: concurrent misses on one key share
+    a single computation (per process, and across workers through a short
+    Redis lock), entries are refreshed probabilistically ahead of expiry and
+    may be served stale for a grace window while one caller recomputes.
+    """
     def __init__(self):
         self.redis: Optional[Redis] = None
         self.enabled = settings.API_ENV != "test"
+        self.serializer = CacheSerializer(
+            codec=settings.CACHE_CODEC,
+            compression=settings.CACHE_COMPRESSION,
+            compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES
+        )
+        self.local = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_TTL_SECONDS)
+        self.local_enabled = False
+        self.node_id = uuid.uuid4().hex
+        self.counters = {
+            "l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0,
+            "coalesced": 0, "lock_waits": 0, "early_refreshes": 0, "stale_served": 0,
+        }
+        self._listener: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
 
-    async def connect(self):
+    async def connect(self, listen: bool = True):
+        """
+        Open the Redis client. With ``listen`` the L1 tier is enabled and kept
+        coherent through pub/sub; short-lived processes (Celery tasks) skip it.
+        """
         if not self.redis:
             try:
-                self.redis = Redis.from_url(str(settings.REDIS_URL), decode_responses=True)
+                self.redis = Redis.from_url(str(settings.REDIS_URL))
                 logger.info("Connected to Redis cache cluster")
             except Exception as e:
                 logger.error(f"Failed to connect to Redis: {e}")
                 self.enabled = False
+                return
+        if listen and self.enabled and not self._listener:
+            self._listener = asyncio.create_task(self._listen())
+            self.local_enabled = True
 
     async def disconnect(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.local_enabled = False
+        self.local.clear()
         if self.redis:
             await self.redis.close()
             self.redis = None
 
-    async def get(self, key: str) -> Optional[Any]:
-        if not self.enabled or not self.redis:
-            return None
+    async def _listen(self):
+        """Apply invalidations published by other workers to the local tier."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were not subscribed is lost.
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event.get("node") == self.node_id:
+                        continue
+                    self.local.invalidate(*event.get("tags", []))
+                    self.local.discard(*event.get("keys", []))
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                self.local.clear()
+                await pubsub.close()
+                await asyncio.sleep(1)
+
+    async def _publish(self, **event):
+        await self.redis.publish(INVALIDATION_CHANNEL, json.dumps({"node": self.node_id, **event}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "l1_enabled": self.local_enabled,
+            "l1_entries": len(self.local),
+            "l1_max_entries": self.local.max_entries,
+            "serialization": self.serializer.get_stats(),
+        }
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{TAG_KEY_PREFIX}{tag}"
+
+    async def _tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = sorted(set(tags))
+        if not tags:
+            return {}
+        values = await self.redis.mget([self._tag_key(t) for t in tags])
+        return {tag: int(v or 0) for tag, v in zip(tags, values)}
+
+    async def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the live entry for ``key`` from L1 or Redis, validating its tags."""
+        if self.local_enabled:
+            hit, entry = self.local.get(key)
+            if hit:
+                self.counters["l1_hits"] += 1
+                return entry
+            self.counters["l1_misses"] += 1
+
+        generation = self.local.generation
         try:
             data = await self.redis.get(key)
-            return json.loads(data) if data else None
+            entry = self.serializer.loads(data) if data else None
+            if not isinstance(entry, dict) or "value" not in entry:
+                self.counters["l2_misses"] += 1
+                return None
+            recorded = entry.get("tags") or {}
+            if recorded:
+                current = await self._tag_versions(recorded.keys())
+                if any(current[t] != v for t, v in recorded.items()):
+                    self.counters["l2_misses"] += 1
+                    return None
+            self.counters["l2_hits"] += 1
+        except CodecError:
+            # Written by an older format: treat as a miss and let it be overwritten.
+            self.counters["l2_misses"] += 1
+            return None
         except Exception as e:
             logger.error(f"Cache get error: {e}")
             return None
 
-    async def set(self, key: str, value: Any, expire: int = 3600):
+        # Skip the L1 fill if an invalidation landed while Redis was answering.
+        if self.local_enabled and generation == self.local.generation:
+            ttl = max(int(entry.get("expires", 0) - time.time()), 1) if "expires" in entry else None
+            self.local.set(key, entry, tags=recorded.keys(), ttl=ttl)
+        return entry
+
+    async def _store(
+        self,
+        key: str,
+        value: Any,
+        expire: int,
+        versions: Dict[str, int],
+        generation: int,
+        delta: float = 0.0,
+        grace: int = 0
+    ):
+        """
+        Write ``value`` to Redis and L1. ``generation`` is the L1 generation
+        seen before ``value`` and ``versions`` were read; if an invalidation
+        has landed since, only Redis is written (its tag versions catch it).
+        """
+        entry = {"tags": versions, "value": value, "expires": time.time() + expire, "delta": delta}
+        try:
+            data = self.serializer.dumps(entry)
+        except Exception as e:
+            logger.error(f"Cache serialization error: {e}", key=key)
+            return
+        if self.local_enabled and generation == self.local.generation:
+            self.local.set(key, entry, tags=versions.keys(), ttl=expire)
+        try:
+            await self.redis.set(key, data, ex=expire + grace)
+        except Exception as e:
+            logger.error(f"Cache set error: {e}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled or not self.redis:
+            return None
+        entry = await self._read(key)
+        if entry is None or entry.get("expires", math.inf) < time.time():
+            return None
+        return entry["value"]
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        expire: int = 3600,
+        tags: Optional[Iterable[str]] = None
+    ):
         if not self.enabled or not self.redis:
             return
+        generation = self.local.generation
         try:
-            await self.redis.set(key, json.dumps(value), ex=expire)
+            versions = await self._tag_versions(tags or ())
         except Exception as e:
             logger.error(f"Cache set error: {e}")
+            return
+        await self._store(key, value, expire, versions, generation)
+
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        expire: int = 300,
+        tags: Optional[Iterable[str]] = None,
+        tags_from: Optional[Callable[[Any], Iterable[str]]] = None,
+        beta: float = 1.0
+    ) -> Any:
+        """
+        Read-through cache with stampede protection.
+
+        ``tags`` are known up front and their versions are captured before
+        ``factory`` runs, so an invalidation racing the computation is never
+        masked. ``tags_from`` derives extra tags from the computed value.
+        """
+        if not self.enabled or not self.redis:
+            return await factory()
+
+        entry = await self._read(key)
+        if entry is not None:
+            remaining = entry.get("expires", math.inf) - time.time()
+            # XFetch: the closer to expiry and the costlier the value, the likelier an early refresh.
+            early = entry.get("delta", 0.0) * beta * -math.log(1.0 - random.random())
+            if remaining > early:
+                return entry["value"]
+            if key in self._inflight:
+                self.counters["stale_served"] += 1
+                return entry["value"]
+            stale = entry["value"]
+            return await self._flight(key, lambda: self._refresh(key, factory, expire, tags, tags_from, stale))
+
+        return await self._flight(key, lambda: self._fill(key, factory, expire, tags, tags_from))
+
+    async def _flight(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` once per key per process; concurrent callers await its result."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except FlightAborted:
+                return await self._flight(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(FlightAborted())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+            if future.done():
+                future.exception()  # mark retrieved, waiters are optional
+
+    async def _compute(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        expire: int,
+        tags: Optional[Iterable[str]],
+        tags_from: Optional[Callable[[Any], Iterable[str]]]
+    ) -> Any:
+        generation = self.local.generation
+        try:
+            versions = await self._tag_versions(tags or ())
+        except Exception as e:
+            logger.error(f"Cache get error: {e}")
+            return await factory()
+        started = time.monotonic()
+        value = await factory()
+        delta = time.monotonic() - started
+        if tags_from:
+            try:
+                extra = [t for t in tags_from(value) if t not in versions]
+                versions.update(await self._tag_versions(extra))
+            except Exception as e:
+                logger.error(f"Cache set error: {e}")
+                return value
+        await self._store(key, value, expire, versions, generation, delta=delta, grace=settings.CACHE_STALE_TTL_SECONDS)
+        return value
+
+    async def _refresh(self, key, factory, expire, tags, tags_from, stale: Any) -> Any:
+        """Recompute a live-but-due entry if no other worker is already doing so."""
+        token = await self._acquire_lock(key)
+        if token is None:
+            self.counters["stale_served"] += 1
+            return stale
+        self.counters["early_refreshes"] += 1
+        try:
+            return await self._compute(key, factory, expire, tags, tags_from)
+        finally:
+            await self._release_lock(key, token)
+
+    async def _fill(self, key, factory, expire, tags, tags_from) -> Any:
+        """Compute a missing entry, or wait for the worker that holds the lock."""
+        token = await self._acquire_lock(key)
+        if token is None:
+            self.counters["lock_waits"] += 1
+            deadline = time.monotonic() + settings.CACHE_LOCK_TTL_MS / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                entry = await self._read(key)
+                if entry is not None:
+                    return entry["value"]
+            # The holder died or is too slow: compute anyway rather than fail.
+            return await self._compute(key, factory, expire, tags, tags_from)
+        try:
+            return await self._compute(key, factory, expire, tags, tags_from)
+        finally:
+            await self._release_lock(key, token)
+
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(
+                f"{LOCK_KEY_PREFIX}{key}", token, nx=True, px=settings.CACHE_LOCK_TTL_MS
+            )
+        except Exception as e:
+            logger.error(f"Cache lock error: {e}")
+            return token  # Redis trouble: behave as if uncontended
+        return token if acquired else None
+
+    async def _release_lock(self, key: str, token: str):
+        try:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, f"{LOCK_KEY_PREFIX}{key}", token)
+        except Exception as e:
+            logger.error(f"Cache lock error: {e}")
 
     async def delete(self, key: str):
         if not self.enabled or not self.redis:
             return
+        self.local.discard(key)
         await self.redis.delete(key)
+        await self._publish(keys=[key])
 
-    async def clear_prefix(self, prefix: str):
-        if not self.enabled or not self.redis:
+    async def invalidate(self, *tags: str):
+        """Bump the version of each tag, orphaning every entry that depends on it."""
+        if not self.enabled or not self.redis or not tags:
             return
-        keys = await self.redis.keys(f"{prefix}*")
-        if keys:
-            await self.redis.delete(*keys)
+        tags = sorted(set(tags))
+        self.local.invalidate(*tags)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(self._tag_key(tag))
+                    pipe.expire(self._tag_key(tag), TAG_VERSION_TTL)
+                await pipe.execute()
+            await self._publish(tags=tags)
+        except Exception as e:
+            logger.error(f"Cache invalidate error: {e}")
 
 cache = CacheService()
 
-def cached(prefix: str, expire: int = 300):
+def cached(prefix: str, expire: int = 300, tags: Optional[List[str]] = None):
     """
     Decorator for caching FastAPI endpoint results.
     Key is generated from prefix + function arguments.
+    Entries are invalidated through ``tags`` (defaults to the prefix itself).
     """
+    entry_tags = tags if tags is not None else [prefix]
+
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
@@ -72,13 +481,9 @@ def cached(prefix: str, expire: int = 300):
             # Generate unique key from arguments (filtering out non-serializable like db session)
             cache_args = {k: v for k, v in kwargs.items() if not k.endswith('db') and not k.startswith('current_user')}
             key = f"{prefix}:{json.dumps(cache_args, sort_keys=True)}"
-            
-            cached_val = await cache.get(key)
-            if cached_val is not None:
-                return cached_val
-            
-            result = await func(*args, **kwargs)
-            await cache.set(key, result, expire=expire)
-            return result
+
+            return await cache.get_or_set(
+                key, lambda: func(*args, **kwargs), expire=expire, tags=entry_tags
+            )
         return wrapper
     return decorator
@@ -1,8 +1,12 @@
 from celery import Celery
 from celery.schedules import crontab
+import asyncio
 import json
+import time
+from typing import Any, Dict, Optional, Tuple
 from redis.asyncio import Redis
 from app.core.config import settings
+from app.core.logging import logger
 
 celery_app = Celery(
     "worker",
@@ -32,20 +36,153 @@ celery_app.conf.update(
             "task": "system.scheduler_recovery",
             "schedule": crontab(minute="*/15"), # Check every 15 mins for missed windows
         },
+        "suggest-index-rebuild": {
+            "task": "system.rebuild_suggest_index",
+            "schedule": crontab(hour=4, minute=0), # Nightly drift repair
+        },
     }
 )
 
 celery_app.autodiscover_tasks(["app.tasks"])
 
-async def publish_job_progress(job_id: str, progress: int, stats: dict):
+def job_snapshot_key(job_id: str) -> str:
+    """Redis hash holding the latest progress of a job."""
+    return f"job_snapshot:{job_id}"
+
+def job_shards_key(job_id: str) -> str:
+    """Redis hash of completed pages and stats per shard of a fanned-out job."""
+    return f"job_shards:{job_id}"
+
+class JobProgressPublisher:
+    """
+    Long-lived progress publisher for the worker process.
+
+    Publishes over one pooled client instead of a connection per event.
+    Updates for a job are coalesced to at most ``JOB_PROGRESS_MAX_RATE`` per
+    second: an update arriving inside the window replaces the pending one
+    and is sent when the window closes, so the latest value always wins.
+    Final updates bypass the limit. Each sent update is also stored in
+    ``job_snapshot:{job_id}`` so dashboards can read it without subscribing.
+    """
+    def __init__(self):
+        self._redis: Optional[Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_sent: Dict[str, float] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    def _client(self) -> Redis:
+        # Clients are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = Redis.from_url(str(settings.REDIS_URL), max_connections=4)
+            self._loop = loop
+            self._timers.clear()
+        return self._redis
+
+    async def publish(self, job_id: str, progress: int, stats: dict, final: bool = False):
+        job_id = str(job_id)
+        payload = {"job_id": job_id, "progress": progress, "stats": dict(stats)}
+        interval = 1 / settings.JOB_PROGRESS_MAX_RATE
+        wait = self._last_sent.get(job_id, 0) + interval - time.monotonic()
+
+        if final or progress >= 100 or wait <= 0:
+            self._cancel_timer(job_id)
+            self._pending.pop(job_id, None)
+            await self._send(payload)
+            if final or progress >= 100:
+                self._last_sent.pop(job_id, None)
+            return
+
+        self._pending[job_id] = payload
+        if job_id not in self._timers:
+            self._timers[job_id] = asyncio.create_task(self._send_later(job_id, wait))
+
+    async def _send_later(self, job_id: str, delay: float):
+        await asyncio.sleep(delay)
+        self._timers.pop(job_id, None)
+        payload = self._pending.pop(job_id, None)
+        if payload:
+            await self._send(payload)
+
+    def _cancel_timer(self, job_id: str):
+        timer = self._timers.pop(job_id, None)
+        if timer:
+            timer.cancel()
+
+    async def _send(self, payload: Dict[str, Any]):
+        self._last_sent[payload["job_id"]] = time.monotonic()
+        await self._write(payload)
+
+    async def _write(self, payload: Dict[str, Any]):
+        job_id = payload["job_id"]
+        message = json.dumps(payload)
+        key = job_snapshot_key(job_id)
+        try:
+            async with self._client().pipeline(transaction=False) as pipe:
+                pipe.publish(f"job_progress:{job_id}", message)
+                pipe.hset(key, mapping={
+                    "progress": payload["progress"],
+                    "stats": json.dumps(payload["stats"]),
+                    "updated_at": int(time.time()),
+                })
+                pipe.expire(key, settings.JOB_PROGRESS_SNAPSHOT_TTL)
+                await pipe.execute()
+        except Exception as e:
+            # Telemetry must never fail the job it reports on
+            logger.warning("Job progress publish failed", job_id=job_id, error=str(e))
+
+    async def record_shard(
+        self, job_id: str, shard: int, pages_done: int, stats: Dict[str, int]
+    ) -> Optional[Tuple[int, Dict[str, int]]]:
+        """
+        Store one shard's completed pages and stats, and return the totals
+        across every shard of the job (None when Redis is unavailable).
+        """
+        key = job_shards_key(str(job_id))
+        try:
+            async with self._client().pipeline(transaction=True) as pipe:
+                pipe.hset(key, str(shard), json.dumps({"pages": pages_done, "stats": dict(stats)}))
+                pipe.expire(key, settings.JOB_PROGRESS_SNAPSHOT_TTL)
+                pipe.hvals(key)
+                *_, entries = await pipe.execute()
+        except Exception as e:
+            logger.warning("Job shard progress failed", job_id=str(job_id), shard=shard, error=str(e))
+            return None
+        pages, totals = 0, {}
+        for raw in entries:
+            entry = json.loads(raw)
+            pages += entry["pages"]
+            for name, value in entry["stats"].items():
+                totals[name] = totals.get(name, 0) + value
+        return pages, totals
+
+    async def clear_shards(self, job_id: str):
+        try:
+            await self._client().delete(job_shards_key(str(job_id)))
+        except Exception as e:
+            logger.warning("Job shard progress cleanup failed", job_id=str(job_id), error=str(e))
+
+    async def flush(self):
+        """Send coalesced updates now instead of when their window closes."""
+        for job_id in list(self._timers):
+            self._cancel_timer(job_id)
+            payload = self._pending.pop(job_id, None)
+            if payload:
+                await self._send(payload)
+
+    async def close(self):
+        """Flush coalesced updates and release the client (end of the loop)."""
+        await self.flush()
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+            self._loop = None
+
+job_progress = JobProgressPublisher()
+
+async def publish_job_progress(job_id: str, progress: int, stats: dict, final: bool = False):
     """
     Broadcasts job updates to the WebSocket hub via Redis Pub/Sub.
     """
-    redis = Redis.from_url(str(settings.REDIS_URL))
-    payload = {
-        "job_id": job_id,
-        "progress": progress,
-        "stats": stats
-    }
-    await redis.publish(f"job_progress:{job_id}", json.dumps(payload))
-    await redis.close()
+    await job_progress.publish(job_id, progress, stats, final=final)
@@ -0,0 +1,164 @@
+import json
+import time
+import zlib
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict
+from uuid import UUID
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ships with requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Frame header: magic, format version, codec id, compression id.
+MAGIC = 0xCA
+FORMAT_VERSION = 1
+HEADER = struct.Struct("!BBBB")
+
+class CodecError(ValueError):
+    """Raised for payloads that were not produced by a known codec."""
+
+def to_builtin(obj: Any) -> Any:
+    """Fallback encoder for values the binary codecs do not handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Type is not cache-serializable: {type(obj).__name__}")
+
+# --- Codecs ---
+
+class JsonCodec:
+    id = 0
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=to_builtin, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+class OrjsonCodec:
+    id = 1
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=to_builtin, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+class MsgpackCodec:
+    id = 2
+    name = "msgpack"
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=to_builtin, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+CODECS = {c.id: c for c in (JsonCodec(), OrjsonCodec() if orjson else None, MsgpackCodec() if msgpack else None) if c}
+
+# --- Compression ---
+
+NO_COMPRESSION, ZLIB, ZSTD = 0, 1, 2
+
+def _compress(data: bytes, method: int, level: int) -> bytes:
+    if method == ZLIB:
+        return zlib.compress(data, level)
+    if method == ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+def _decompress(data: bytes, method: int) -> bytes:
+    if method == ZLIB:
+        return zlib.decompress(data)
+    if method == ZSTD:
+        if not zstandard:
+            raise CodecError("zstd payload but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if method == NO_COMPRESSION:
+        return data
+    raise CodecError(f"Unknown compression id {method}")
+
+class CacheSerializer:
+    """
+    Frames cache values as ``header + payload``.
+
+    Values are encoded with the configured codec and compressed once they
+    reach ``compress_min_bytes``. The header records codec and compression,
+    so any registered codec can be read back after the setting changes.
+    Byte and timing totals are kept for the monitoring endpoint.
+    """
+    def __init__(self, codec: str = "orjson", compression: str = "zlib", compress_min_bytes: int = 1024, level: int = 3):
+        by_name = {c.name: c for c in CODECS.values()}
+        self.codec = by_name.get(codec) or by_name.get("orjson") or by_name["json"]
+        self.compression = {"zlib": ZLIB, "zstd": ZSTD if zstandard else ZLIB}.get(compression, NO_COMPRESSION)
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level
+        self.stats = {
+            "encoded": 0, "decoded": 0,
+            "raw_bytes": 0, "stored_bytes": 0,
+            "encode_seconds": 0.0, "decode_seconds": 0.0,
+        }
+
+    def dumps(self, obj: Any) -> bytes:
+        started = time.perf_counter()
+        payload = self.codec.dumps(obj)
+        self.stats["raw_bytes"] += len(payload)
+        method = NO_COMPRESSION
+        if self.compression and len(payload) >= self.compress_min_bytes:
+            compressed = _compress(payload, self.compression, self.level)
+            if len(compressed) < len(payload):
+                payload, method = compressed, self.compression
+        frame = HEADER.pack(MAGIC, FORMAT_VERSION, self.codec.id, method) + payload
+        self.stats["encoded"] += 1
+        self.stats["stored_bytes"] += len(frame)
+        self.stats["encode_seconds"] += time.perf_counter() - started
+        return frame
+
+    def loads(self, data: bytes) -> Any:
+        started = time.perf_counter()
+        if len(data) < HEADER.size:
+            raise CodecError("Payload shorter than frame header")
+        magic, version, codec_id, method = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CodecError("Unrecognized cache frame")
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            raise CodecError(f"Codec {codec_id} is not available")
+        value = codec.loads(_decompress(data[HEADER.size:], method))
+        self.stats["decoded"] += 1
+        self.stats["decode_seconds"] += time.perf_counter() - started
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        raw, stored = self.stats["raw_bytes"], self.stats["stored_bytes"]
+        return {
+            **self.stats,
+            "codec": self.codec.name,
+            "compression_ratio": round(stored / raw, 3) if raw else None,
+        }
@@ -1,4 +1,4 @@
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 from pydantic import AnyHttpUrl, PostgresDsn, RedisDsn, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -24,6 +24,26 @@ class Settings(BaseSettings):
     # Database & Cache
     DATABASE_URL: PostgresDsn
     REDIS_URL: RedisDsn
+
+    # In-process (L1) cache tier in front of Redis, per worker
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_TTL_SECONDS: int = 30
+    # Stampede protection: stale grace window and cross-worker recompute lock
+    CACHE_STALE_TTL_SECONDS: int = 60
+    CACHE_LOCK_TTL_MS: int = 10000
+    # Cache value serialization: orjson | msgpack | json, zlib | zstd | none
+    CACHE_CODEC: str = "orjson"
+    CACHE_COMPRESSION: str = "zlib"
+    CACHE_COMPRESS_MIN_BYTES: int = 1024
+
+    # Audit log writer: bounded in-process buffer flushed in batches
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: int = 200
+
+    # Parser job telemetry: per-job publish rate cap and snapshot retention
+    JOB_PROGRESS_MAX_RATE: float = 2.0
+    JOB_PROGRESS_SNAPSHOT_TTL: int = 86400
     
     # Media Storage
     MEDIA_ROOT: str = "/app/media"
@@ -38,6 +58,15 @@ class Settings(BaseSettings):
     SHIKIMORI_URL: str = "https://shikimori.one"
     KODIK_URL: str = "https://kodikapi.com"
     KODIK_API_KEY: Optional[str] = None
+
+    # Upstream throttling: per-host token buckets (requests/sec, shared across
+    # workers via Redis) and adaptive per-process concurrency bounds
+    UPSTREAM_RATE_LIMITS: Dict[str, float] = {"shikimori.one": 4.0, "kodikapi.com": 10.0}
+    UPSTREAM_DEFAULT_RATE: float = 10.0
+    UPSTREAM_BURST_SECONDS: float = 1.0
+    UPSTREAM_MIN_CONCURRENCY: int = 2
+    UPSTREAM_MAX_CONCURRENCY: int = 16
+    UPSTREAM_LATENCY_THRESHOLD_MS: int = 3000
     
     # Sentry Monitoring
     SENTRY_DSN: Optional[str] = None
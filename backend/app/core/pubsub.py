@@ -0,0 +1,146 @@
+import asyncio
+import json
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Set
+from app.core.cache import cache
+from app.core.logging import logger
+
+class HubUnavailable(Exception):
+    """Raised when a hub cannot subscribe because Redis is not connected."""
+
+class PubSubHub:
+    """
+    Per-process fan-out of a Redis channel pattern to in-process subscribers.
+
+    One pattern subscription (on the shared cache connection pool) serves
+    every socket in the worker. Each subscriber gets a bounded queue; when a
+    slow client lets it fill up, the oldest message is dropped so the
+    reader always catches up with the latest state instead of stalling the
+    dispatcher.
+
+    With ``keep_last`` the hub remembers the latest message of up to that
+    many channels and replays it to new subscribers, so late joiners start
+    from the current state rather than waiting for the next update.
+    """
+    def __init__(self, pattern: str, queue_size: int = 100, keep_last: int = 0):
+        self.pattern = pattern
+        self.queue_size = queue_size
+        self.keep_last = keep_last
+        self._last: "OrderedDict[str, Any]" = OrderedDict()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+        self.counters = {"received": 0, "delivered": 0, "dropped": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None and not self._listener.done()
+
+    def start(self):
+        """Start listening ahead of the first subscriber (needed for replay)."""
+        self._ensure_running()
+
+    def _ensure_running(self):
+        if self.running:
+            return
+        if not cache.redis:
+            raise HubUnavailable(self.pattern)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        """Queue receiving every message published on ``channel`` until unsubscribed."""
+        self._ensure_running()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if channel in self._last:
+            queue.put_nowait(self._last[channel])
+        self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def dispatch(self, channel: str, data: Any):
+        self.counters["received"] += 1
+        if self.keep_last:
+            self._last[channel] = data
+            self._last.move_to_end(channel)
+            if len(self._last) > self.keep_last:
+                self._last.popitem(last=False)
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.counters["dropped"] += 1
+            queue.put_nowait(data)
+            self.counters["delivered"] += 1
+
+    async def _listen(self):
+        while True:
+            pubsub = cache.redis.pubsub()
+            try:
+                await pubsub.psubscribe(self.pattern)
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    self.dispatch(message["channel"].decode(), message["data"].decode())
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                logger.error("PubSub hub listener error", pattern=self.pattern, error=str(e))
+                await pubsub.close()
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "running": self.running,
+            "channels": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "snapshots": len(self._last),
+        }
+
+# --- Hubs ---
+notification_hub = PubSubHub("notifications:*")
+job_progress_hub = PubSubHub("job_progress:*", queue_size=20, keep_last=1024)
+
+PUSH_CHUNK = 1000
+
+def notification_channel(user_id: Any) -> str:
+    """Per-user Redis channel consumed by ``notification_hub``."""
+    return f"notifications:{user_id}"
+
+async def push_notification(unread: Dict[Any, int], **notification):
+    """Publish the new notification and unread count to each recipient's channel."""
+    if not cache.redis or not unread:
+        return
+    event = {
+        "event": "notification",
+        "type": notification.get("type"),
+        "title": notification.get("title"),
+        "message": notification.get("message"),
+        "target_id": str(notification["target_id"]) if notification.get("target_id") else None,
+        "icon": notification.get("icon"),
+        "created_at": notification["created_at"].isoformat()
+    }
+    recipients = list(unread.items())
+    try:
+        for i in range(0, len(recipients), PUSH_CHUNK):
+            async with cache.redis.pipeline(transaction=False) as pipe:
+                for user_id, count in recipients[i:i + PUSH_CHUNK]:
+                    pipe.publish(notification_channel(user_id), json.dumps({**event, "unread": count}))
+                await pipe.execute()
+    except Exception as e:
+        # Delivery is best-effort; clients fall back to polling
+        logger.error("Notifications: Push failed", error=str(e), recipients=len(recipients))
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+from tenacity.wait import wait_base
+
+from app.core.config import settings
+from app.core.cache import cache
+from app.core.logging import logger
+
+BUCKET_KEY_PREFIX = "throttle:bucket:"
+PAUSE_KEY_PREFIX = "throttle:pause:"
+
+# Refills the host bucket from the Redis clock and takes one token.
+# Returns 0 when granted, otherwise the milliseconds to wait before retrying.
+# A pause key (set from Retry-After) blocks every worker until it expires.
+TOKEN_BUCKET_SCRIPT = """
+local paused = redis.call('pttl', KEYS[2])
+if paused > 0 then
+    return paused
+end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('time')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('hset', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('pexpire', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+def retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """Parses ``Retry-After`` (delta-seconds or HTTP-date)."""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class wait_retry_after(wait_base):
+    """Tenacity wait honouring ``Retry-After`` on HTTP errors, else ``fallback``."""
+    def __init__(self, fallback: wait_base, max_wait: float = 60):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(exc, httpx.HTTPStatusError):
+            delay = retry_after_seconds(exc.response)
+            if delay is not None:
+                return min(delay, self.max_wait)
+        return self.fallback(retry_state)
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit for one host, per process.
+
+    Each healthy response grows the limit by ``1/limit`` (about +1 per round
+    of requests); a 429, 5xx or a response slower than the latency threshold
+    halves it, at most once per cooldown window so one burst of failures
+    does not collapse it to the minimum.
+    """
+    def __init__(self, minimum: int, maximum: int, latency_threshold: float, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.limit = float(minimum)
+        self.in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            # Futures are created per wait so the limiter survives event loop changes
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, latency: float, overloaded: bool = False):
+        self.in_flight -= 1
+        now = time.monotonic()
+        if overloaded or latency > self.latency_threshold:
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        for waiter in self._waiters[:max(0, int(self.limit) - self.in_flight)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+class HostThrottle:
+    """Token bucket (shared via Redis) plus adaptive concurrency for one upstream host."""
+    def __init__(self, host: str, rate: float):
+        self.host = host
+        self.rate = rate
+        self.burst = max(1.0, rate * settings.UPSTREAM_BURST_SECONDS)
+        self.concurrency = AdaptiveConcurrency(
+            settings.UPSTREAM_MIN_CONCURRENCY,
+            settings.UPSTREAM_MAX_CONCURRENCY,
+            settings.UPSTREAM_LATENCY_THRESHOLD_MS / 1000
+        )
+        self.stats = {"requests": 0, "throttled": 0, "waited_ms": 0}
+
+    async def _take_token(self):
+        if not cache.redis:
+            return  # No coordination available; concurrency control still applies
+        while True:
+            try:
+                wait_ms = await cache.redis.eval(
+                    TOKEN_BUCKET_SCRIPT, 2,
+                    f"{BUCKET_KEY_PREFIX}{self.host}", f"{PAUSE_KEY_PREFIX}{self.host}",
+                    self.rate, self.burst
+                )
+            except Exception as e:
+                logger.error("Throttle: Bucket unavailable", host=self.host, error=str(e))
+                return
+            if not wait_ms:
+                return
+            self.stats["waited_ms"] += int(wait_ms)
+            await asyncio.sleep(int(wait_ms) / 1000)
+
+    async def pause(self, seconds: float):
+        """Stop every worker from calling this host for ``seconds``."""
+        if not cache.redis or seconds <= 0:
+            return
+        try:
+            await cache.redis.set(f"{PAUSE_KEY_PREFIX}{self.host}", 1, px=int(seconds * 1000))
+        except Exception as e:
+            logger.error("Throttle: Pause failed", host=self.host, error=str(e))
+
+    async def send(self, client: httpx.AsyncClient, request: httpx.Request) -> httpx.Response:
+        await self.concurrency.acquire()
+        started = time.perf_counter()
+        overloaded = False
+        try:
+            await self._take_token()
+            # Only the upstream call counts: waiting on our own bucket is not upstream slowness
+            started = time.perf_counter()
+            response = await client.send(request)
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            if response.status_code == 429:
+                self.stats["throttled"] += 1
+                delay = retry_after_seconds(response)
+                if delay:
+                    await self.pause(delay)
+            return response
+        except httpx.TransportError:
+            overloaded = True
+            raise
+        finally:
+            self.stats["requests"] += 1
+            self.concurrency.release(time.perf_counter() - started, overloaded)
+
+class UpstreamThrottles:
+    """Per-host throttles for outbound calls to content providers."""
+    def __init__(self):
+        self._hosts: Dict[str, HostThrottle] = {}
+
+    def for_host(self, host: str) -> HostThrottle:
+        if host not in self._hosts:
+            rate = settings.UPSTREAM_RATE_LIMITS.get(host, settings.UPSTREAM_DEFAULT_RATE)
+            self._hosts[host] = HostThrottle(host, rate)
+        return self._hosts[host]
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """``client.request`` gated by the throttle of the target host."""
+        request = client.build_request(method, url, **kwargs)
+        return await self.for_host(request.url.host).send(client, request)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            host: {**t.stats, "rate": t.rate, "concurrency": round(t.concurrency.limit, 2)}
+            for host, t in self._hosts.items()
+        }
+
+upstream = UpstreamThrottles()
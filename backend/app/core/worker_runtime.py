@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, Optional, TypeVar
+
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from app.core.cache import cache
+from app.core.celery_app import job_progress
+from app.core.logging import logger
+from app.db.session import engine
+
+T = TypeVar("T")
+
+class WorkerRuntime:
+    """
+    Long-lived event loop for a Celery worker process.
+
+    Started once per process at ``worker_process_init``; every task then runs
+    its coroutine on the same loop, so the Redis client, the progress
+    publisher, the asyncpg pool of ``engine`` and the shared httpx clients
+    are created once and always used from the loop that owns them.
+
+    Outside a started runtime (API process, ``-P solo``/threads pools, eager
+    mode) ``run`` falls back to a throwaway loop and releases every
+    loop-bound resource before it closes.
+    """
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[Hashable, httpx.AsyncClient] = {}
+
+    @property
+    def active(self) -> bool:
+        return self.loop is not None and not self.loop.is_closed()
+
+    def start(self):
+        if self.active:
+            return
+        # Connections inherited from the parent process belong to another loop
+        engine.sync_engine.dispose(close=False)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(cache.connect(listen=False))
+        logger.info("Worker runtime started")
+
+    def stop(self):
+        if not self.active:
+            return
+        try:
+            self.loop.run_until_complete(self._release())
+        finally:
+            self.loop.close()
+            self.loop = None
+            logger.info("Worker runtime stopped")
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a task coroutine to completion on the worker loop."""
+        if not self.active or self.loop.is_running():
+            return asyncio.run(self._standalone(coro))
+        return self.loop.run_until_complete(self._task(coro))
+
+    def http_client(self, key: Hashable, **options: Any) -> Optional[httpx.AsyncClient]:
+        """
+        Shared client for ``key`` when called on the worker loop (created from
+        ``options`` on first use), else None and the caller builds its own.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if loop is not self.loop:
+            return None
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._clients[key] = httpx.AsyncClient(**options)
+        return client
+
+    async def _task(self, coro: Awaitable[T]) -> T:
+        try:
+            return await coro
+        finally:
+            # Coalesced progress must not wait for the next task on this loop
+            await job_progress.flush()
+
+    async def _standalone(self, coro: Awaitable[T]) -> T:
+        await cache.connect(listen=False)
+        try:
+            return await coro
+        finally:
+            await job_progress.close()
+            await cache.disconnect()
+            await engine.dispose()
+
+    async def _release(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        await job_progress.close()
+        await cache.disconnect()
+        await engine.dispose()
+
+worker_runtime = WorkerRuntime()
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Entry point for Celery tasks: ``return run_async(_work(...))``."""
+    return worker_runtime.run(coro)
+
+@worker_process_init.connect
+def _start_runtime(**kwargs):
+    worker_runtime.start()
+
+@worker_process_shutdown.connect
+def _stop_runtime(**kwargs):
+    worker_runtime.stop()
@@ -1,22 +1,268 @@
 
-from typing import List, Optional, Union, Dict, Any, Tuple
+import base64
+import hashlib
+import json
+from typing import List, Optional, Union, Dict, Any, Tuple, Iterable, Set
 from uuid import UUID
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, text, tuple_, literal, literal_column, distinct, true, or_, Integer
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.models.anime import Anime
 from app.schemas.anime import AnimeCreate, AnimeUpdate
 from app.crud.base import CRUDBase
 
+# --- Cache Tags ---
+# Catalog entries depend on "catalog" (global ordering/membership), on every
+# anime they contain, and on each filter value they were computed for.
+CATALOG_TAG = "catalog"
+SEARCH_TAG = "catalog:search"
+FACETS_TAG = "catalog:facets"
+FILTER_TAG_FIELDS = ("kind", "status", "year")
+SEARCH_FIELDS = {"title", "title_en", "title_jp", "title_romaji", "synonyms", "description"}
+ORDERING_FIELDS = {"score", "score_count"}
+FACET_FIELDS = {"genres", "kind", "status", "aired_on"}
+FACETS = ("genre", "kind", "status", "year")
+# Columns an upsert never overwrites on an existing row
+UPSERT_PRESERVED = {"id", "shikimori_id", "created_at"}
+# Returned by upsert_many: enough for cache invalidation and the suggest index
+UPSERT_RETURNING = (
+    Anime.id, Anime.shikimori_id, Anime.slug, Anime.title, Anime.title_en,
+    Anime.title_romaji, Anime.synonyms, Anime.poster_url, Anime.views_count, Anime.score_count,
+)
+
+def anime_tag(anime_id: Any) -> str:
+    return f"anime:{anime_id}"
+
+def genre_tag(genre: str) -> str:
+    return f"genre:{genre}"
+
+def filter_tag(name: str, value: Any) -> str:
+    return f"catalog:{name}:{value}"
+
+# --- Catalog Ordering ---
+# Default catalog order, descending on every key. ``id`` makes it total so a
+# keyset cursor always resumes at an exact position; backed by
+# ix_anime_catalog_order (the 0 is inlined so the planner matches the index
+# expression).
+CATALOG_ORDER = (Anime.score_count, func.coalesce(Anime.score, literal_column("0")), Anime.id)
+
+def encode_cursor(item: Anime) -> str:
+    """Opaque cursor pointing just after ``item`` in catalog order."""
+    keys = [item.score_count or 0, str(item.score or 0), str(item.id)]
+    return base64.urlsafe_b64encode(json.dumps(keys, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, Decimal, UUID]:
+    """Inverse of ``encode_cursor``; raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score_count, score, anime_id = json.loads(raw)
+        return int(score_count), Decimal(score), UUID(anime_id)
+    except (TypeError, ValueError, InvalidOperation) as e:
+        raise ValueError("Invalid cursor") from e
+
+# --- Search ---
+# Titles are mostly Russian (Shikimori), alternates English/romaji; queries
+# are OR-ed across these configs to match the multilingual search_vector
+# trigger. "simple" catches romaji and unstemmed tokens.
+SEARCH_CONFIGS = ("russian", "english", "simple")
+TRGM_FIELDS = (Anime.title, Anime.title_en, Anime.title_romaji)
+VIEWS_WEIGHT = 0.1
+SCORE_WEIGHT = 0.05
+
+def _tsquery(search: str):
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = func.plainto_tsquery(config, search)
+        query = part if query is None else query.op("||")(part)
+    return query
+
+def _popularity():
+    """Multiplier boosting relevance by views and score without overriding it."""
+    return 1 + VIEWS_WEIGHT * func.ln(1 + Anime.views_count) + SCORE_WEIGHT * func.coalesce(Anime.score, 0)
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def content_hash(fields: Dict[str, Any]) -> str:
+    """
+    Stable digest of provider-mapped fields, stored as ``Anime.content_hash``
+    so sync can skip rows whose source data has not changed.
+    """
+    canonical = json.dumps(
+        {k: _normalize(v) for k, v in fields.items() if k != "content_hash"},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _coerce_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Provider payloads carry ISO date strings; Core inserts need ``date``."""
+    aired_on = row.get("aired_on")
+    if isinstance(aired_on, str):
+        row = {**row, "aired_on": date.fromisoformat(aired_on) if aired_on else None}
+    return row
+
 class CRUDAnime(CRUDBase[Anime, AnimeCreate, AnimeUpdate]):
-    async def get_by_slug(self, db: AsyncSession, *, slug: str) -> Optional[Anime]:
-        result = await db.execute(select(Anime).filter(Anime.slug == slug))
+    def list_cache_tags(
+        self, items: Iterable[Anime], *, genre: Optional[str] = None, search: Optional[str] = None, **filters
+    ) -> List[str]:
+        """Tags a catalog page depends on: its items, its filters and the global ordering."""
+        tags = {CATALOG_TAG}
+        tags.update(anime_tag(i.id) for i in items)
+        if genre:
+            tags.add(genre_tag(genre))
+        if search:
+            tags.add(SEARCH_TAG)
+        for name in FILTER_TAG_FIELDS:
+            if filters.get(name) is not None:
+                tags.add(filter_tag(name, filters[name]))
+        return sorted(tags)
+
+    def invalidation_tags(self, db_obj: Anime, changes: Dict[str, Any]) -> List[str]:
+        """
+        Tags made stale by applying ``changes`` to ``db_obj``.
+        Must be computed before the update is applied.
+        """
+        tags: Set[str] = {anime_tag(db_obj.id)}
+        changed = {
+            k for k, v in changes.items()
+            if hasattr(db_obj, k) and _normalize(getattr(db_obj, k)) != _normalize(v)
+        }
+        if changed & ORDERING_FIELDS:
+            tags.add(CATALOG_TAG)
+        if changed & SEARCH_FIELDS:
+            tags.add(SEARCH_TAG)
+        if changed & FACET_FIELDS:
+            tags.add(FACETS_TAG)
+        if "genres" in changed:
+            tags.update(genre_tag(g) for g in set(db_obj.genres or []) | set(changes["genres"] or []))
+        for name in ("kind", "status"):
+            if name in changed:
+                tags.add(filter_tag(name, getattr(db_obj, name)))
+                tags.add(filter_tag(name, changes[name]))
+        if "aired_on" in changed:
+            tags.add(filter_tag("year", db_obj.year))
+            new_aired = _normalize(changes["aired_on"])
+            tags.add(filter_tag("year", str(new_aired)[:4] if new_aired else None))
+        return sorted(tags)
+
+    @staticmethod
+    def _select(with_episodes: bool = False):
+        """Base query; episodes are only fetched when explicitly requested."""
+        query = select(Anime)
+        if with_episodes:
+            query = query.options(selectinload(Anime.episodes))
+        return query
+
+    async def get(self, db: AsyncSession, id: Any, *, with_episodes: bool = False) -> Optional[Anime]:
+        result = await db.execute(self._select(with_episodes).filter(Anime.id == id))
+        return result.scalars().first()
+
+    async def get_by_slug(self, db: AsyncSession, *, slug: str, with_episodes: bool = False) -> Optional[Anime]:
+        result = await db.execute(self._select(with_episodes).filter(Anime.slug == slug))
         return result.scalars().first()
 
-    async def get_by_shikimori_id(self, db: AsyncSession, *, shikimori_id: int) -> Optional[Anime]:
-        result = await db.execute(select(Anime).filter(Anime.shikimori_id == shikimori_id))
+    async def get_by_shikimori_id(
+        self, db: AsyncSession, *, shikimori_id: int, with_episodes: bool = False
+    ) -> Optional[Anime]:
+        result = await db.execute(self._select(with_episodes).filter(Anime.shikimori_id == shikimori_id))
         return result.scalars().first()
 
+    async def get_many_by_shikimori_ids(self, db: AsyncSession, shikimori_ids: Iterable[int]) -> Dict[int, Anime]:
+        ids = list(set(shikimori_ids))
+        if not ids:
+            return {}
+        result = await db.execute(select(Anime).filter(Anime.shikimori_id.in_(ids)))
+        return {a.shikimori_id: a for a in result.scalars().all()}
+
+    async def get_content_hashes(self, db: AsyncSession, shikimori_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        """Stored ``content_hash`` per known shikimori id (unknown ids are absent)."""
+        ids = list(set(shikimori_ids))
+        if not ids:
+            return {}
+        result = await db.execute(
+            select(Anime.shikimori_id, Anime.content_hash).filter(Anime.shikimori_id.in_(ids))
+        )
+        return dict(result.all())
+
+    async def upsert_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Insert or update anime keyed by ``shikimori_id`` in one statement (no
+        commit). Returns one row per input with the ``UPSERT_RETURNING``
+        columns plus ``created`` (true when the row was inserted).
+        Rows must share the same keys; the last duplicate of an id wins.
+        Rows carrying a ``content_hash`` equal to the stored one are left
+        untouched and not returned.
+        """
+        rows = list({row["shikimori_id"]: _coerce_row(row) for row in rows}.values())
+        if not rows:
+            return []
+        stmt = pg_insert(Anime).values(rows)
+        columns = set(rows[0]) - UPSERT_PRESERVED
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Anime.shikimori_id],
+            set_={**{c: stmt.excluded[c] for c in columns}, "updated_at": datetime.utcnow()},
+            where=Anime.content_hash.is_distinct_from(stmt.excluded.content_hash) if "content_hash" in columns else None
+        ).returning(*UPSERT_RETURNING, literal_column("(xmax = 0)").label("created"))
+        result = await db.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    def _apply_filters(
+        query,
+        *,
+        genre: Optional[str] = None,
+        year: Optional[int] = None,
+        min_score: Optional[float] = None,
+        **filters
+    ):
+        """Catalog filters shared by every listing mode."""
+        for key, value in filters.items():
+            if value and hasattr(Anime, key):
+                query = query.filter(getattr(Anime, key) == value)
+
+        # Range on aired_on so ix_anime_aired_on applies
+        if year:
+            query = query.filter(Anime.aired_on >= date(year, 1, 1), Anime.aired_on < date(year + 1, 1, 1))
+        if min_score is not None:
+            query = query.filter(Anime.score >= min_score)
+
+        # JSONB Array Filter (Postgres existence operator)
+        if genre:
+            query = query.filter(Anime.genres.op("?")(genre))
+        return query
+
+    async def _search_clause(self, db: AsyncSession, search: str, **filters):
+        """
+        Match condition and relevance expression for ``search``.
+        Full-text first; when that finds nothing within the filters, fall back
+        to trigram word similarity on the titles so typos still match.
+        """
+        tsquery = _tsquery(search)
+        fts = Anime.search_vector.op("@@")(tsquery)
+        probe = await db.execute(self._apply_filters(select(Anime.id), **filters).filter(fts).limit(1))
+        if probe.first() is not None:
+            return fts, func.ts_rank_cd(Anime.search_vector, tsquery, 32) * _popularity()
+
+        term = literal(search)
+        fuzzy = or_(*(term.op("<%")(field) for field in TRGM_FIELDS))
+        similarity = func.greatest(*(func.word_similarity(term, field) for field in TRGM_FIELDS))
+        return fuzzy, similarity * _popularity()
+
+    async def _count(self, db: AsyncSession, condition=None, **filters) -> int:
+        query = self._apply_filters(select(Anime.id), **filters)
+        if condition is not None:
+            query = query.filter(condition)
+        result = await db.execute(select(func.count()).select_from(query.subquery()))
+        return result.scalar() or 0
+
     async def get_multi_paginated(
         self,
         db: AsyncSession,
@@ -24,36 +270,107 @@ class CRUDAnime(CRUDBase[Anime, AnimeCreate, AnimeUpdate]):
         skip: int = 0,
         limit: int = 20,
         search: Optional[str] = None,
-        genre: Optional[str] = None,
+        with_total: bool = True,
         **filters
-    ) -> Tuple[List[Anime], int]:
-        query = select(Anime)
+    ) -> Tuple[List[Anime], Optional[int]]:
+        query = self._apply_filters(select(Anime), **filters)
         
         # Enterprise Search with Rank
+        condition = None
         if search:
-            search_query = func.plainto_tsquery('english', search)
-            rank = func.ts_rank_cd(Anime.search_vector, search_query)
-            query = query.filter(Anime.search_vector.op("@@")(search_query))
-            query = query.order_by(desc(rank))
+            condition, rank = await self._search_clause(db, search, **filters)
+            query = query.filter(condition).order_by(desc(rank), desc(Anime.id))
         else:
-            query = query.order_by(desc(Anime.score_count), desc(Anime.score))
-
-        # Dynamic Filters
-        for key, value in filters.items():
-            if value and hasattr(Anime, key):
-                query = query.filter(getattr(Anime, key) == value)
-        
-        # JSONB Array Filter (Postgres existence operator)
-        if genre:
-            query = query.filter(Anime.genres.op("?")(genre))
+            query = query.order_by(*(desc(key) for key in CATALOG_ORDER))
 
-        total_result = await db.execute(select(func.count()).select_from(query.subquery()))
-        total = total_result.scalar() or 0
+        total = None
+        if with_total:
+            total = await self._count(db, condition, **filters)
         
         result = await db.execute(query.offset(skip).limit(limit))
         items = result.scalars().all()
         return items, total
 
+    async def get_multi_keyset(
+        self,
+        db: AsyncSession,
+        *,
+        after: Optional[Tuple[int, Decimal, UUID]] = None,
+        limit: int = 20,
+        **filters
+    ) -> Tuple[List[Anime], Optional[str]]:
+        """
+        Catalog page in default order starting after the ``after`` keys.
+        Cost is independent of depth; returns the items and the next cursor.
+        """
+        query = self._apply_filters(select(Anime), **filters)
+        if after:
+            query = query.filter(tuple_(*CATALOG_ORDER) < tuple_(*after))
+        query = query.order_by(*(desc(key) for key in CATALOG_ORDER)).limit(limit + 1)
+
+        result = await db.execute(query)
+        items = result.scalars().all()
+        next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+        return items[:limit], next_cursor
+
+    async def count_filtered(self, db: AsyncSession, *, search: Optional[str] = None, **filters) -> int:
+        condition = None
+        if search:
+            condition, _ = await self._search_clause(db, search, **filters)
+        return await self._count(db, condition, **filters)
+
+    async def get_facets(self, db: AsyncSession, *, search: Optional[str] = None, **filters) -> Dict[str, Any]:
+        """
+        Per-value counts of genre, kind, status and year within the filtered
+        catalog, plus the overall total, in a single GROUPING SETS query.
+        """
+        filtered = self._apply_filters(
+            select(
+                Anime.id,
+                Anime.kind,
+                Anime.status,
+                func.extract("year", Anime.aired_on).cast(Integer).label("year"),
+                Anime.genres
+            ),
+            **filters
+        )
+        if search:
+            condition, _ = await self._search_clause(db, search, **filters)
+            filtered = filtered.filter(condition)
+        filtered = filtered.subquery("filtered")
+        genres = func.jsonb_array_elements_text(filtered.c.genres).table_valued("value").lateral("g")
+
+        dims = (genres.c.value, filtered.c.kind, filtered.c.status, filtered.c.year)
+        # GROUPING() bitmask: the bit of every dimension *not* in the set is 1,
+        # so a single-dimension set has exactly one zero bit.
+        set_ids = {0b1111 ^ (0b1000 >> i): i for i in range(len(FACETS))}
+        query = (
+            select(func.grouping(*dims).label("set_id"), *dims, func.count(distinct(filtered.c.id)))
+            .select_from(filtered.outerjoin(genres, true()))
+            .group_by(func.grouping_sets(*(tuple_(d) for d in dims), tuple_()))
+            .order_by(desc(func.count(distinct(filtered.c.id))))
+        )
+        result = await db.execute(query)
+
+        facets: Dict[str, Any] = {name: {} for name in FACETS}
+        facets["total"] = 0
+        for set_id, *values, count in result.all():
+            if set_id == 0b1111:
+                facets["total"] = count
+            elif set_id in set_ids:
+                i = set_ids[set_id]
+                if values[i] is not None:
+                    facets[FACETS[i]][str(values[i])] = count
+        return facets
+
+    async def estimate_total(self, db: AsyncSession) -> int:
+        """Planner row estimate for the whole table; exact count if never analyzed."""
+        result = await db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'anime'::regclass"))
+        estimate = result.scalar()
+        if estimate is None or estimate < 0:
+            return await self.count_filtered(db)
+        return estimate
+
     async def delete(self, db: AsyncSession, *, id: UUID) -> Anime:
         result = await db.execute(select(Anime).filter(Anime.id == id))
         db_obj = result.scalars().first()
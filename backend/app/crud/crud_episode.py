@@ -4,6 +4,7 @@ from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import desc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.episode import Episode
 from app.models.anime import Anime
@@ -41,6 +42,23 @@ class CRUDEpisode:
         await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Insert episodes in one statement within the caller's transaction (no
+        commit), skipping ``(anime_id, season, episode)`` keys that already
+        exist. Returns ``(id, season, episode)`` of the inserted rows only.
+        """
+        if not rows:
+            return []
+        stmt = (
+            pg_insert(Episode)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Episode.anime_id, Episode.season, Episode.episode])
+            .returning(Episode.id, Episode.season, Episode.episode)
+        )
+        result = await db.execute(stmt)
+        return result.all()
+
     async def update(
         self, db: AsyncSession, *, db_obj: Episode, obj_in: Union[EpisodeUpdate, Dict[str, Any]]
     ) -> Episode:
@@ -1,14 +1,24 @@
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.models.interaction import Notification
+from app.core.pubsub import push_notification
+from app.models.interaction import Notification, NotificationCounter
 from app.schemas.notification import NotificationCreate, NotificationUpdate
 
 class CRUDNotification:
+    """
+    Notifications plus the per-user unread counter.
+
+    Every write that changes unread state also adjusts ``NotificationCounter``
+    in the same transaction. Writers that touch an existing user's counter
+    lock it before the notifications rows, so concurrent mark-read calls
+    cannot deadlock each other or leave the count off.
+    """
     async def get_multi_by_user(
         self, db: AsyncSession, *, user_id: UUID, skip: int = 0, limit: int = 20
     ) -> List[Notification]:
@@ -23,38 +33,89 @@ class CRUDNotification:
         return result.scalars().all()
 
     async def get_unread_count(self, db: AsyncSession, *, user_id: UUID) -> int:
-        query = select(Notification).filter(Notification.user_id == user_id, Notification.is_read == False) # noqa
-        result = await db.execute(query)
-        return len(result.scalars().all())
+        result = await db.execute(select(NotificationCounter.unread).filter(NotificationCounter.user_id == user_id))
+        return result.scalar() or 0
+
+    @staticmethod
+    def increment_unread_stmt(source):
+        """
+        Upsert adding ``source``'s ``(user_id, unread)`` rows to the counters.
+        ``source`` should be ordered by user_id so concurrent fan-outs lock
+        counter rows in the same order.
+        """
+        stmt = pg_insert(NotificationCounter).from_select(["user_id", "unread"], source)
+        return stmt.on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={"unread": NotificationCounter.unread + stmt.excluded.unread}
+        )
+
+    async def increment_unread(self, db: AsyncSession, counts: Dict[UUID, int]) -> Dict[UUID, int]:
+        """Add per-user amounts to the unread counters (no commit); returns the new totals."""
+        if not counts:
+            return {}
+        stmt = pg_insert(NotificationCounter).values(
+            [{"user_id": uid, "unread": n} for uid, n in sorted(counts.items(), key=lambda kv: str(kv[0]))]
+        )
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[NotificationCounter.user_id],
+                set_={"unread": NotificationCounter.unread + stmt.excluded.unread}
+            ).returning(NotificationCounter.user_id, NotificationCounter.unread)
+        )
+        return dict(result.all())
+
+    async def _lock_counter(self, db: AsyncSession, user_id: UUID) -> None:
+        await db.execute(
+            select(NotificationCounter.user_id).filter(NotificationCounter.user_id == user_id).with_for_update()
+        )
 
     async def create(self, db: AsyncSession, *, obj_in: NotificationCreate) -> Notification:
         db_obj = Notification(**obj_in.model_dump())
         db.add(db_obj)
+        await db.flush()
+        unread = await self.increment_unread(db, {db_obj.user_id: 1})
         await db.commit()
         await db.refresh(db_obj)
+        await push_notification(
+            unread, title=db_obj.title, message=db_obj.message, type=db_obj.type,
+            target_id=db_obj.target_id, icon=db_obj.icon, created_at=db_obj.created_at
+        )
         return db_obj
 
     async def mark_as_read(self, db: AsyncSession, *, id: UUID, user_id: UUID) -> Optional[Notification]:
+        await self._lock_counter(db, user_id)
         result = await db.execute(
-            select(Notification).filter(Notification.id == id, Notification.user_id == user_id)
+            update(Notification)
+            .where(Notification.id == id, Notification.user_id == user_id, Notification.is_read == False) # noqa
+            .values(is_read=True)
+            .returning(Notification.id)
+            .execution_options(synchronize_session=False)
         )
-        notification = result.scalars().first()
-        if notification:
-            notification.is_read = True
-            db.add(notification)
-            await db.commit()
-            await db.refresh(notification)
-        return notification
+        if result.first() is not None:
+            await db.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id == user_id)
+                .values(unread=func.greatest(NotificationCounter.unread - 1, 0))
+            )
+        await db.commit()
 
-    async def mark_all_as_read(self, db: AsyncSession, *, user_id: UUID) -> None:
-        # Note: bulk updates in async sqlalchemy require specific syntax or iteration
         result = await db.execute(
-            select(Notification).filter(Notification.user_id == user_id, Notification.is_read == False) # noqa
+            select(Notification)
+            .filter(Notification.id == id, Notification.user_id == user_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def mark_all_as_read(self, db: AsyncSession, *, user_id: UUID) -> None:
+        await db.execute(
+            update(NotificationCounter).where(NotificationCounter.user_id == user_id).values(unread=0)
+        )
+        await db.execute(
+            update(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read == False) # noqa
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
         )
-        notifications = result.scalars().all()
-        for n in notifications:
-            n.is_read = True
-            db.add(n)
         await db.commit()
 
 notification = CRUDNotification()
@@ -3,7 +3,8 @@ from uuid import UUID
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, insert, update, func, cast, literal
+from sqlalchemy.dialects.postgresql import JSONB
 
 from app.models.parser import ParserSettings, ParserJob, ScheduledParserJob, ParserConflict, ParserJobLog
 from app.schemas.parser import (
@@ -14,6 +15,9 @@ from app.schemas.parser import (
     ParserJobLogCreate
 )
 
+# ParserSettings category holding per-provider incremental sync high-water marks
+WATERMARKS_CATEGORY = "watermarks"
+
 class CRUDParserSettings:
     async def get_by_category(self, db: AsyncSession, category: str) -> Optional[ParserSettings]:
         result = await db.execute(select(ParserSettings).filter(ParserSettings.category == category))
@@ -51,6 +55,21 @@ class CRUDParserSettings:
         await db.refresh(db_obj)
         return db_obj
 
+    async def get_watermark(self, db: AsyncSession, provider: str) -> Optional[Dict[str, Any]]:
+        db_obj = await self.get_by_category(db, WATERMARKS_CATEGORY)
+        return db_obj.config.get(provider) if db_obj else None
+
+    async def set_watermark(self, db: AsyncSession, provider: str, mark: Dict[str, Any]) -> None:
+        db_obj = await self.get_by_category(db, WATERMARKS_CATEGORY)
+        if db_obj is None:
+            await self.create(db, obj_in={
+                "category": WATERMARKS_CATEGORY,
+                "description": "Incremental sync high-water marks (managed by parsers)",
+                "config": {provider: mark}
+            })
+        else:
+            await self.update(db, db_obj=db_obj, obj_in={"config": {**db_obj.config, provider: mark}})
+
 class CRUDParserJob:
     async def get(self, db: AsyncSession, id: UUID) -> Optional[ParserJob]:
         result = await db.execute(select(ParserJob).filter(ParserJob.id == id))
@@ -74,9 +93,12 @@ class CRUDParserJob:
         return db_obj
 
     async def update(
-        self, db: AsyncSession, *, db_obj: ParserJob, obj_in: ParserJobUpdate
+        self, db: AsyncSession, *, db_obj: ParserJob, obj_in: Union[ParserJobUpdate, Dict[str, Any]]
     ) -> ParserJob:
-        update_data = obj_in.model_dump(exclude_unset=True)
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
@@ -85,6 +107,24 @@ class CRUDParserJob:
         await db.refresh(db_obj)
         return db_obj
 
+    async def save_checkpoint(
+        self, db: AsyncSession, job_id: Any, checkpoint: Dict[str, Any], shard: Optional[int] = None
+    ) -> None:
+        """
+        Stage the job's resume point in the caller's transaction (no commit).
+        Shards of a fanned-out job each merge theirs under ``shards.<n>``
+        in place, so concurrent shards never overwrite each other.
+        """
+        value = checkpoint
+        if shard is not None:
+            empty = cast(literal("{}"), JSONB)
+            current = func.coalesce(ParserJob.checkpoint, empty)
+            shards = func.coalesce(ParserJob.checkpoint["shards"], empty).op("||")(
+                func.jsonb_build_object(str(shard), literal(checkpoint, JSONB))
+            )
+            value = current.op("||")(func.jsonb_build_object("shards", shards))
+        await db.execute(update(ParserJob).where(ParserJob.id == job_id).values(checkpoint=value))
+
 class CRUDParserJobLog:
     async def get_multi_by_job(
         self, db: AsyncSession, *, job_id: UUID, skip: int = 0, limit: int = 500
@@ -113,6 +153,11 @@ class CRUDParserJobLog:
         await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(self, db: AsyncSession, objs_in: List[ParserJobLogCreate]) -> None:
+        """Bulk insert within the caller's transaction (no commit)."""
+        if objs_in:
+            await db.execute(insert(ParserJobLog), [o.model_dump() for o in objs_in])
+
 class CRUDScheduledJob:
     async def get(self, db: AsyncSession, id: UUID) -> Optional[ScheduledParserJob]:
         result = await db.execute(select(ScheduledParserJob).filter(ScheduledParserJob.id == id))
@@ -179,6 +224,11 @@ class CRUDParserConflict:
         await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(self, db: AsyncSession, objs_in: List[ParserConflictCreate]) -> None:
+        """Bulk insert within the caller's transaction (no commit)."""
+        if objs_in:
+            await db.execute(insert(ParserConflict), [o.model_dump() for o in objs_in])
+
     async def update(
         self, db: AsyncSession, *, db_obj: ParserConflict, obj_in: ParserConflictUpdate
     ) -> ParserConflict:
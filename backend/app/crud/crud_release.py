@@ -3,7 +3,7 @@ from typing import List, Optional, Union, Dict, Any
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, insert
 
 from app.models.release import Release
 from app.schemas.release import ReleaseCreate, ReleaseUpdate
@@ -34,6 +34,11 @@ class CRUDRelease:
         await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """Bulk insert within the caller's transaction (no commit)."""
+        if rows:
+            await db.execute(insert(Release), rows)
+
     async def update(
         self, db: AsyncSession, *, db_obj: Release, obj_in: Union[ReleaseUpdate, Dict[str, Any]]
     ) -> Release:
@@ -7,5 +7,5 @@ from app.models.anime import Anime
 from app.models.episode import Episode
 from app.models.release import Release
 from app.models.parser import ParserSettings, ParserJob, ParserJobLog, ParserConflict, ScheduledParserJob
-from app.models.interaction import Collection, CollectionItem, Comment, WatchProgress, Favorite, Notification
+from app.models.interaction import Collection, CollectionItem, Comment, WatchProgress, Favorite, Notification, NotificationCounter
 from app.models.system import AuditLog, SiteSetting, Backup
\ No newline at end of file
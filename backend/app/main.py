@@ -13,6 +13,8 @@ from app.api.v1.api import api_router
 from app.core.logging import setup_logging, logger
 from app.core.cache import cache
 from app.core.limiter import limiter
+from app.core.pubsub import notification_hub, job_progress_hub, HubUnavailable
+from app.services.audit_service import audit_service
 from app.api.middleware import RequestContextMiddleware
 from app.api.errors import http_error_handler, unhandled_exception_handler
 from pathlib import Path
@@ -23,6 +25,12 @@ async def lifespan(app: FastAPI):
     setup_logging()
     Path(settings.MEDIA_ROOT).mkdir(parents=True, exist_ok=True)
     await cache.connect()
+    audit_service.start()
+    try:
+        # Listens from startup so late dashboard joiners get the last progress
+        job_progress_hub.start()
+    except HubUnavailable:
+        logger.warning("Job telemetry hub offline: Redis unavailable")
     
     if settings.SENTRY_DSN:
         sentry_sdk.init(
@@ -37,6 +45,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Kitsu Enterprise API: Initiating graceful shutdown")
+    await audit_service.stop()
+    await notification_hub.stop()
+    await job_progress_hub.stop()
     await cache.disconnect()
     await engine.dispose()
 
@@ -5,5 +5,5 @@ from .anime import Anime
 from .episode import Episode
 from .release import Release
 from .parser import ParserSettings, ParserJob, ParserJobLog, ParserConflict, ScheduledParserJob
-from .interaction import Collection, CollectionItem, Comment, WatchProgress, Favorite, Notification
+from .interaction import Collection, CollectionItem, Comment, WatchProgress, Favorite, Notification, NotificationCounter
 from .system import AuditLog, SiteSetting, Backup
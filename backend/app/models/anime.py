@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime, date
 from typing import Optional, List
-from sqlalchemy import String, Integer, Text, Date, DateTime, Numeric, Index
+from sqlalchemy import String, Integer, Text, Date, DateTime, Numeric, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from app.models.base import Base
@@ -59,6 +59,9 @@ class Anime(Base):
     views_count: Mapped[int] = mapped_column(Integer, default=0, index=True)
     favorites_count: Mapped[int] = mapped_column(Integer, default=0)
     
+    # Digest of the provider-mapped fields; unchanged syncs skip the write
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
     # Distributed Search
     search_vector: Mapped[Optional[TSVECTOR]] = mapped_column(TSVECTOR)
     
@@ -67,12 +70,30 @@ class Anime(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Invariants
-    episodes = relationship("Episode", back_populates="anime", cascade="all, delete-orphan", lazy="selectin")
+    # Never loaded implicitly: catalog queries don't need episodes, so callers
+    # opt in per query (see CRUDAnime ``with_episodes``). Deletes rely on the
+    # FK's ON DELETE CASCADE instead of loading the collection.
+    episodes = relationship(
+        "Episode",
+        back_populates="anime",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+        passive_deletes=True
+    )
 
     # Indices
     __table_args__ = (
         Index('ix_anime_search_vector', 'search_vector', postgresql_using='gin'),
         Index('ix_anime_genres_gin', 'genres', postgresql_using='gin'),
+        # Fuzzy search fallback (pg_trgm), see crud_anime.TRGM_FIELDS
+        Index('ix_anime_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_anime_title_en_trgm', 'title_en', postgresql_using='gin', postgresql_ops={'title_en': 'gin_trgm_ops'}),
+        Index(
+            'ix_anime_title_romaji_trgm', 'title_romaji',
+            postgresql_using='gin', postgresql_ops={'title_romaji': 'gin_trgm_ops'}
+        ),
+        # Default catalog order / keyset pagination (see crud_anime.CATALOG_ORDER)
+        Index('ix_anime_catalog_order', text('score_count DESC'), text('coalesce(score, 0) DESC'), text('id DESC')),
     )
 
     @property
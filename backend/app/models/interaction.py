@@ -137,3 +137,13 @@ class Notification(Base):
     
     is_read: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class NotificationCounter(Base):
+    """
+    Per-user unread notification count, maintained in the same transaction as
+    every write that changes it (see CRUDNotification) so reads never scan.
+    """
+    __tablename__ = "notification_counters"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Float, Text, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.models.base import Base
@@ -45,14 +45,19 @@ class ParserJob(Base):
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     duration_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    items_per_second: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     
     # Results
     items_processed: Mapped[int] = mapped_column(Integer, default=0)
     items_created: Mapped[int] = mapped_column(Integer, default=0)
     items_updated: Mapped[int] = mapped_column(Integer, default=0)
     items_skipped: Mapped[int] = mapped_column(Integer, default=0)
+    items_unchanged: Mapped[int] = mapped_column(Integer, default=0)
     items_failed: Mapped[int] = mapped_column(Integer, default=0)
     
+    # Resume point of an interrupted run: last fully committed page, item and stats
+    checkpoint: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+
     # Errors
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     error_details: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
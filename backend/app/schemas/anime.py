@@ -3,6 +3,7 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID
 from datetime import date, datetime
 from pydantic import BaseModel, ConfigDict, Field
+from app.schemas.episode import Episode
 
 # Shared properties
 class AnimeBase(BaseModel):
@@ -43,6 +44,25 @@ class Anime(AnimeBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# Detail view; episodes are only present when requested
+class AnimeDetail(Anime):
+    episodes: Optional[List[Episode]] = None
+
+# Catalog facet counts for a filter set, keyed by facet value
+class AnimeFacets(BaseModel):
+    total: int
+    genre: Dict[str, int] = {}
+    kind: Dict[str, int] = {}
+    status: Dict[str, int] = {}
+    year: Dict[str, int] = {}
+
+# Autocomplete entry; kept minimal for the search box
+class AnimeSuggestion(BaseModel):
+    id: UUID
+    slug: str
+    title: str
+    poster_url: Optional[str] = None
+
 class AnimeSearchResults(BaseModel):
     results: List[Anime]
     total: int
@@ -8,6 +8,10 @@ class ResponseMeta(BaseModel):
     per_page: Optional[int] = None
     total: Optional[int] = None
     total_pages: Optional[int] = None
+    # Keyset pagination: opaque cursor for the next page, None on the last one
+    next_cursor: Optional[str] = None
+    # True when ``total`` is an estimate rather than an exact count
+    estimated: Optional[bool] = None
 
 class DataResponse(BaseModel, Generic[T]):
     data: T
@@ -14,6 +14,9 @@ class GeneralConfig(BaseModel):
     proxy_pass: Optional[str] = None
     admin_path_pattern: str = "/admin.php"
     kodik_api_key: Optional[str] = None
+    kodik_bulk_sync: bool = True
+    kodik_list_max_pages: int = 20
+    kodik_probe_concurrency: int = 8
     cron_key: Optional[str] = None
     user_agent: str = "KitsuEngine/2.0 (Python/3.12)"
 
@@ -33,6 +36,7 @@ class AdvancedConfig(BaseModel):
     fuzzy_threshold: float = 0.85
     debug_logs: bool = False
     deep_sync_pages: int = 50
+    sync_shards: int = 4
     force_reprocess_media: bool = False
 
 class BlacklistConfig(BaseModel):
@@ -75,9 +79,13 @@ class ParserJobUpdate(BaseModel):
     items_created: Optional[int] = None
     items_updated: Optional[int] = None
     items_skipped: Optional[int] = None
+    items_unchanged: Optional[int] = None
     items_failed: Optional[int] = None
     error_message: Optional[str] = None
     completed_at: Optional[datetime] = None
+    duration_seconds: Optional[int] = None
+    items_per_second: Optional[float] = None
+    checkpoint: Optional[Dict[str, Any]] = None
 
 class ParserJob(ParserJobBase):
     id: UUID
@@ -87,19 +95,29 @@ class ParserJob(ParserJobBase):
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     duration_seconds: Optional[int] = None
+    items_per_second: Optional[float] = None
     
     items_processed: int
     items_created: int
     items_failed: int
     items_skipped: int = 0
+    items_unchanged: int = 0
     items_updated: int = 0
     
     error_message: Optional[str] = None
+    checkpoint: Optional[Dict[str, Any]] = None
     
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
 
+class ParserJobProgress(BaseModel):
+    """Latest telemetry snapshot published by the worker running the job."""
+    job_id: UUID
+    progress: int
+    stats: Dict[str, Any] = {}
+    updated_at: datetime
+
 # --- Parser Job Logs ---
 class ParserJobLogBase(BaseModel):
     level: str
@@ -1,10 +1,60 @@
-from typing import Any, Dict, Optional
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from uuid import UUID
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.system import AuditLog
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
 from app.core.logging import logger
 
 class AuditService:
+    """
+    Records audit events off the request path.
+
+    While the writer is running (API process, see ``lifespan``) events are
+    queued in a bounded in-process buffer and a background task inserts
+    them in multi-row batches on its own connection. When the buffer is full
+    events are dropped and counted rather than blocking the request. Without
+    a running writer (workers, scripts) events are written inline.
+    """
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self.stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "failed": 0,
+            "batches": 0, "last_flush_ms": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush everything still buffered."""
+        if not self.running:
+            return
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        if self._inflight and not self._inflight.done():
+            await self._inflight
+        while not self._queue.empty():
+            await self._flush(self._drain(settings.AUDIT_BATCH_SIZE))
+
     async def log_action(
         self,
         db: AsyncSession,
@@ -13,6 +63,7 @@ class AuditService:
         action: str,
         resource_type: str,
         resource_id: Optional[UUID] = None,
+        actor_ip: Optional[str] = None,
         meta: Optional[Dict[str, Any]] = None,
         success: bool = True,
         error_message: Optional[str] = None
@@ -20,26 +71,82 @@ class AuditService:
         """
         Record a system or administrative action for forensic analysis.
         """
+        entry = {
+            "id": uuid.uuid4(),
+            "actor_id": actor_id,
+            "actor_ip": actor_ip,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "meta_info": meta or {},
+            "success": success,
+            "error_message": error_message,
+            "created_at": datetime.utcnow()
+        }
+
+        if not self.running:
+            try:
+                db.add(AuditLog(**entry))
+                await db.commit()
+            except Exception as e:
+                logger.error("Audit Service: Storage Failure", error=str(e))
+            return
+
         try:
-            entry = AuditLog(
-                actor_id=actor_id,
-                action=action,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                meta_info=meta or {},
-                success=success,
-                error_message=error_message
-            )
-            db.add(entry)
-            await db.commit()
-            
-            logger.info(
-                "Audit: Action Recorded",
-                action=action,
-                resource=resource_type,
-                success=success
-            )
+            self._queue.put_nowait(entry)
+            self.stats["enqueued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning("Audit Service: Buffer full, event dropped", action=action, resource=resource_type)
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        interval = settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                # Block for the first event, then give the batch a short window to fill
+                batch = [await self._queue.get()]
+                if self._queue.qsize() < settings.AUDIT_BATCH_SIZE - 1:
+                    await asyncio.sleep(interval)
+                batch.extend(self._drain(settings.AUDIT_BATCH_SIZE - 1))
+                # Shielded so shutdown never cuts an insert in half; stop() awaits it
+                self._inflight, batch = asyncio.ensure_future(self._flush(batch)), []
+                await asyncio.shield(self._inflight)
+        except asyncio.CancelledError:
+            # Events already taken off the queue but not yet handed to a flush
+            await self._flush(batch)
+            raise
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            await self._write(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
         except Exception as e:
-            logger.error("Audit Service: Storage Failure", error=str(e))
+            self.stats["failed"] += len(batch)
+            logger.error("Audit Service: Batch storage failure", error=str(e), events=len(batch))
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(AuditLog), batch)
+            await session.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": settings.AUDIT_QUEUE_SIZE,
+        }
 
 audit_service = AuditService()
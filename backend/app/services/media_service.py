@@ -8,6 +8,8 @@ import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from app.core.config import settings
+from app.core.worker_runtime import worker_runtime
+from app.core.throttling import upstream, wait_retry_after
 from app.core.logging import logger
 
 class MediaService:
@@ -21,13 +23,15 @@ class MediaService:
 
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=2, max=10)),
         retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
         reraise=True
     )
     async def _download_asset(self, url: str) -> bytes:
         """Downloads remote asset with retry logic for transient failures."""
-        response = await self.client.get(url)
+        # The module-level client is bound to the first loop using it; worker tasks get the runtime's
+        client = worker_runtime.http_client("media", timeout=15.0) or self.client
+        response = await upstream.request(client, "GET", url)
         response.raise_for_status()
         return response.content
 
@@ -1,14 +1,24 @@
-from typing import List, Optional
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from uuid import UUID
+from sqlalchemy import func, insert, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.crud.crud_notification import notification as crud_notification
-from app.schemas.notification import NotificationCreate
-from app.models.interaction import Favorite
-from app.models.user import User
+from app.models.anime import Anime
+from app.models.interaction import Favorite, Notification, NotificationCounter
+from app.core.pubsub import push_notification
+from app.core.logging import logger
 
 class NotificationService:
+    """
+    Set-based notification fan-out: each broadcast is one statement (or one
+    batched multi-row insert) and one commit, however many recipients it has.
+    Unread counters are bumped in the same transaction, and each recipient
+    gets a push event with the new unread count once it commits.
+    """
     async def broadcast_to_users(
         self,
         db: AsyncSession,
@@ -18,20 +28,87 @@ class NotificationService:
         type: str = "info",
         target_id: Optional[UUID] = None,
         icon: Optional[str] = None
-    ):
+    ) -> Dict[str, Any]:
         """Dispatches a notification node to a specific cluster of users."""
-        for uid in user_ids:
-            await crud_notification.create(db, obj_in=NotificationCreate(
-                user_id=uid,
-                title=title,
-                message=message,
-                type=type,
-                target_id=target_id,
-                icon=icon
-            ))
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": uid, "title": title, "message": message, "type": type,
+                "target_id": target_id, "icon": icon, "is_read": False, "created_at": now
+            }
+            for uid in dict.fromkeys(user_ids)
+        ]
+        unread = {}
+        if rows:
+            await db.execute(insert(Notification), rows)
+            unread = await crud_notification.increment_unread(db, {row["user_id"]: 1 for row in rows})
+            await db.commit()
+            await push_notification(unread, title=title, message=message, type=type, target_id=target_id, icon=icon, created_at=now)
+        return self._report("users", len(rows), started, type=type)
 
-    async def notify_users_new_episode(self, *args, **kwargs):
-        """DEPRECATED: Use broadcast_to_users with filtered list logic."""
-        pass
+    async def broadcast_to_watchers(
+        self,
+        db: AsyncSession,
+        anime_id: UUID,
+        title: str,
+        message: str,
+        type: str = "info",
+        icon: Optional[str] = None,
+        category: str = "watching"
+    ) -> Dict[str, Any]:
+        """
+        Notify everyone with ``anime_id`` in the given favorites category via a
+        single INSERT ... SELECT; recipients never leave the database.
+        """
+        started = time.perf_counter()
+        values = {
+            "type": type, "target_type": "anime", "target_id": anime_id, "title": title,
+            "message": message, "icon": icon, "is_read": False, "created_at": datetime.utcnow()
+        }
+        columns = Notification.__table__.c
+        recipients = select(
+            func.gen_random_uuid(),
+            Favorite.user_id,
+            *(literal(value, columns[name].type) for name, value in values.items())
+        ).filter(Favorite.anime_id == anime_id, Favorite.category == category)
+
+        inserted = (
+            insert(Notification)
+            .from_select(["id", "user_id", *values], recipients)
+            .returning(Notification.user_id)
+            .cte("inserted")
+        )
+        # Counters are fed from the inserted rows, so they match exactly
+        counts = (
+            select(inserted.c.user_id, func.count())
+            .group_by(inserted.c.user_id)
+            .order_by(inserted.c.user_id)
+        )
+        result = await db.execute(
+            crud_notification.increment_unread_stmt(counts)
+            .returning(NotificationCounter.user_id, NotificationCounter.unread)
+        )
+        unread = dict(result.all())
+        await db.commit()
+        await push_notification(unread, **values)
+        return self._report("watchers", len(unread), started, type=type, anime_id=str(anime_id))
+
+    async def notify_users_new_episode(self, db: AsyncSession, anime: Anime, episode: int) -> Dict[str, Any]:
+        """New-episode broadcast to everyone currently watching ``anime``."""
+        return await self.broadcast_to_watchers(
+            db,
+            anime.id,
+            title=f"Новый эпизод: {anime.title}",
+            message=f"Серия {episode} уже доступна в HD.",
+            type="new_episode",
+            icon=anime.poster_url
+        )
+
+    @staticmethod
+    def _report(audience: str, count: int, started: float, **context) -> Dict[str, Any]:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("Notifications: Broadcast delivered", audience=audience, recipients=count, elapsed_ms=elapsed_ms, **context)
+        return {"recipients": count, "elapsed_ms": elapsed_ms}
 
 notification_service = NotificationService()
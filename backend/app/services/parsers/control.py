@@ -0,0 +1,44 @@
+from typing import Optional
+from app.core.cache import cache
+from app.core.logging import logger
+
+CONTROL_KEY_PREFIX = "job_control:"
+CONTROL_TTL_SECONDS = 86400
+ACTIONS = ("cancel", "pause")
+
+class ControlUnavailable(Exception):
+    """Raised when a control request cannot be recorded because Redis is unavailable."""
+
+class JobControlService:
+    """
+    Cooperative cancel/pause requests for running parser jobs.
+
+    The API records the request in Redis; the sync pipeline polls it and
+    stops between items, leaving its last checkpoint in place.
+    """
+    async def request(self, job_id: str, action: str) -> None:
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown job control action: {action}")
+        if not cache.redis:
+            raise ControlUnavailable(job_id)
+        try:
+            await cache.redis.set(f"{CONTROL_KEY_PREFIX}{job_id}", action, ex=CONTROL_TTL_SECONDS)
+        except Exception as e:
+            logger.error("Job control write failed", job_id=str(job_id), error=str(e))
+            raise ControlUnavailable(job_id) from e
+
+    async def get(self, job_id: str) -> Optional[str]:
+        if not cache.redis:
+            return None
+        try:
+            value = await cache.redis.get(f"{CONTROL_KEY_PREFIX}{job_id}")
+        except Exception as e:
+            logger.error("Job control read failed", job_id=str(job_id), error=str(e))
+            return None
+        return value.decode() if value else None
+
+    async def clear(self, job_id: str) -> None:
+        if cache.redis:
+            await cache.redis.delete(f"{CONTROL_KEY_PREFIX}{job_id}")
+
+job_control = JobControlService()
@@ -1,38 +1,45 @@
+import asyncio
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from app.models.anime import Anime
-from app.models.interaction import Favorite
 from app.crud.crud_episode import episode as crud_episode
 from app.crud.crud_release import release as crud_release
-from app.crud.crud_parser import parser_job_log as crud_parser_logs
-from app.schemas.episode import EpisodeCreate
-from app.schemas.release import ReleaseCreate
+from app.crud.crud_parser import parser_job_log as crud_parser_logs, parser_settings as crud_settings
 from app.schemas.parser import ParserJobLogCreate
 from app.core.config import settings
-from app.services.notification_service import notification_service
+from app.core.cache import cache
+from app.core.worker_runtime import worker_runtime
+from app.core.throttling import upstream, wait_retry_after
+from app.crud.crud_anime import anime_tag
 from app.core.logging import logger
 
+LIST_TYPES = "anime,anime-serial"
+LIST_PAGE_LIMIT = 100
+
 class KodikParserService:
     def __init__(self, proxy_config: Optional[Dict] = None):
         self.api_key = proxy_config.get('kodik_api_key') if proxy_config else settings.KODIK_API_KEY
-        self.client = httpx.AsyncClient(base_url=settings.KODIK_URL, timeout=20.0)
+        shared = worker_runtime.http_client("kodik", base_url=settings.KODIK_URL, timeout=20.0)
+        self._owns_client = shared is None
+        self.client = shared or httpx.AsyncClient(base_url=settings.KODIK_URL, timeout=20.0)
 
     async def close(self):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
 
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=2, max=10)),
         retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
         reraise=True
     )
     async def _probe_cdn_node(self, kodik_id: str) -> Optional[Dict[str, Any]]:
         """Probe CDN for latest segments with retry logic."""
-        res = await self.client.get('/search', params={
+        res = await upstream.request(self.client, 'GET', '/search', params={
             'token': self.api_key, 
             'id': kodik_id, 
             'with_episodes': 'true'
@@ -41,92 +48,200 @@ class KodikParserService:
         results = res.json().get('results', [])
         return results[0] if results else None
 
-    async def sync_ongoing_releases(self, db: AsyncSession, job_id: Optional[str] = None):
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=2, max=10)),
+        retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
+        reraise=True
+    )
+    async def _fetch_list_page(self, next_page: Optional[str] = None) -> Dict[str, Any]:
+        """One page of the /list feed, newest update first (``next_page`` is Kodik's cursor URL)."""
+        if next_page:
+            res = await upstream.request(self.client, 'GET', next_page)
+        else:
+            res = await upstream.request(self.client, 'GET', '/list', params={
+                'token': self.api_key,
+                'types': LIST_TYPES,
+                'sort': 'updated_at',
+                'order': 'desc',
+                'with_episodes': 'true',
+                'limit': LIST_PAGE_LIMIT
+            })
+        res.raise_for_status()
+        return res.json()
+
+    async def _collect_updates(
+        self, wanted: Set[str], since: Optional[str], max_pages: int
+    ) -> Tuple[Dict[str, Dict[str, Any]], Optional[str], bool]:
+        """
+        Pages the update feed until it reaches ``since`` (the previous run's
+        newest ``updated_at``), every wanted id has been seen, or the page
+        cap. Returns the newest material per wanted id, the feed's newest
+        ``updated_at`` (the next watermark) and whether the scan was
+        complete; after a capped scan the caller probes the ids it missed.
+        """
+        materials: Dict[str, Dict[str, Any]] = {}
+        newest, next_page = None, None
+        for _ in range(max_pages):
+            page = await self._fetch_list_page(next_page)
+            results = page.get('results', [])
+            for material in results:
+                updated_at = material.get('updated_at')
+                if since and updated_at and updated_at <= since:
+                    return materials, newest or since, True
+                newest = newest or updated_at
+                kodik_id = str(material.get('id'))
+                # Newest first: the first sighting of an id is its current state
+                if kodik_id in wanted and kodik_id not in materials:
+                    materials[kodik_id] = material
+            next_page = page.get('next_page')
+            if not results or not next_page or len(materials) == len(wanted):
+                return materials, newest or since, True
+        return materials, newest or since, False
+
+    async def _probe_all(self, animes: List[Anime], concurrency: int) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """
+        Per-title fallback: probes run concurrently, bounded by ``concurrency``.
+        Returns the materials found and the number of probes that failed.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def probe(anime: Anime):
+            async with semaphore:
+                try:
+                    return anime.kodik_id, await self._probe_cdn_node(anime.kodik_id)
+                except Exception as e:
+                    logger.error(f"Pulse_Sync_Fault: {anime.title}", error=str(e))
+                    return anime.kodik_id, e
+
+        results = await asyncio.gather(*(probe(anime) for anime in animes))
+        materials = {kodik_id: m for kodik_id, m in results if m and not isinstance(m, Exception)}
+        return materials, sum(isinstance(m, Exception) for _, m in results)
+
+    @staticmethod
+    def _cdn_episodes(material: Dict[str, Any]) -> Dict[Tuple[int, int], Optional[str]]:
+        """
+        ``(season, episode) -> episode link`` from a material's ``seasons``,
+        in either the nested (``{"episodes": {n: link}}``) or flat shape.
+        Links are None when the CDN does not list one per episode.
+        """
+        episodes: Dict[Tuple[int, int], Optional[str]] = {}
+        for season_key, season in (material.get('seasons') or {}).items():
+            try: season_num = int(season_key)
+            except ValueError: continue
+            for ep_key, value in season.get('episodes', season).items():
+                try: ep_num = int(ep_key)
+                except ValueError: continue
+                episodes[(season_num, ep_num)] = value if isinstance(value, str) else None
+        return episodes
+
+    async def sync_ongoing_releases(
+        self, db: AsyncSession, job_id: Optional[str] = None, config: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, int]]:
         """
         Pulse Engine: Scans all 'ongoing' anime in local DB and syncs with CDN cluster.
-        Automatically provisions Release nodes and notifies users.
+        Automatically provisions Release nodes and returns the committed
+        ``(anime_id, episode)`` announcements for the caller to fan out.
+
+        By default the CDN state comes from the bulk update feed, joined to
+        local titles on ``kodik_id`` and bounded by a stored watermark, so
+        only materials updated since the last pulse are looked at. If the
+        feed fails, titles are probed one by one with bounded concurrency.
         """
+        config = config or {}
         query = select(Anime).filter(Anime.status == 'ongoing', Anime.kodik_id.isnot(None))
         result = await db.execute(query)
         animes = result.scalars().all()
+        by_kodik_id = {anime.kodik_id: anime for anime in animes}
         
         if job_id:
             await crud_parser_logs.create(db, obj_in=ParserJobLogCreate(
                 parser_job_id=job_id, level="INFO", message=f"Pulse: Scanning {len(animes)} active nodes"
             ))
+
+        concurrency = config.get('kodik_probe_concurrency', 8)
+        materials, newest, probe_errors = None, None, 0
+        if animes and config.get('kodik_bulk_sync', True):
+            mark = await crud_settings.get_watermark(db, "kodik")
+            try:
+                materials, newest, complete = await self._collect_updates(
+                    set(by_kodik_id), (mark or {}).get('updated_at'), config.get('kodik_list_max_pages', 20)
+                )
+            except Exception as e:
+                logger.warning("Pulse: Update feed unavailable, probing titles", error=str(e))
+            else:
+                if not complete:
+                    # The cap stopped the scan above older updates; titles it did not reach are probed
+                    missed = [anime for kodik_id, anime in by_kodik_id.items() if kodik_id not in materials]
+                    probed, probe_errors = await self._probe_all(missed, concurrency)
+                    materials.update(probed)
+        if materials is None:
+            materials, probe_errors = await self._probe_all(animes, concurrency)
         
-        for anime in animes:
+        stale_tags = []
+        announcements = []
+        provisioned: Dict[str, int] = {}
+        failed = probe_errors > 0
+        for kodik_id, material in materials.items():
+            anime = by_kodik_id[kodik_id]
             try:
-                material = await self._probe_cdn_node(anime.kodik_id)
-                if not material: continue
-                
-                iframe_url = material.get('link')
-                
-                # 2. Extract max episode from CDN metadata
-                cdn_episodes = []
-                for season in material.get('seasons', {}).values():
-                    for ep_num in season.keys():
-                        try: cdn_episodes.append(int(ep_num))
-                        except ValueError: continue
-                
-                max_ep_cdn = max(cdn_episodes) if cdn_episodes else 0
+                # 2. Episodes the CDN serves, keyed by their real season
+                cdn_episodes = self._cdn_episodes(material)
+                if not cdn_episodes: continue
+                seasons: Dict[int, int] = {}
+                for season, ep_num in cdn_episodes:
+                    seasons[season] = max(seasons.get(season, 0), ep_num)
+                aired_cdn = sum(seasons.values())
                 
                 # 3. Provision new segments if CDN is ahead of local registry
-                if max_ep_cdn > anime.episodes_aired:
-                    start_ep = anime.episodes_aired + 1
-                    for ep_num in range(start_ep, max_ep_cdn + 1):
-                        if job_id:
-                            await crud_parser_logs.create(db, obj_in=ParserJobLogCreate(
-                                parser_job_id=job_id, 
-                                level="INFO", 
-                                message=f"Provisioning: {anime.title} Episode {ep_num}",
-                                item_id=str(anime.id),
-                                item_type="anime"
-                            ))
-                        
-                        # Episode Record
-                        new_ep = await crud_episode.create(db, obj_in=EpisodeCreate(
-                            anime_id=anime.id, 
-                            episode=ep_num, 
-                            season=1,
-                            title=f"Эпизод {ep_num}"
-                        ))
-                        
-                        # Release Node (CDN Endpoint)
-                        await crud_release.create(db, obj_in=ReleaseCreate(
-                            episode_id=new_ep.id,
-                            source='kodik',
-                            quality='1080p',
-                            url=iframe_url,
-                            embed_url=f"{iframe_url}?episode={ep_num}",
-                            translation_type='voice',
-                            is_active=True
-                        ))
+                if aired_cdn > anime.episodes_aired:
+                    iframe_url = material.get('link')
+                    rows = [
+                        {"anime_id": anime.id, "season": season, "episode": ep_num, "title": f"Эпизод {ep_num}"}
+                        for season, ep_num in sorted(cdn_episodes)
+                    ]
+                    async with db.begin_nested():
+                        # Existing (season, episode) keys are skipped; only new ones come back
+                        created = await crud_episode.create_many(db, rows)
+                        await crud_release.create_many(db, [
+                            {
+                                "episode_id": ep.id,
+                                "source": 'kodik',
+                                "quality": '1080p',
+                                "url": iframe_url,
+                                "embed_url": cdn_episodes[(ep.season, ep.episode)] or f"{iframe_url}?season={ep.season}&episode={ep.episode}",
+                                "translation_type": 'voice',
+                                "is_active": True
+                            }
+                            for ep in created
+                        ])
                     
                     # Update local state
-                    anime.episodes_aired = max_ep_cdn
+                    anime.episodes_aired = aired_cdn
                     db.add(anime)
+                    stale_tags.append(anime_tag(anime.id))
                     
-                    # 4. Notify Watchers
-                    fav_query = select(Favorite.user_id).filter(
-                        Favorite.anime_id == anime.id,
-                        Favorite.category == 'watching'
-                    )
-                    fav_res = await db.execute(fav_query)
-                    watchers = fav_res.scalars().all()
-                    
-                    if watchers:
-                        await notification_service.broadcast_to_users(
-                            db,
-                            user_ids=watchers,
-                            title=f"Новый эпизод: {anime.title}",
-                            message=f"Серия {max_ep_cdn} уже доступна в HD.",
-                            type="new_episode",
-                            target_id=anime.id,
-                            icon=anime.poster_url
-                        )
+                    # 4. Notify Watchers (dispatched by the task layer after commit)
+                    if created:
+                        provisioned[str(anime.id)] = len(created)
+                        latest = max(seasons)
+                        announcements.append((str(anime.id), seasons[latest]))
                     
             except Exception as e:
+                failed = True
                 logger.error(f"Pulse_Sync_Fault: {anime.title}", error=str(e))
         
+        if job_id and provisioned:
+            await crud_parser_logs.create_many(db, [ParserJobLogCreate(
+                parser_job_id=job_id,
+                level="INFO",
+                message=f"Provisioning: {sum(provisioned.values())} episodes across {len(provisioned)} titles",
+                details={"episodes_by_anime": provisioned}
+            )])
+        
+        # Set only when the feed was read; titles that failed keep it in place for a retry
+        if newest and not failed:
+            await crud_settings.set_watermark(db, "kodik", {"updated_at": newest})
         await db.commit()
+        await cache.invalidate(*stale_tags)
+        return announcements
@@ -17,7 +17,11 @@ class TaxonomyReconciliationService:
 
     async def reconcile_genres(self, db: AsyncSession, external_genres: List[str]) -> List[str]:
         """Maps external strings like 'Экшен' to internal taxonomy IDs or slugs."""
-        mapping = await self.get_mapping(db)
+        return self.apply_mapping(await self.get_mapping(db), external_genres)
+
+    @staticmethod
+    def apply_mapping(mapping: Dict[str, str], external_genres: List[str]) -> List[str]:
+        """Same as ``reconcile_genres`` with a mapping fetched once per job."""
         reconciled = []
         
         for genre in external_genres:
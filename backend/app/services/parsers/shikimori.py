@@ -2,13 +2,16 @@ import httpx
 import asyncio
 import re
 import json
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Set, Tuple
+from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from app.core.config import settings
-from app.crud.crud_anime import anime as crud_anime
+from app.core.cache import cache
+from app.crud.crud_anime import anime as crud_anime, CATALOG_TAG, content_hash
 from app.crud.crud_parser import (
     parser_job as crud_jobs, 
     parser_conflict as crud_conflicts,
@@ -17,27 +20,57 @@ from app.crud.crud_parser import (
 )
 from app.schemas.parser import ParserConflictCreate, ParserJobLogCreate
 from app.services.media_service import media_service
+from app.services.suggest_service import suggest_service
 from app.services.parsers.reconciliation import taxonomy_service
-from app.core.celery_app import publish_job_progress
+from app.services.parsers.control import job_control
+from app.core.celery_app import publish_job_progress, job_progress
+from app.core.worker_runtime import worker_runtime
+from app.core.throttling import upstream, wait_retry_after
 from app.core.logging import logger
 
+# Pipeline end-of-stream marker
+_DONE = object()
+# Items applied per write transaction (one Shikimori page)
+WRITE_BATCH_SIZE = 50
+EMPTY_STATS = {"proc": 0, "create": 0, "update": 0, "unchanged": 0, "fail": 0, "skip": 0}
+# How often a running pipeline checks for cancel/pause requests
+CONTROL_POLL_SECONDS = 1.0
+
+def _updated_mark(details: Dict) -> Optional[Tuple[datetime, int]]:
+    """``(updated_at, id)`` of a detail payload, in UTC, for watermark comparison."""
+    value = details.get('updated_at')
+    if not value:
+        return None
+    try:
+        updated = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if updated.tzinfo:
+        updated = updated.astimezone(timezone.utc).replace(tzinfo=None)
+    return updated, details['id']
+
 class ShikimoriParserService:
     def __init__(self, proxy_config: Optional[Dict[str, Any]] = None):
         self.base_url = settings.SHIKIMORI_URL
-        transport = None
+        transport, proxy_url = None, None
         if proxy_config and proxy_config.get('proxy_enabled'):
             proxy_url = proxy_config.get('proxy_address')
             if proxy_url: transport = httpx.AsyncHTTPTransport(proxy=proxy_url)
-        
-        self.client = httpx.AsyncClient(
+        user_agent = (proxy_config or {}).get('user_agent', 'KitsuEngine/2.0')
+        options = dict(
             base_url=self.base_url,
             transport=transport,
-            headers={'User-Agent': proxy_config.get('user_agent', 'KitsuEngine/2.0')},
+            headers={'User-Agent': user_agent},
             timeout=30.0
         )
+        # Inside a worker the client (and its connection pool) outlives the task
+        shared = worker_runtime.http_client(("shikimori", proxy_url, user_agent), **options)
+        self._owns_client = shared is None
+        self.client = shared or httpx.AsyncClient(**options)
 
     async def close(self):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
 
     async def _add_log(self, db: AsyncSession, job_id: str, level: str, message: str, details: Optional[Dict] = None):
         """Audit logging for the Dashboard Console."""
@@ -50,13 +83,13 @@ class ShikimoriParserService:
 
     @retry(
         stop=stop_after_attempt(3), 
-        wait=wait_exponential(multiplier=1, min=2, max=10),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=2, max=10)),
         retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
         reraise=True
     )
     async def get_full_data(self, external_id: str) -> Dict[str, Any]:
         """Fetch detailed data for a specific item with retry logic."""
-        response = await self.client.get(f'/api/animes/{external_id}')
+        response = await upstream.request(self.client, 'GET', f'/api/animes/{external_id}')
         # Only retry on 5xx or 429. Don't retry on 404.
         if response.status_code == 404:
             return None
@@ -65,13 +98,13 @@ class ShikimoriParserService:
 
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=2, max=10)),
         retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
         reraise=True
     )
     async def _fetch_page(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Fetch a page of results with retry logic."""
-        res = await self.client.get('/api/animes', params=params)
+        res = await upstream.request(self.client, 'GET', '/api/animes', params=params)
         res.raise_for_status()
         return res.json()
 
@@ -123,140 +156,564 @@ class ShikimoriParserService:
             "aired_on": data.get('aired_on')
         }
 
-    async def _passes_filters(self, db: AsyncSession, job_id: str, details: Dict, config: Dict, blacklist: Dict) -> bool:
-        """Grabbing Tab Logic: Policy enforcement."""
+    def _rejection(self, details: Dict, config: Dict, banned_ids: Set[int]) -> Optional[Tuple[str, str]]:
+        """Grabbing Tab Logic: policy enforcement. Returns ``(level, reason)`` for filtered items."""
         score = float(details.get('score', 0))
         if score < config.get('min_score', 0):
-            await self._add_log(db, job_id, "DEBUG", f"Filter: Score {score} is below threshold.")
-            return False
+            return "DEBUG", f"Filter: Score {score} is below threshold."
         
-        banned_ids_str = blacklist.get('banned_ids', '')
-        if banned_ids_str:
-            banned_ids = [int(i.strip()) for i in banned_ids_str.split(',') if i.strip().isdigit()]
-            if details['id'] in banned_ids:
-                await self._add_log(db, job_id, "WARNING", f"Blacklist: Blocked ID {details['id']}.")
-                return False
+        if details['id'] in banned_ids:
+            return "WARNING", f"Blacklist: Blocked ID {details['id']}."
 
         if not config.get('if_lgbt', True):
             forbidden = ['yaoi', 'yuri', 'shounen ai', 'shoujo ai', 'boys love', 'girls love', 'hentai']
             genres = [g['name'].lower() for g in details.get('genres', [])]
             if any(x in genres for x in forbidden):
-                await self._add_log(db, job_id, "DEBUG", f"Filter: LGBT/Hentai content blocked for {details['name']}.")
-                return False
+                return "DEBUG", f"Filter: LGBT/Hentai content blocked for {details['name']}."
         
         if not config.get('if_camrip', False):
             markers = ['camrip', 'ts', 'vcd', 'hdcam', 'screener']
             text = (details.get('name', '') + (details.get('russian', '') or '')).lower()
             if any(m in text for m in markers):
-                await self._add_log(db, job_id, "DEBUG", f"Filter: Low quality CAMRip marker found.")
-                return False
+                return "DEBUG", "Filter: Low quality CAMRip marker found."
             
-        return True
+        return None
 
-    async def _detect_conflict(self, db: AsyncSession, job_id: str, existing: Any, incoming: Dict) -> bool:
-        """Metadata reconciliation: Detects anomalies and creates admin tasks."""
+    def _detect_conflict(self, job_id: str, existing: Any, incoming: Dict) -> Optional[ParserConflictCreate]:
+        """Metadata reconciliation: Detects anomalies that need an admin decision."""
         reasons = []
         if incoming['episodes_total'] > 0 and existing.episodes_total and incoming['episodes_total'] < existing.episodes_total:
              reasons.append("episode_regression")
-        if abs(incoming['score'] - float(existing.score)) > 3.0:
+        if abs(incoming['score'] - float(existing.score or 0)) > 3.0:
              reasons.append("score_anomaly")
         if incoming['status'] == 'released' and existing.status == 'ongoing' and incoming['episodes_total'] == 0:
              reasons.append("status_sync_error")
 
-        if reasons:
-            await crud_conflicts.create(db, obj_in=ParserConflictCreate(
-                parser_job_id=job_id,
-                conflict_type=",".join(reasons),
-                item_type="anime",
-                item_id=existing.id,
-                external_id=str(incoming['shikimori_id']),
-                existing_data={"title": existing.title, "eps": existing.episodes_total, "score": float(existing.score), "status": existing.status},
-                incoming_data=incoming
-            ))
-            return True
-        return False
-
-    async def run_sync_task(self, db: AsyncSession, job_id: str, config: Dict, mode: str = "incremental"):
+        if not reasons:
+            return None
+        return ParserConflictCreate(
+            parser_job_id=job_id,
+            conflict_type=",".join(reasons),
+            item_type="anime",
+            item_id=existing.id,
+            external_id=str(incoming['shikimori_id']),
+            existing_data={"title": existing.title, "eps": existing.episodes_total, "score": float(existing.score or 0), "status": existing.status},
+            incoming_data=incoming
+        )
+
+    async def run_sync_task(
+        self, db: AsyncSession, job_id: str, config: Dict, mode: str = "incremental",
+        resume: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Runs (or, given a ``resume`` checkpoint, continues) a sync job. The
+        checkpoint records the last page whose items are all committed, so a
+        resumed run starts on the page after it with the saved stats.
+        """
         job = await crud_jobs.get(db, id=job_id)
-        if not job: return
+        if not job or job.status == "cancelled": return
         
-        await crud_jobs.update(db, db_obj=job, obj_in={"status": "running", "started_at": datetime.utcnow()})
-        await self._add_log(db, job_id, "INFO", f"Sync Node Initialized. Mode: {mode}")
+        started_at = job.started_at if resume and job.started_at else datetime.utcnow()
+        await crud_jobs.update(db, db_obj=job, obj_in={"status": "running", "started_at": started_at})
+        stats = dict(EMPTY_STATS)
+        start_page = 1
+        if resume:
+            stats.update(resume.get('stats', {}))
+            start_page = resume['page'] + 1
+            await self._add_log(db, job_id, "INFO", f"Sync Node Resumed at page {start_page}. Mode: {mode}")
+        else:
+            await self._add_log(db, job_id, "INFO", f"Sync Node Initialized. Mode: {mode}")
         
-        stats = {"proc": 0, "create": 0, "update": 0, "fail": 0, "skip": 0}
-        semaphore = asyncio.Semaphore(config.get('async_semaphores', 5))
-        bl_settings = await crud_settings.get_by_category(db, "blacklist")
-        blacklist = bl_settings.config if bl_settings else {}
+        banned_ids, genre_mapping = await self._load_policies(db)
+        watermark = None
+        if mode == "incremental":
+            stored = await crud_settings.get_watermark(db, "shikimori")
+            if stored:
+                watermark = (datetime.fromisoformat(stored['updated_at']), stored['id'])
+        started = time.perf_counter()
 
         try:
-            pages = 5 if mode == "incremental" else config.get('deep_sync_pages', 50)
-            for page in range(1, pages + 1):
-                params = {'page': page, 'limit': 50, 'order': 'ranked'}
-                if mode == "incremental": params['order'] = 'updated'
-                
-                try:
-                    items = await self._fetch_page(params)
-                except Exception as e:
-                    await self._add_log(db, job_id, "ERROR", f"Failed to fetch page {page} after retries: {str(e)}")
-                    continue
-
-                if not items: break
-                
-                for item in items:
-                    async with semaphore:
-                        try:
-                            stats["proc"] += 1
-                            details = await self.get_full_data(str(item['id']))
-                            
-                            if not details:
-                                stats["skip"] += 1; continue
-
-                            if not await self._passes_filters(db, job_id, details, config, blacklist):
-                                stats["skip"] += 1; continue
-
-                            mapped = self._apply_templates(details, config)
-                            mapped['genres'] = await taxonomy_service.reconcile_genres(db, mapped['genres'])
-
-                            if config.get('localize_images', True) and mapped['poster_url']:
-                                try:
-                                    mapped['poster_url'] = await media_service.process_image(
-                                        mapped['poster_url'], "posters", mapped['slug'], config
-                                    )
-                                except Exception:
-                                    await self._add_log(db, job_id, "ERROR", f"Media pipeline fault for {mapped['title']}")
-
-                            existing = await crud_anime.get_by_shikimori_id(db, shikimori_id=mapped['shikimori_id'])
-                            if existing:
-                                if await self._detect_conflict(db, job_id, existing, mapped):
-                                    stats["skip"] += 1; continue
-                                if config.get('auto_update', True):
-                                    await crud_anime.update(db, db_obj=existing, obj_in=mapped)
-                                    stats["update"] += 1
-                            else:
-                                await crud_anime.create(db, obj_in=mapped)
-                                stats["create"] += 1
-
-                            if stats["proc"] % 5 == 0:
-                                await publish_job_progress(job_id, int((page/pages)*100), stats)
-
-                        except Exception as e:
-                            stats["fail"] += 1
-                            await self._add_log(db, job_id, "ERROR", f"Ingestion error for ID {item.get('id')}: {str(e)}")
-
-                await asyncio.sleep(config.get('request_delay_ms', 200) / 1000)
+            if mode != "incremental":
+                pages = config.get('deep_sync_pages', 50)
+            else:
+                # With a mark, paging stops at already-seen items; the cap only bounds a backlog
+                pages = config.get('incremental_max_pages', 20) if watermark else 5
+            newest, stopped = await self._run_pipeline(
+                db, job_id, config, mode, pages, stats, banned_ids, genre_mapping,
+                watermark=watermark, start_page=start_page
+            )
+            if stopped:
+                await self._stop_job(db, job, stopped, stats)
+                return
+            if mode == "incremental" and newest and newest != watermark:
+                if stats["fail"]:
+                    await self._add_log(db, job_id, "WARNING", "Watermark kept: failed items will be retried next run.")
+                else:
+                    await crud_settings.set_watermark(db, "shikimori", {"updated_at": newest[0].isoformat(), "id": newest[1]})
 
+            elapsed = time.perf_counter() - started
             await crud_jobs.update(db, db_obj=job, obj_in={
                 "status": "completed", 
                 "progress": 100, 
                 "completed_at": datetime.utcnow(),
-                "items_processed": stats["proc"],
-                "items_created": stats["create"],
-                "items_updated": stats["update"],
-                "items_failed": stats["fail"]
+                "duration_seconds": int(elapsed),
+                "items_per_second": round(stats["proc"] / elapsed, 2) if elapsed else None,
+                **self._result_fields(stats),
+                "checkpoint": None
             })
-            await publish_job_progress(job_id, 100, stats)
+            await publish_job_progress(job_id, 100, stats, final=True)
             await self._add_log(db, job_id, "INFO", f"Job finalized. Reconciled {stats['proc']} nodes.")
             
         except Exception as e:
             logger.exception(f"Sync_Fatal: Job {job_id}")
             await crud_jobs.update(db, db_obj=job, obj_in={"status": "failed", "error_message": str(e)})
+
+    @staticmethod
+    def plan_shards(pages: int, shards: int) -> List[Tuple[int, int]]:
+        """Split pages ``1..pages`` into up to ``shards`` contiguous, near-equal ranges."""
+        shards = max(1, min(shards, pages))
+        size, extra = divmod(pages, shards)
+        plan, start = [], 1
+        for i in range(shards):
+            end = start + size - 1 + (1 if i < extra else 0)
+            plan.append((start, end))
+            start = end + 1
+        return plan
+
+    async def run_shard(
+        self, db: AsyncSession, job_id: str, config: Dict, shard: int, start_page: int, end_page: int,
+        total_pages: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Full sync of pages ``start_page..end_page`` as one shard of a fanned-out
+        job. The parent job's lifecycle is settled by ``finalize_shards``; the
+        shard only returns its stats and whether it was stopped. Checkpoints
+        are kept per shard, so a resumed job continues every shard in place.
+        Live progress is aggregated over all shards' pages (``total_pages``).
+        """
+        job = await crud_jobs.get(db, id=job_id)
+        stats = dict(EMPTY_STATS)
+        if not job or job.status == "cancelled":
+            return {"shard": shard, "stats": stats, "stopped": "cancel", "error": None}
+
+        resume = ((job.checkpoint or {}).get("shards") or {}).get(str(shard))
+        first_page = start_page
+        if resume:
+            stats.update(resume.get('stats', {}))
+            first_page = resume['page'] + 1
+        await self._add_log(db, job_id, "INFO", f"Shard {shard}: pages {first_page}-{end_page}")
+        if first_page > end_page:
+            return {"shard": shard, "stats": stats, "stopped": None, "error": None}
+
+        banned_ids, genre_mapping = await self._load_policies(db)
+        try:
+            _, stopped = await self._run_pipeline(
+                db, job_id, config, "full", end_page, stats, banned_ids, genre_mapping,
+                start_page=first_page, range_start=start_page, shard=shard,
+                total_pages=total_pages or end_page
+            )
+        except Exception as e:
+            logger.exception(f"Sync_Fatal: Job {job_id} shard {shard}")
+            return {"shard": shard, "stats": stats, "stopped": None, "error": str(e)}
+        return {"shard": shard, "stats": stats, "stopped": stopped, "error": None}
+
+    async def finalize_shards(self, db: AsyncSession, job_id: str, results: List[Dict[str, Any]]):
+        """Aggregate shard results into the parent job and settle its status."""
+        job = await crud_jobs.get(db, id=job_id)
+        if not job: return
+        stats = dict(EMPTY_STATS)
+        for result in results:
+            for key in stats:
+                stats[key] += result["stats"].get(key, 0)
+
+        stopped = {r["stopped"] for r in results if r["stopped"]}
+        errors = [f"shard {r['shard']}: {r['error']}" for r in results if r["error"]]
+        if stopped:
+            await self._stop_job(db, job, "cancel" if "cancel" in stopped else "pause", stats)
+            return
+        if errors:
+            # Checkpoints stay in place; resuming re-runs only the unfinished shard pages
+            await crud_jobs.update(db, db_obj=job, obj_in={
+                "status": "failed", "error_message": "; ".join(errors), **self._result_fields(stats)
+            })
+            await publish_job_progress(job_id, job.progress or 0, stats, final=True)
+            return
+
+        elapsed = (datetime.utcnow() - job.started_at).total_seconds() if job.started_at else 0
+        await crud_jobs.update(db, db_obj=job, obj_in={
+            "status": "completed",
+            "progress": 100,
+            "completed_at": datetime.utcnow(),
+            "duration_seconds": int(elapsed),
+            "items_per_second": round(stats["proc"] / elapsed, 2) if elapsed else None,
+            **self._result_fields(stats),
+            "checkpoint": None
+        })
+        await publish_job_progress(job_id, 100, stats, final=True)
+        await job_progress.clear_shards(job_id)
+        await self._add_log(db, job_id, "INFO", f"Job finalized across {len(results)} shards. Reconciled {stats['proc']} nodes.")
+
+    async def _load_policies(self, db: AsyncSession) -> Tuple[Set[int], Dict[str, str]]:
+        """Blacklisted ids and the genre mapping, fetched once per run."""
+        bl_settings = await crud_settings.get_by_category(db, "blacklist")
+        banned_ids_str = (bl_settings.config if bl_settings else {}).get('banned_ids', '')
+        banned_ids = {int(i.strip()) for i in banned_ids_str.split(',') if i.strip().isdigit()}
+        return banned_ids, await taxonomy_service.get_mapping(db)
+
+    @staticmethod
+    def _result_fields(stats: Dict[str, int]) -> Dict[str, int]:
+        return {
+            "items_processed": stats["proc"],
+            "items_created": stats["create"],
+            "items_updated": stats["update"],
+            "items_skipped": stats["skip"],
+            "items_unchanged": stats["unchanged"],
+            "items_failed": stats["fail"],
+        }
+
+    async def _stop_job(self, db: AsyncSession, job: Any, action: str, stats: Dict[str, int]):
+        """Settle a job stopped by a cancel/pause request; its checkpoint is kept for resume."""
+        status = "cancelled" if action == "cancel" else "paused"
+        await crud_jobs.update(db, db_obj=job, obj_in={
+            "status": status,
+            **self._result_fields(stats),
+            **({"completed_at": datetime.utcnow()} if status == "cancelled" else {})
+        })
+        await job_control.clear(str(job.id))
+        await publish_job_progress(str(job.id), job.progress or 0, stats, final=True)
+        await self._add_log(db, str(job.id), "WARNING", f"Job {status} on request after {stats['proc']} nodes.")
+
+    async def _run_pipeline(
+        self, db: AsyncSession, job_id: str, config: Dict, mode: str, pages: int,
+        stats: Dict[str, int], banned_ids: Set[int], genre_mapping: Dict[str, str],
+        watermark: Optional[Tuple[datetime, int]] = None, start_page: int = 1,
+        range_start: int = 1, shard: Optional[int] = None, total_pages: Optional[int] = None
+    ) -> Tuple[Optional[Tuple[datetime, int]], Optional[str]]:
+        """
+        Bounded producer/consumer pipeline:
+        pages -> details (N) -> filter/map -> media (M) -> single DB writer.
+
+        Every stage has its own worker count and hands off through a bounded
+        queue, so detail fetches, image work and DB writes overlap while a slow
+        stage applies back-pressure upstream. Only the writer touches the
+        session; other stages report skips and errors to it as events.
+
+        With a ``watermark`` (``updated``-ordered listing) each page is drained
+        before the next is requested, and paging stops at the first page that
+        reaches items at or below the mark.
+
+        Cancel/pause requests are polled while running; once one arrives no
+        further pages are listed and queued items are dropped unprocessed.
+
+        Stored content hashes are loaded per listed page, and mapped items
+        whose hash (taken before media localization) matches are dropped as
+        unchanged before the media stage. The writer shares the session, so
+        both take ``db_lock`` around their queries.
+
+        ``pages`` is the last page to list; ``range_start``/``shard`` identify
+        the page range of a fanned-out full sync for progress and checkpoints,
+        and ``total_pages`` the page count of the whole job.
+
+        Returns ``(newest, stopped)``: the newest ``(updated_at, id)`` seen
+        when the run covered everything since the mark (else None), and the
+        control action that stopped the run, if any.
+        """
+        detail_workers = max(1, config.get('async_semaphores', 5))
+        media_workers = max(1, config.get('media_concurrency', 4))
+        depth = max(1, config.get('pipeline_queue_size', 100))
+        listed, fetched, mapped, written = (asyncio.Queue(maxsize=depth) for _ in range(4))
+        newest, reached, exhausted, failed_pages = watermark, False, False, 0
+        stopped: Optional[str] = None
+        remaining: Dict[int, int] = {}
+        drained: Dict[int, asyncio.Event] = {}
+        known_hashes: Dict[int, Optional[str]] = {}
+        # A forced media reprocess must reach the media stage even for unchanged titles
+        force_media = config.get('force_reprocess_media', False)
+        db_lock = asyncio.Lock()
+
+        async def list_pages():
+            nonlocal exhausted, failed_pages
+            for page in range(start_page, pages + 1):
+                if reached or stopped: break
+                params = {'page': page, 'limit': 50, 'order': 'ranked'}
+                if mode == "incremental": params['order'] = 'updated'
+
+                try:
+                    items = await self._fetch_page(params)
+                except Exception as e:
+                    failed_pages += 1
+                    # Never marked listed, so the checkpoint cannot move past it
+                    await written.put(("log", page, ("ERROR", f"Failed to fetch page {page} after retries: {str(e)}")))
+                    continue
+
+                if not items:
+                    exhausted = True
+                    break
+                if not force_media:
+                    async with db_lock:
+                        known_hashes.update(await crud_anime.get_content_hashes(db, (i['id'] for i in items)))
+                # Ahead of the page's items in the writer queue, so it can tell when the page is done
+                await written.put(("listed", page, len(items)))
+                if watermark:
+                    remaining[page], drained[page] = len(items), asyncio.Event()
+                for item in items:
+                    await listed.put((page, item))
+                if watermark:
+                    await drained[page].wait()
+                # Pacing comes from the host throttle; this is only an optional extra delay
+                if config.get('request_delay_ms'):
+                    await asyncio.sleep(config['request_delay_ms'] / 1000)
+            for _ in range(detail_workers):
+                await listed.put(_DONE)
+
+        async def fetch_details(page: int, item: Dict):
+            nonlocal newest, reached
+            try:
+                if stopped:
+                    return None  # Left open, so the checkpoint stays before this page
+                if reached:
+                    # Older than the mark, so never fetched; only closes the page
+                    await written.put(("dropped", page, None))
+                    return None
+                stats["proc"] += 1
+                details = await self.get_full_data(str(item['id']))
+                if not details:
+                    await written.put(("skip", page, None))
+                    return None
+                seen = _updated_mark(details)
+                if seen and watermark and seen <= watermark:
+                    reached = True
+                    await written.put(("unchanged", page, None))
+                    return None
+                if seen and (newest is None or seen > newest):
+                    newest = seen
+                return page, details
+            finally:
+                if page in remaining:
+                    remaining[page] -= 1
+                    if not remaining[page]:
+                        drained[page].set()
+
+        async def map_item(page: int, details: Dict):
+            rejection = self._rejection(details, config, banned_ids)
+            if rejection:
+                await written.put(("skip", page, rejection))
+                return None
+            item = self._apply_templates(details, config)
+            item['genres'] = taxonomy_service.apply_mapping(genre_mapping, item['genres'])
+            # Hashed before localization, so an unchanged title never reaches the media stage
+            item['content_hash'] = content_hash(item)
+            if not force_media and known_hashes.get(item['shikimori_id']) == item['content_hash']:
+                await written.put(("unchanged", page, None))
+                return None
+            return page, item
+
+        async def localize_media(page: int, item: Dict):
+            if config.get('localize_images', True) and item['poster_url']:
+                source = item['poster_url']
+                try:
+                    item['poster_url'] = await media_service.process_image(
+                        source, "posters", item['slug'], config
+                    )
+                except Exception:
+                    await written.put(("log", page, ("ERROR", f"Media pipeline fault for {item['title']}")))
+                # process_image hands the source URL back when it gives up; store a hash
+                # the next sync cannot match, so the title is localized again
+                if item['poster_url'] in (None, source):
+                    item['poster_url'] = source
+                    item['content_hash'] = content_hash({**item, 'media_pending': True})
+            return "item", page, item
+
+        async def stage(inbox: asyncio.Queue, outbox: asyncio.Queue, handler, workers: int, downstream: int):
+            async def work():
+                while (entry := await inbox.get()) is not _DONE:
+                    page, payload = entry
+                    try:
+                        result = await handler(page, payload)
+                    except Exception as e:
+                        external_id = payload.get('id') or payload.get('shikimori_id')
+                        await written.put(("fail", page, f"Ingestion error for ID {external_id}: {str(e)}"))
+                        continue
+                    if result is not None:
+                        await outbox.put(result)
+
+            await asyncio.gather(*(work() for _ in range(workers)))
+            for _ in range(downstream):
+                await outbox.put(_DONE)
+
+        upstream = asyncio.gather(
+            list_pages(),
+            stage(listed, fetched, fetch_details, detail_workers, 1),
+            stage(fetched, mapped, map_item, 1, media_workers),
+            stage(mapped, written, localize_media, media_workers, 1),
+        )
+        async def watch_control():
+            nonlocal stopped
+            while not stopped:
+                await asyncio.sleep(CONTROL_POLL_SECONDS)
+                stopped = await job_control.get(job_id)
+
+        writer = asyncio.ensure_future(self._write_stage(
+            db, job_id, config, pages, stats, written, start_page, range_start, shard, db_lock, total_pages
+        ))
+        watcher = asyncio.ensure_future(watch_control())
+        try:
+            await asyncio.gather(upstream, writer)
+        finally:
+            upstream.cancel()
+            writer.cancel()
+            watcher.cancel()
+
+        complete = not failed_pages and not stopped and (watermark is None or reached or exhausted)
+        return (newest if complete else None), stopped
+
+    async def _write_stage(
+        self, db: AsyncSession, job_id: str, config: Dict, pages: int, stats: Dict[str, int],
+        inbox: asyncio.Queue, start_page: int = 1, range_start: int = 1, shard: Optional[int] = None,
+        db_lock: Optional[asyncio.Lock] = None, total_pages: Optional[int] = None
+    ):
+        """
+        Sole owner of the session. Buffers items and log lines and applies
+        them in a single transaction every ``WRITE_BATCH_SIZE`` items or when
+        a page completes; reports progress per event.
+
+        Every listed item ends in exactly one terminal event, so a page is
+        complete once its event count reaches its size. The checkpoint (last
+        contiguous complete page) is saved in the same transaction as the
+        page's writes.
+
+        A shard reports progress for the parent job: after each completed
+        page it records its pages and stats, then publishes the totals over
+        all shards against ``total_pages``.
+        """
+        db_lock = db_lock or asyncio.Lock()
+        items: List[Dict] = []
+        logs: List[ParserJobLogCreate] = []
+        last_page = 0
+        sizes: Dict[int, int] = {}
+        received: Dict[int, int] = defaultdict(int)
+        done_through = saved_through = reported_through = start_page - 1
+        last_item = None
+
+        def log(level: str, message: str):
+            logs.append(ParserJobLogCreate(parser_job_id=job_id, level=level, message=message))
+
+        while (event := await inbox.get()) is not _DONE:
+            kind, page, payload = event
+            last_page = max(last_page, page)
+
+            if kind == "listed":
+                sizes[page] = payload
+            elif kind == "log":
+                log(*payload)
+            elif kind == "unchanged":
+                stats["unchanged"] += 1
+            elif kind == "dropped":
+                pass
+            elif kind == "skip":
+                stats["skip"] += 1
+                if payload:
+                    log(*payload)
+            elif kind == "fail":
+                stats["fail"] += 1
+                log("ERROR", payload)
+            else:
+                items.append(payload)
+                last_item = payload['shikimori_id']
+            if kind not in ("listed", "log"):
+                received[page] += 1
+
+            while done_through + 1 in sizes and received[done_through + 1] >= sizes[done_through + 1]:
+                done_through += 1
+            if len(items) >= WRITE_BATCH_SIZE or done_through > saved_through:
+                checkpoint = None
+                if done_through > saved_through:
+                    checkpoint = {"page": done_through, "item": last_item}
+                    saved_through = done_through
+                async with db_lock:
+                    await self._write_batch(db, job_id, config, stats, items, logs, checkpoint, shard)
+                items, logs = [], []
+
+            if shard is None:
+                # Coalesced by the publisher, so reporting every event is cheap
+                progress = int((max(last_page - range_start + 1, 0) / (pages - range_start + 1)) * 100)
+                await publish_job_progress(job_id, progress, stats)
+            elif done_through > reported_through:
+                reported_through = done_through
+                totals = await job_progress.record_shard(job_id, shard, done_through - range_start + 1, stats)
+                if totals:
+                    # 100 is left to finalize_shards, once every shard has reported back
+                    progress = min(99, int(totals[0] / (total_pages or pages) * 100))
+                    await publish_job_progress(job_id, progress, totals[1])
+
+        async with db_lock:
+            await self._write_batch(db, job_id, config, stats, items, logs)
+
+    async def _write_batch(
+        self, db: AsyncSession, job_id: str, config: Dict, stats: Dict[str, int],
+        items: List[Dict], logs: List[ParserJobLogCreate], checkpoint: Optional[Dict[str, Any]] = None,
+        shard: Optional[int] = None
+    ):
+        """
+        One transaction for a batch: a single upsert keyed by shikimori_id plus
+        bulk inserts of conflicts and logs. If the batch statement fails (e.g. a
+        slug collision) rows are retried one by one in savepoints so a single
+        bad row only fails itself.
+        """
+        if not items and not logs and not checkpoint:
+            return
+        existing = await crud_anime.get_many_by_shikimori_ids(db, (i['shikimori_id'] for i in items))
+        rows, conflicts, stale_tags = [], [], set()
+        for item in items:
+            # Normally set by the map stage from the pre-localization fields
+            item.setdefault('content_hash', content_hash(item))
+            current = existing.get(item['shikimori_id'])
+            if (current is not None and not config.get('force_reprocess_media', False)
+                    and current.content_hash == item['content_hash']):
+                # Same source data: no write, no trigger, no cache churn
+                stats["unchanged"] += 1
+                continue
+            if current is None:
+                rows.append(item)
+                continue
+            conflict = self._detect_conflict(job_id, current, item)
+            if conflict:
+                conflicts.append(conflict)
+                stats["skip"] += 1
+            elif config.get('auto_update', True):
+                stale_tags.update(crud_anime.invalidation_tags(current, item))
+                rows.append(item)
+
+        try:
+            written = await crud_anime.upsert_many(db, rows)
+            # Rows a concurrent writer already brought up to date are not returned
+            stats["unchanged"] += len(rows) - len(written)
+        except Exception as e:
+            await db.rollback()
+            logger.warning("Sync: Batch upsert failed, retrying per row", job_id=job_id, error=str(e))
+            written = []
+            for row in rows:
+                try:
+                    async with db.begin_nested():
+                        returned = await crud_anime.upsert_many(db, [row])
+                    written.extend(returned)
+                    stats["unchanged"] += 1 - len(returned)
+                except Exception as row_error:
+                    stats["fail"] += 1
+                    logs.append(ParserJobLogCreate(
+                        parser_job_id=job_id, level="ERROR",
+                        message=f"Ingestion error for ID {row['shikimori_id']}: {str(row_error)}"
+                    ))
+
+        for row in written:
+            stats["create" if row.created else "update"] += 1
+            if row.created:
+                stale_tags.add(CATALOG_TAG)
+
+        await crud_conflicts.create_many(db, conflicts)
+        await crud_parser_logs.create_many(db, logs)
+        if checkpoint:
+            await crud_jobs.save_checkpoint(db, job_id, {**checkpoint, "stats": dict(stats)}, shard=shard)
+        await db.commit()
+        await cache.invalidate(*stale_tags)
+        await suggest_service.index(*written)
@@ -4,23 +4,22 @@ from sqlalchemy.future import select
 from app.models.system import SiteSetting
 from app.core.cache import cache
 
+SITE_SETTINGS_TAG = "site_settings"
+
 class SiteSettingsService:
     async def get_all_settings(self, db: AsyncSession, public_only: bool = False) -> Dict[str, Any]:
         """Fetch all settings from the database and cache."""
         cache_key = f"site_settings:{'public' if public_only else 'all'}"
-        cached_val = await cache.get(cache_key)
-        if cached_val:
-            return cached_val
 
-        query = select(SiteSetting)
-        if public_only:
-            query = query.filter(SiteSetting.is_public == True)
-        
-        result = await db.execute(query)
-        settings_map = {s.key: s.value for s in result.scalars().all()}
-        
-        await cache.set(cache_key, settings_map, expire=600)
-        return settings_map
+        async def load_settings():
+            query = select(SiteSetting)
+            if public_only:
+                query = query.filter(SiteSetting.is_public == True)
+
+            result = await db.execute(query)
+            return {s.key: s.value for s in result.scalars().all()}
+
+        return await cache.get_or_set(cache_key, load_settings, expire=600, tags=[SITE_SETTINGS_TAG])
 
     async def update_settings(self, db: AsyncSession, updates: Dict[str, Any]) -> None:
         """Apply batch updates to site settings and invalidate cache."""
@@ -32,6 +31,6 @@ class SiteSettingsService:
                 db.add(setting)
         
         await db.commit()
-        await cache.clear_prefix("site_settings")
+        await cache.invalidate(SITE_SETTINGS_TAG)
 
 site_settings_service = SiteSettingsService()
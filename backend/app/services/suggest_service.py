@@ -0,0 +1,164 @@
+import re
+import json
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import desc, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.anime import Anime
+from app.core.cache import cache
+from app.core.logging import logger
+
+# --- Prefix Index Layout ---
+# suggest:p:{prefix} -> ZSET of anime ids scored by popularity, trimmed to the
+#                       top MAX_PER_PREFIX entries
+# suggest:docs       -> HASH id -> JSON document (display fields + indexed names)
+PREFIX_KEY = "suggest:p:"
+DOCS_KEY = "suggest:docs"
+MAX_PREFIX_LEN = 12
+MAX_PER_PREFIX = 50
+REBUILD_BATCH = 500
+
+def normalize(text: Optional[str]) -> str:
+    """Case-folded words only; ё/е are treated as the same letter."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return " ".join(re.findall(r"\w+", text))
+
+def prefixes(names: Iterable[str]) -> Set[str]:
+    """Prefixes of each name starting at every word, so inner words match too."""
+    result: Set[str] = set()
+    for name in names:
+        starts = [0] + [m.end() for m in re.finditer(" ", name)]
+        for start in starts:
+            tail = name[start:start + MAX_PREFIX_LEN]
+            result.update(tail[:k].rstrip() for k in range(1, len(tail) + 1))
+    result.discard("")
+    return result
+
+def _names(anime: Anime) -> List[str]:
+    candidates = [anime.title, anime.title_en, anime.title_romaji, *(anime.synonyms or [])]
+    return sorted({n for n in map(normalize, candidates) if n})
+
+def _popularity(anime: Anime) -> float:
+    return float((anime.views_count or 0) + (anime.score_count or 0))
+
+class SuggestService:
+    """
+    Search-box autocomplete backed by a Redis prefix index.
+
+    A lookup is one ZREVRANGE on the query's prefix key plus one HMGET for the
+    documents. Writers call ``index``/``remove`` as anime change; ``rebuild``
+    re-indexes the whole catalog in place without taking the index offline.
+    Redis errors never fail the caller: lookups fall back to the database and
+    index writes are logged and dropped.
+    """
+    @property
+    def redis(self):
+        return cache.redis if cache.enabled else None
+
+    async def suggest(self, db: AsyncSession, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        term = normalize(q)
+        if not term:
+            return []
+        if not self.redis:
+            return await self._suggest_from_db(db, q, limit)
+
+        # Longer queries share the capped prefix key and are narrowed below
+        overflow = len(term) > MAX_PREFIX_LEN
+        try:
+            ids = await self.redis.zrevrange(f"{PREFIX_KEY}{term[:MAX_PREFIX_LEN]}", 0, (limit * 3 if overflow else limit) - 1)
+            if not ids:
+                return []
+            docs = [json.loads(d) for d in await self.redis.hmget(DOCS_KEY, ids) if d]
+        except Exception as e:
+            logger.error("Suggest: Index lookup failed", error=str(e))
+            return await self._suggest_from_db(db, q, limit)
+        if overflow:
+            docs = [d for d in docs if any(f" {term}" in f" {n}" for n in d["names"])]
+        return [{k: d[k] for k in ("id", "slug", "title", "poster_url")} for d in docs[:limit]]
+
+    async def _suggest_from_db(self, db: AsyncSession, q: str, limit: int) -> List[Dict[str, Any]]:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = (
+            select(Anime.id, Anime.slug, Anime.title, Anime.poster_url)
+            .filter(or_(Anime.title.ilike(pattern), Anime.title_en.ilike(pattern), Anime.title_romaji.ilike(pattern)))
+            .order_by(desc(Anime.views_count))
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return [dict(row._mapping, id=str(row.id)) for row in result.all()]
+
+    async def index(self, *items: Anime):
+        """Add or refresh anime in the index, dropping prefixes they no longer match."""
+        if not self.redis or not items:
+            return
+        ids = [str(a.id) for a in items]
+        try:
+            previous = await self.redis.hmget(DOCS_KEY, ids)
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for anime, old in zip(items, previous):
+                    anime_id = str(anime.id)
+                    names = _names(anime)
+                    current = prefixes(names)
+                    stale = prefixes(json.loads(old)["names"]) - current if old else set()
+                    for prefix in stale:
+                        pipe.zrem(f"{PREFIX_KEY}{prefix}", anime_id)
+                    for prefix in current:
+                        key = f"{PREFIX_KEY}{prefix}"
+                        pipe.zadd(key, {anime_id: _popularity(anime)})
+                        pipe.zremrangebyrank(key, 0, -(MAX_PER_PREFIX + 1))
+                    pipe.hset(DOCS_KEY, anime_id, json.dumps({
+                        "id": anime_id,
+                        "slug": anime.slug,
+                        "title": anime.title,
+                        "poster_url": anime.poster_url,
+                        "names": names
+                    }))
+                await pipe.execute()
+        except Exception as e:
+            # The index trails the database; the next write or a rebuild catches it up
+            logger.error("Suggest: Index update failed", error=str(e), documents=len(ids))
+
+    async def remove(self, *ids: Any):
+        if not self.redis or not ids:
+            return
+        ids = [str(i) for i in ids]
+        try:
+            previous = await self.redis.hmget(DOCS_KEY, ids)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for anime_id, old in zip(ids, previous):
+                    if old:
+                        for prefix in prefixes(json.loads(old)["names"]):
+                            pipe.zrem(f"{PREFIX_KEY}{prefix}", anime_id)
+                pipe.hdel(DOCS_KEY, *ids)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Suggest: Index removal failed", error=str(e), documents=len(ids))
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """Re-index every anime in batches and drop documents that no longer exist."""
+        if not self.redis:
+            return 0
+        seen: Set[str] = set()
+        last_id = None
+        while True:
+            query = select(Anime).order_by(Anime.id).limit(REBUILD_BATCH)
+            if last_id is not None:
+                query = query.filter(Anime.id > last_id)
+            batch = (await db.execute(query)).scalars().all()
+            if not batch:
+                break
+            await self.index(*batch)
+            seen.update(str(a.id) for a in batch)
+            last_id = batch[-1].id
+            db.expunge_all()
+
+        indexed = {i.decode() for i in await self.redis.hkeys(DOCS_KEY)}
+        await self.remove(*(indexed - seen))
+        logger.info("Suggest: Index rebuilt", documents=len(seen), removed=len(indexed - seen))
+        return len(seen)
+
+suggest_service = SuggestService()
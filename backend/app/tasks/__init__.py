@@ -1,3 +1,6 @@
-
-from .system import task_automated_backup, task_scheduler_recovery
-from .parsers import run_full_sync_task, run_incremental_sync_task, run_release_updates_task
+from .system import task_automated_backup, task_scheduler_recovery, task_rebuild_suggest_index
+from .parsers import (
+    run_full_sync_task, run_sync_shard_task, finalize_full_sync_task,
+    run_incremental_sync_task, run_release_updates_task
+)
+from .notifications import broadcast_new_episode_task
@@ -0,0 +1,20 @@
+from app.core.celery_app import celery_app
+from app.core.logging import logger
+from app.core.worker_runtime import run_async
+from app.db.session import AsyncSessionLocal
+from app.models.anime import Anime
+from app.services.notification_service import notification_service
+
+@celery_app.task(name="notifications.broadcast_new_episode")
+def broadcast_new_episode_task(anime_id: str, episode: int):
+    """New-episode fan-out, kept off the release sync so large audiences don't stall it."""
+    return run_async(_broadcast_new_episode(anime_id, episode))
+
+async def _broadcast_new_episode(anime_id: str, episode: int):
+    # Pushes go out over the worker runtime's Redis client
+    async with AsyncSessionLocal() as db:
+        anime = await db.get(Anime, anime_id)
+        if not anime:
+            logger.warning("Notifications: Anime vanished before broadcast", anime_id=anime_id)
+            return {"recipients": 0}
+        return await notification_service.notify_users_new_episode(db, anime, episode)
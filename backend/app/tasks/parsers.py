@@ -1,44 +1,137 @@
-import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from celery import chord
+from celery.utils import uuid
 from app.core.celery_app import celery_app
 from app.core.logging import logger
+from app.core.worker_runtime import run_async
 from app.db.session import AsyncSessionLocal
 from app.services.parsers.shikimori import ShikimoriParserService
 from app.services.parsers.kodik import KodikParserService
 from app.crud.crud_parser import parser_settings, parser_job
+from app.tasks.notifications import broadcast_new_episode_task
 
-@celery_app.task(name="parsers.run_full_sync")
+# Acked only after the run, so a sync killed mid-way is redelivered and resumes from its checkpoint
+@celery_app.task(name="parsers.run_full_sync", acks_late=True, reject_on_worker_lost=True)
 def run_full_sync_task(job_id: str):
     logger.info(f"Worker_Alpha: Initiating Deep Sync Lifecycle for Job {job_id}")
-    asyncio.run(_execute_sync(job_id, "full"))
+    dispatch_id = uuid()
+    plan = run_async(_plan_full_sync(job_id, dispatch_id))
+    if plan is None:
+        logger.info(f"Worker_Alpha: Shards of Job {job_id} already dispatched, ignoring redelivery")
+        return
+    if not plan:
+        run_async(_execute_sync(job_id, "full"))
+        return
+    # Page-range shards run on any free worker; the shared upstream buckets cap their combined rate
+    chord(
+        run_sync_shard_task.s(job_id, shard, start, end, plan[-1][1]) for shard, (start, end) in enumerate(plan)
+    )(finalize_full_sync_task.s(job_id).set(task_id=dispatch_id))
 
-@celery_app.task(name="parsers.run_incremental_sync")
+@celery_app.task(name="parsers.run_sync_shard", acks_late=True, reject_on_worker_lost=True)
+def run_sync_shard_task(
+    job_id: str, shard: int, start_page: int, end_page: int, total_pages: Optional[int] = None
+) -> Dict[str, Any]:
+    logger.info(f"Worker_Alpha: Shard {shard} of Job {job_id} (pages {start_page}-{end_page})")
+    return run_async(_execute_shard(job_id, shard, start_page, end_page, total_pages))
+
+@celery_app.task(name="parsers.finalize_full_sync")
+def finalize_full_sync_task(results: List[Dict[str, Any]], job_id: str):
+    logger.info(f"Worker_Alpha: Aggregating {len(results)} shards for Job {job_id}")
+    run_async(_execute_finalize(job_id, results))
+
+@celery_app.task(name="parsers.run_incremental_sync", acks_late=True, reject_on_worker_lost=True)
 def run_incremental_sync_task(job_id: str):
     logger.info(f"Worker_Alpha: Initiating Pulse Ingestion for Job {job_id}")
-    asyncio.run(_execute_sync(job_id, "incremental"))
+    run_async(_execute_sync(job_id, "incremental"))
 
 @celery_app.task(name="parsers.run_release_updates")
 def run_release_updates_task(job_id: str = None):
     logger.info(f"Worker_Beta: Scanning CDN clusters for release updates")
-    asyncio.run(_execute_releases(job_id))
+    announcements = run_async(_execute_releases(job_id))
+    # Broker calls block, so the fan-out is queued here rather than on the event loop
+    for anime_id, episode in announcements:
+        broadcast_new_episode_task.delay(anime_id, episode)
+
+async def _load_config(db) -> tuple:
+    """Sync config aggregated from all registry nodes, plus the general (proxy) config."""
+    grab = await parser_settings.get_by_category(db, category="grabbing")
+    gen = await parser_settings.get_by_category(db, category="general")
+    tpl = await parser_settings.get_by_category(db, category="fields")
+    img = await parser_settings.get_by_category(db, category="images")
+    config = {
+        **(grab.config if grab else {}),
+        **(gen.config if gen else {}),
+        **(tpl.config if tpl else {}),
+        **(img.config if img else {})
+    }
+    return config, (gen.config if gen else None)
+
+async def _plan_full_sync(job_id: str, dispatch_id: str) -> Optional[List[List[int]]]:
+    """
+    Page ranges for a sharded full sync, stored on the job so a resumed run
+    keeps the same shards (and their checkpoints). Empty means run unsharded.
+
+    ``dispatch_id`` (the chord callback's task id) is recorded with the plan
+    in the same update; None means this run's shards were already dispatched
+    and the task is a redelivery.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await parser_job.get(db, id=job_id)
+        if not job or job.status == "cancelled":
+            return []
+        checkpoint = job.checkpoint or {}
+        if job.status == "running" and checkpoint.get("dispatch"):
+            return None
+        if checkpoint.get("plan"):
+            plan = checkpoint["plan"]
+        else:
+            if checkpoint:
+                return []  # Resuming an unsharded run
+            config, _ = await _load_config(db)
+            plan = ShikimoriParserService.plan_shards(config.get('deep_sync_pages', 50), config.get('sync_shards', 4))
+            if len(plan) < 2:
+                return []
+            plan = [list(r) for r in plan]
+        await parser_job.update(db, db_obj=job, obj_in={
+            "status": "running",
+            "started_at": job.started_at if checkpoint and job.started_at else datetime.utcnow(),
+            "checkpoint": {"plan": plan, "shards": checkpoint.get("shards", {}), "dispatch": dispatch_id}
+        })
+        return plan
+
+async def _execute_shard(
+    job_id: str, shard: int, start_page: int, end_page: int, total_pages: Optional[int] = None
+) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        service = None
+        try:
+            config, proxy_config = await _load_config(db)
+            service = ShikimoriParserService(proxy_config=proxy_config)
+            return await service.run_shard(db, job_id, config, shard, start_page, end_page, total_pages)
+        except Exception as e:
+            # Reported as a result so the chord callback still settles the job
+            logger.exception(f"Ingestion_Fault: Shard {shard} of job {job_id}", error=str(e))
+            return {"shard": shard, "stats": {}, "stopped": None, "error": str(e)}
+        finally:
+            if service:
+                await service.close()
+
+async def _execute_finalize(job_id: str, results: List[Dict[str, Any]]):
+    async with AsyncSessionLocal() as db:
+        await ShikimoriParserService().finalize_shards(db, job_id, results)
 
 async def _execute_sync(job_id: str, mode: str):
     async with AsyncSessionLocal() as db:
         try:
-            # Aggregating configurations from all registry nodes
-            grab = await parser_settings.get_by_category(db, category="grabbing")
-            gen = await parser_settings.get_by_category(db, category="general")
-            tpl = await parser_settings.get_by_category(db, category="fields")
-            img = await parser_settings.get_by_category(db, category="images")
-            
-            config = {
-                **(grab.config if grab else {}),
-                **(gen.config if gen else {}),
-                **(tpl.config if tpl else {}),
-                **(img.config if img else {})
-            }
+            config, proxy_config = await _load_config(db)
             
-            service = ShikimoriParserService(proxy_config=gen.config if gen else None)
-            await service.run_sync_task(db, job_id, config, mode=mode)
+            # Interrupted (redelivered), paused or failed runs continue from their checkpoint
+            job = await parser_job.get(db, id=job_id)
+            resume = job.checkpoint if job and job.status != "completed" else None
+
+            service = ShikimoriParserService(proxy_config=proxy_config)
+            await service.run_sync_task(db, job_id, config, mode=mode, resume=resume)
             await service.close()
             
         except Exception as e:
@@ -47,13 +140,14 @@ async def _execute_sync(job_id: str, mode: str):
             if job:
                 await parser_job.update(db, db_obj=job, obj_in={"status": "failed", "error_message": str(e)})
 
-async def _execute_releases(job_id: str):
+async def _execute_releases(job_id: str) -> List[Tuple[str, int]]:
     async with AsyncSessionLocal() as db:
         gen = await parser_settings.get_by_category(db, category="general")
         service = KodikParserService(proxy_config=gen.config if gen else None)
         try:
-            await service.sync_ongoing_releases(db, job_id)
+            return await service.sync_ongoing_releases(db, job_id, config=gen.config if gen else None)
         except Exception as e:
             logger.error(f"Worker_Beta: Release Pulse Fault", error=str(e))
+            return []
         finally:
             await service.close()
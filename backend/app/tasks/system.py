@@ -1,10 +1,11 @@
 import time
-import asyncio
 from datetime import datetime, timedelta
 from sqlalchemy.future import select
 from app.core.celery_app import celery_app
 from app.core.logging import logger
+from app.core.worker_runtime import run_async
 from app.services.backup_service import backup_service
+from app.services.suggest_service import suggest_service
 from app.db.session import AsyncSessionLocal
 from app.models.parser import ScheduledParserJob
 from app.tasks.parsers import run_full_sync_task, run_incremental_sync_task
@@ -13,8 +14,7 @@ from app.tasks.parsers import run_full_sync_task, run_incremental_sync_task
 def task_automated_backup():
     logger.info("Backup Pipeline: Executing daily system snapshot...")
     try:
-        loop = asyncio.get_event_loop()
-        result = loop.run_until_complete(backup_service.create_backup())
+        run_async(backup_service.create_backup())
         return True
     except Exception as e:
         logger.error(f"Backup Pipeline: Snapshot failure", error=str(e))
@@ -62,7 +62,19 @@ def task_scheduler_recovery():
             await db.commit()
                 
     try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(_scan())
+        run_async(_scan())
     except Exception as e:
         logger.error("Scheduler: Recovery pulse failed", error=str(e))
+
+@celery_app.task(name="system.rebuild_suggest_index")
+def task_rebuild_suggest_index():
+    """Full re-index of the autocomplete prefix index; writers keep it current in between."""
+    async def _rebuild():
+        async with AsyncSessionLocal() as db:
+            return await suggest_service.rebuild(db)
+
+    try:
+        return run_async(_rebuild())
+    except Exception as e:
+        logger.error("Suggest: Index rebuild failed", error=str(e))
+        return 0
@@ -0,0 +1,27 @@
+"""add_catalog_order_index
+
+Revision ID: 20240610_catalog_order
+Revises: 20240523_full
+Create Date: 2024-06-10 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240610_catalog_order'
+down_revision = '20240523_full'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Matches the catalog ORDER BY so keyset pages are index range scans
+    op.create_index(
+        'ix_anime_catalog_order',
+        'anime',
+        [sa.text('score_count DESC'), sa.text('coalesce(score, 0) DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_anime_catalog_order', table_name='anime')
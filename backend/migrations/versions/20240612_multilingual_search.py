@@ -0,0 +1,82 @@
+"""multilingual_search
+
+Revision ID: 20240612_search
+Revises: 20240610_catalog_order
+Create Date: 2024-06-12 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240612_search'
+down_revision = '20240610_catalog_order'
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = ('title', 'title_en', 'title_romaji')
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # ### Multilingual Search Vector ###
+    # Russian titles are stemmed as Russian and also kept verbatim ("simple")
+    # so exact and transliterated tokens match; alternates get their own config.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION anime_search_vector_update() RETURNS trigger AS $$
+        DECLARE
+            synonyms text := array_to_string(
+                ARRAY(SELECT jsonb_array_elements_text(coalesce(NEW.synonyms, '[]'::jsonb))), ' '
+            );
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title_en, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title_romaji, '')), 'B') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title_jp, '')), 'B') ||
+                setweight(to_tsvector('pg_catalog.simple', synonyms), 'B') ||
+                setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.description, '')), 'C');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Only text columns feed the vector; counters updates skip the trigger
+    op.execute("DROP TRIGGER IF EXISTS tsvectorupdate ON anime")
+    op.execute("""
+        CREATE TRIGGER tsvectorupdate BEFORE INSERT OR UPDATE OF
+            title, title_en, title_jp, title_romaji, synonyms, description
+        ON anime FOR EACH ROW EXECUTE FUNCTION anime_search_vector_update();
+    """)
+
+    # Backfill existing rows through the trigger
+    op.execute("UPDATE anime SET title = title")
+
+    for column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_anime_{column}_trgm', 'anime', [column],
+            unique=False, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+def downgrade() -> None:
+    for column in TRGM_COLUMNS:
+        op.drop_index(f'ix_anime_{column}_trgm', table_name='anime')
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION anime_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title_en, '')), 'B') ||
+                setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'C');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("DROP TRIGGER IF EXISTS tsvectorupdate ON anime")
+    op.execute("""
+        CREATE TRIGGER tsvectorupdate BEFORE INSERT OR UPDATE
+        ON anime FOR EACH ROW EXECUTE FUNCTION anime_search_vector_update();
+    """)
+    op.execute("UPDATE anime SET title = title")
@@ -0,0 +1,33 @@
+"""add_notification_counters
+
+Revision ID: 20240614_notif_counters
+Revises: 20240612_search
+Create Date: 2024-06-14 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20240614_notif_counters'
+down_revision = '20240612_search'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('notification_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('unread', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from existing unread rows
+    op.execute("""
+        INSERT INTO notification_counters (user_id, unread)
+        SELECT user_id, count(*) FROM notifications WHERE NOT is_read GROUP BY user_id
+    """)
+
+def downgrade() -> None:
+    op.drop_table('notification_counters')
@@ -0,0 +1,21 @@
+"""add_parser_throughput
+
+Revision ID: 20240616_parser_throughput
+Revises: 20240614_notif_counters
+Create Date: 2024-06-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240616_parser_throughput'
+down_revision = '20240614_notif_counters'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('parser_jobs', sa.Column('items_per_second', sa.Float(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('parser_jobs', 'items_per_second')
@@ -0,0 +1,24 @@
+"""add_content_hash
+
+Revision ID: 20240618_content_hash
+Revises: 20240616_parser_throughput
+Create Date: 2024-06-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20240618_content_hash'
+down_revision = '20240616_parser_throughput'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing rows start without a hash, so their next sync writes them once
+    op.add_column('anime', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('parser_jobs', sa.Column('items_unchanged', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade() -> None:
+    op.drop_column('parser_jobs', 'items_unchanged')
+    op.drop_column('anime', 'content_hash')
@@ -0,0 +1,22 @@
+"""add_job_checkpoint
+
+Revision ID: 20240620_job_checkpoint
+Revises: 20240618_content_hash
+Create Date: 2024-06-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20240620_job_checkpoint'
+down_revision = '20240618_content_hash'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('parser_jobs', sa.Column('checkpoint', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('parser_jobs', 'checkpoint')
@@ -18,3 +18,24 @@ async def test_anime_search_empty_paginated(client: AsyncClient):
     data = response.json()
     assert data["data"] == []
     assert data["meta"]["total"] == 0
+
+@pytest.mark.asyncio
+async def test_anime_list_cursor_mode(client: AsyncClient):
+    response = await client.get("/api/v1/anime/?cursor=&limit=5")
+    assert response.status_code == 200
+    meta = response.json()["meta"]
+    assert meta["page"] is None
+    assert meta["estimated"] is True
+    assert "next_cursor" in meta
+
+@pytest.mark.asyncio
+async def test_anime_list_rejects_bad_cursor(client: AsyncClient):
+    assert (await client.get("/api/v1/anime/?cursor=not-a-cursor")).status_code == 400
+    assert (await client.get("/api/v1/anime/?cursor=&q=naruto")).status_code == 400
+
+@pytest.mark.asyncio
+async def test_anime_facets_structure(client: AsyncClient):
+    response = await client.get("/api/v1/anime/facets?kind=tv")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert set(data) == {"total", "genre", "kind", "status", "year"}
@@ -18,3 +18,46 @@ async def test_get_settings_empty(client: AsyncClient):
 async def test_get_jobs_empty(client: AsyncClient):
     response = await client.get("/api/v1/dashboard/parsers/jobs")
     assert response.status_code in [200, 401, 403]
+
+@pytest.mark.asyncio
+async def test_pause_returns_503_when_job_control_is_unavailable():
+    from uuid import uuid4
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from fastapi import HTTPException
+    from app.api.v1.endpoints.parsers import pause_parser_job
+
+    job = MagicMock(status="running", parser_name="shikimori")
+    with patch('app.api.v1.endpoints.parsers.crud_jobs.get', AsyncMock(return_value=job)), \
+         patch('app.services.parsers.control.cache.redis', None):
+        with pytest.raises(HTTPException) as exc:
+            await pause_parser_job(uuid4(), db=AsyncMock(), u=None)
+    assert exc.value.status_code == 503
+
+@pytest.mark.asyncio
+async def test_job_telemetry_ws_reports_failed_sender():
+    import asyncio
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from fastapi import WebSocketDisconnect
+    from app.api.v1.endpoints.parsers import job_telemetry_ws
+
+    queue = asyncio.Queue()
+    queue.put_nowait('{"progress": 10}')
+    sent = asyncio.Event()
+
+    async def send_text(_):
+        sent.set()
+        raise RuntimeError("socket closed")
+
+    async def receive_text():
+        await sent.wait()
+        raise WebSocketDisconnect()
+
+    websocket = MagicMock(accept=AsyncMock(), send_text=send_text, receive_text=receive_text)
+    hub = MagicMock(subscribe=MagicMock(return_value=queue))
+    with patch('app.api.v1.endpoints.parsers.job_progress_hub', hub), \
+         patch('app.api.v1.endpoints.parsers.logger') as logger:
+        await job_telemetry_ws(websocket, "job-1")
+
+    hub.unsubscribe.assert_called_once_with("job_progress:job-1", queue)
+    logger.warning.assert_called_once()
+    assert logger.warning.call_args.kwargs["error"] == "socket closed"
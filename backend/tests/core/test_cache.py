@@ -0,0 +1,122 @@
+import time
+import asyncio
+import pytest
+from uuid import uuid4
+from app.core.cache import CacheService, LocalCache
+from app.core.codecs import CacheSerializer, CodecError
+from app.schemas.common import ResponseMeta
+
+def test_local_cache_lru_eviction():
+    local = LocalCache(max_entries=2, ttl=30)
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == (True, 1)  # "a" becomes most recently used
+    local.set("c", 3)
+    assert local.get("b") == (False, None)
+    assert local.get("a") == (True, 1)
+    assert len(local) == 2
+
+def test_local_cache_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    local = LocalCache(max_entries=10, ttl=30)
+    local.set("short", "x", ttl=5)
+    local.set("capped", "y", ttl=3600)
+    now[0] += 6
+    assert local.get("short") == (False, None)
+    now[0] += 30
+    assert local.get("capped") == (False, None)
+
+def test_local_cache_tag_invalidation():
+    local = LocalCache(max_entries=10, ttl=30)
+    local.set("catalog:1", "page", tags=["catalog", "anime:1"])
+    local.set("catalog:2", "page", tags=["catalog", "anime:2"])
+    generation = local.generation
+    local.invalidate("anime:1")
+    assert local.generation > generation
+    assert local.get("catalog:1") == (False, None)
+    assert local.get("catalog:2") == (True, "page")
+    local.invalidate("catalog")
+    assert len(local) == 0
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_misses():
+    service = CacheService()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "page"
+
+    results = await asyncio.gather(*(service._flight("catalog:1", compute) for _ in range(10)))
+    assert results == ["page"] * 10
+    assert calls == 1
+    assert service.counters["coalesced"] == 9
+    assert not service._inflight
+
+@pytest.mark.asyncio
+async def test_single_flight_waiters_recover_when_leader_is_cancelled():
+    service = CacheService()
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "page"
+
+    leader = asyncio.create_task(service._flight("catalog:1", slow))
+    await started.wait()
+    waiter = asyncio.create_task(service._flight("catalog:1", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await waiter == "page"
+
+@pytest.mark.asyncio
+async def test_get_or_set_skips_l1_fill_after_racing_invalidation():
+    from unittest.mock import AsyncMock, MagicMock
+    service = CacheService()
+    service.enabled = service.local_enabled = True
+    service.redis = MagicMock(
+        get=AsyncMock(return_value=None),
+        mget=AsyncMock(side_effect=lambda keys: [None] * len(keys)),
+        set=AsyncMock(return_value=True),
+        eval=AsyncMock(return_value=1),
+    )
+
+    async def factory():
+        # Another worker's invalidation arrives while the value is computed
+        service.local.invalidate("catalog")
+        return "stale page"
+
+    assert await service.get_or_set("catalog:1", factory, tags=["catalog"]) == "stale page"
+    assert service.local.get("catalog:1") == (False, None)
+    assert await service.get("catalog:1") is None
+    assert service.counters["l1_hits"] == 0
+
+    async def fresh():
+        return "page"
+
+    await service.get_or_set("catalog:1", fresh, tags=["catalog"])
+    assert service.local.get("catalog:1")[0]
+
+def test_serializer_roundtrip_compresses_large_values():
+    serializer = CacheSerializer(codec="orjson", compression="zlib", compress_min_bytes=256)
+    meta = ResponseMeta(page=1, per_page=20, total=1, total_pages=1)
+    value = {"data": [{"id": uuid4(), "description": "Описание " * 200}], "meta": meta}
+
+    frame = serializer.dumps(value)
+    decoded = serializer.loads(frame)
+
+    assert decoded["meta"] == meta.model_dump(mode="json")
+    assert decoded["data"][0]["id"] == str(value["data"][0]["id"])
+    assert serializer.stats["stored_bytes"] < serializer.stats["raw_bytes"]
+
+def test_serializer_reads_frames_from_other_codecs():
+    written = CacheSerializer(codec="json", compression="none").dumps({"a": 1})
+    assert CacheSerializer(codec="orjson").loads(written) == {"a": 1}
+    with pytest.raises(CodecError):
+        CacheSerializer().loads(b'{"legacy": "json"}')
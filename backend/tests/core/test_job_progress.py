@@ -0,0 +1,61 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.celery_app import JobProgressPublisher
+from app.core.config import settings
+
+@pytest.mark.asyncio
+async def test_progress_is_coalesced_and_final_update_always_sent():
+    publisher = JobProgressPublisher()
+    sent = []
+
+    async def capture(payload):
+        sent.append(payload["progress"])
+
+    with patch.object(publisher, "_write", side_effect=capture):
+        for progress in range(1, 50):
+            await publisher.publish("job-1", progress, {"proc": progress})
+        await publisher.publish("job-1", 100, {"proc": 50}, final=True)
+
+    # First update goes out immediately, the rest collapse into the final one
+    assert sent == [1, 100]
+    assert not publisher._pending and not publisher._timers
+
+@pytest.mark.asyncio
+async def test_send_publishes_and_stores_snapshot():
+    pipe = MagicMock(execute=AsyncMock())
+    redis = MagicMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    publisher = JobProgressPublisher()
+    publisher._client = lambda: redis
+
+    await publisher.publish("job-2", 40, {"proc": 8})
+
+    redis.pipeline.assert_called_once_with(transaction=False)
+    channel, message = pipe.publish.call_args.args
+    assert channel == "job_progress:job-2"
+    assert json.loads(message) == {"job_id": "job-2", "progress": 40, "stats": {"proc": 8}}
+    key = pipe.hset.call_args.args[0]
+    snapshot = pipe.hset.call_args.kwargs["mapping"]
+    assert key == "job_snapshot:job-2"
+    assert snapshot["progress"] == 40 and json.loads(snapshot["stats"]) == {"proc": 8}
+    pipe.expire.assert_called_once_with("job_snapshot:job-2", settings.JOB_PROGRESS_SNAPSHOT_TTL)
+    pipe.execute.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_record_shard_returns_totals_across_shards():
+    pipe = MagicMock(execute=AsyncMock(return_value=[1, True, [
+        b'{"pages": 3, "stats": {"proc": 150, "create": 10}}',
+        b'{"pages": 5, "stats": {"proc": 250, "fail": 1}}',
+    ]]))
+    redis = MagicMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    publisher = JobProgressPublisher()
+    publisher._client = lambda: redis
+
+    totals = await publisher.record_shard("job-3", 1, 5, {"proc": 250, "fail": 1})
+
+    key, field, value = pipe.hset.call_args.args
+    assert (key, field) == ("job_shards:job-3", "1")
+    assert json.loads(value) == {"pages": 5, "stats": {"proc": 250, "fail": 1}}
+    assert totals == (8, {"proc": 400, "create": 10, "fail": 1})
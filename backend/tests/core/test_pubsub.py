@@ -0,0 +1,38 @@
+import pytest
+from unittest.mock import patch
+from app.core.pubsub import PubSubHub, HubUnavailable
+
+def test_dispatch_fans_out_and_drops_oldest_for_slow_subscribers():
+    hub = PubSubHub("test:*", queue_size=2)
+    with patch.object(PubSubHub, "_ensure_running"):
+        slow = hub.subscribe("test:1")
+        other = hub.subscribe("test:2")
+
+    for i in range(3):
+        hub.dispatch("test:1", i)
+
+    assert [slow.get_nowait(), slow.get_nowait()] == [1, 2]
+    assert other.empty()
+    assert hub.counters["dropped"] == 1
+
+    hub.unsubscribe("test:1", slow)
+    assert hub.get_stats()["channels"] == 1
+
+def test_subscribe_requires_redis():
+    with patch("app.core.pubsub.cache") as cache:
+        cache.redis = None
+        with pytest.raises(HubUnavailable):
+            PubSubHub("test:*").subscribe("test:1")
+
+def test_keep_last_replays_latest_message_to_late_subscribers():
+    hub = PubSubHub("test:*", keep_last=1)
+    hub.dispatch("test:1", "10%")
+    hub.dispatch("test:1", "20%")
+    hub.dispatch("test:2", "50%")
+
+    with patch.object(PubSubHub, "_ensure_running"):
+        late = hub.subscribe("test:2")
+        evicted = hub.subscribe("test:1")
+
+    assert late.get_nowait() == "50%"
+    assert evicted.empty()
@@ -0,0 +1,87 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import MagicMock
+from app.core.throttling import AdaptiveConcurrency, HostThrottle, retry_after_seconds, wait_retry_after
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "7"})) == 7
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert retry_after_seconds(httpx.Response(429)) is None
+
+def test_wait_honours_retry_after_then_falls_back():
+    wait = wait_retry_after(lambda state: 2, max_wait=30)
+    response = httpx.Response(429, headers={"Retry-After": "12"}, request=httpx.Request("GET", "http://x"))
+    state = MagicMock()
+    state.outcome.exception.return_value = httpx.HTTPStatusError("429", request=response.request, response=response)
+    assert wait(state) == 12
+
+    state.outcome.exception.return_value = httpx.ConnectError("down")
+    assert wait(state) == 2
+
+def test_aimd_grows_additively_and_halves_on_overload():
+    limiter = AdaptiveConcurrency(minimum=1, maximum=8, latency_threshold=1.0, cooldown=0)
+    limiter.in_flight = 20
+    for _ in range(20):
+        limiter.release(0.1)
+    assert 5 < limiter.limit <= 8
+
+    before = limiter.limit
+    limiter.in_flight = 1
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == pytest.approx(before / 2)
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_enforced():
+    limiter = AdaptiveConcurrency(minimum=2, maximum=2, latency_threshold=1.0)
+    active = peak = 0
+
+    async def call():
+        nonlocal active, peak
+        await limiter.acquire()
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        limiter.release(0.01)
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_token_bucket_is_shared_through_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.core import throttling
+    redis = fakeredis.aioredis.FakeRedis()
+    try:
+        await redis.eval("return 1", 0)
+    except Exception:
+        pytest.skip("Lua scripting not available in fakeredis")
+
+    throttling.cache.redis, previous = redis, throttling.cache.redis
+    try:
+        throttle = HostThrottle("example.org", rate=20)
+        for _ in range(int(throttle.burst) + 2):
+            await throttle._take_token()
+        # Burst is served immediately, the rest waits for refill
+        assert throttle.stats["waited_ms"] > 0
+
+        await throttle.pause(5)
+        assert await redis.pttl("throttle:pause:example.org") > 0
+    finally:
+        throttling.cache.redis = previous
+
+@pytest.mark.asyncio
+async def test_bucket_wait_does_not_count_as_upstream_latency():
+    from unittest.mock import AsyncMock, patch
+    throttle = HostThrottle("example.org", rate=4)
+    throttle.concurrency = AdaptiveConcurrency(minimum=1, maximum=8, latency_threshold=0.05, cooldown=0)
+    throttle.concurrency.limit = 4
+    redis = MagicMock(eval=AsyncMock(side_effect=[100, 0]))  # bucket empty, then refilled
+    client = MagicMock(send=AsyncMock(return_value=httpx.Response(200)))
+
+    with patch("app.core.throttling.cache.redis", redis):
+        await throttle.send(client, httpx.Request("GET", "http://example.org"))
+
+    assert throttle.stats["waited_ms"] == 100
+    assert throttle.concurrency.limit > 4
@@ -0,0 +1,35 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.worker_runtime import WorkerRuntime
+
+def test_tasks_share_one_loop_and_http_clients():
+    runtime = WorkerRuntime()
+    with patch('app.core.worker_runtime.cache.connect', AsyncMock()), \
+         patch('app.core.worker_runtime.cache.disconnect', AsyncMock()), \
+         patch('app.core.worker_runtime.engine', MagicMock(dispose=AsyncMock())):
+        runtime.start()
+
+        async def task():
+            return asyncio.get_running_loop(), runtime.http_client("kodik", timeout=5.0)
+
+        first_loop, first_client = runtime.run(task())
+        second_loop, second_client = runtime.run(task())
+        assert first_loop is second_loop is runtime.loop
+        assert first_client is second_client
+
+        runtime.stop()
+        assert first_client.is_closed
+        assert not runtime.active
+
+def test_falls_back_to_a_private_loop_when_not_started():
+    runtime = WorkerRuntime()
+    with patch('app.core.worker_runtime.cache.connect', AsyncMock()) as connect, \
+         patch('app.core.worker_runtime.cache.disconnect', AsyncMock()) as disconnect, \
+         patch('app.core.worker_runtime.engine', MagicMock(dispose=AsyncMock())) as engine:
+        async def task():
+            return runtime.http_client("kodik")
+
+        assert runtime.run(task()) is None
+        connect.assert_awaited_once()
+        disconnect.assert_awaited_once()
+        engine.dispose.assert_awaited_once()
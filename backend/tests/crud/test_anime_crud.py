@@ -1,7 +1,15 @@
 import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.crud.crud_anime import anime as crud_anime
+from app.crud.crud_anime import (
+    anime as crud_anime, anime_tag, genre_tag, filter_tag, CATALOG_TAG, SEARCH_TAG, FACETS_TAG,
+    encode_cursor, decode_cursor, content_hash
+)
+from app.models.anime import Anime
 from app.schemas.anime import AnimeCreate, AnimeUpdate
+from app.services.suggest_service import SuggestService, suggest_service
 
 @pytest.mark.asyncio
 async def test_create_anime_crud(db_session: AsyncSession):
@@ -46,3 +54,142 @@ async def test_get_multi_paginated_filters(db_session: AsyncSession):
     items, total = await crud_anime.get_multi_paginated(db_session, kind="tv")
     assert total >= 1
     assert any(i.kind == "tv" for i in items)
+
+@pytest.mark.asyncio
+async def test_get_multi_keyset_walks_catalog_without_gaps(db_session: AsyncSession):
+    for i in range(5):
+        await crud_anime.create(db_session, obj_in=AnimeCreate(title=f"K{i}", slug=f"keyset-{i}", kind="keyset"))
+
+    seen, after = [], None
+    while True:
+        items, cursor = await crud_anime.get_multi_keyset(db_session, after=after, limit=2, kind="keyset")
+        seen.extend(i.slug for i in items)
+        if not cursor:
+            break
+        after = decode_cursor(cursor)
+
+    expected, _ = await crud_anime.get_multi_paginated(db_session, limit=10, kind="keyset")
+    assert seen == [i.slug for i in expected]
+
+@pytest.mark.asyncio
+async def test_get_facets_counts_within_filters(db_session: AsyncSession):
+    await crud_anime.create(db_session, obj_in=AnimeCreate(title="F1", slug="facet-1", kind="facet", status="ongoing", genres=["Drama", "Comedy"]))
+    await crud_anime.create(db_session, obj_in=AnimeCreate(title="F2", slug="facet-2", kind="facet", status="released", genres=["Drama"]))
+
+    facets = await crud_anime.get_facets(db_session, kind="facet")
+    assert facets["total"] == 2
+    assert facets["genre"] == {"Drama": 2, "Comedy": 1}
+    assert facets["status"] == {"ongoing": 1, "released": 1}
+    assert facets["kind"] == {"facet": 2}
+
+@pytest.mark.asyncio
+async def test_search_is_multilingual_with_fuzzy_fallback(db_session: AsyncSession):
+    await crud_anime.create(db_session, obj_in=AnimeCreate(title="Атака титанов", title_en="Attack on Titan", slug="aot"))
+
+    items, total = await crud_anime.get_multi_paginated(db_session, search="титаны")
+    assert total == 1 and items[0].slug == "aot"
+
+    items, total = await crud_anime.get_multi_paginated(db_session, search="Attack on Titans")
+    assert items[0].slug == "aot"
+
+    items, total = await crud_anime.get_multi_paginated(db_session, search="Атака титаноф")
+    assert total == 1 and items[0].slug == "aot"
+
+@pytest.mark.asyncio
+async def test_upsert_many_is_idempotent_by_shikimori_id(db_session: AsyncSession):
+    rows = [
+        {"shikimori_id": 9001, "slug": "upsert-a", "title": "Upsert A", "aired_on": "2020-04-01"},
+        {"shikimori_id": 9002, "slug": "upsert-b", "title": "Upsert B", "aired_on": None},
+    ]
+    first = await crud_anime.upsert_many(db_session, rows)
+    assert [r.created for r in first] == [True, True]
+
+    again = await crud_anime.upsert_many(db_session, [{**rows[0], "title": "Upsert A2"}, rows[1]])
+    assert [r.created for r in again] == [False, False]
+    assert {r.id for r in again} == {r.id for r in first}
+
+    existing = await crud_anime.get_many_by_shikimori_ids(db_session, [9001, 9002])
+    assert existing[9001].title == "Upsert A2"
+
+@pytest.mark.asyncio
+async def test_upsert_many_rows_can_be_indexed_for_suggest(db_session: AsyncSession):
+    rows = await crud_anime.upsert_many(db_session, [
+        {"shikimori_id": 9101, "slug": "suggest-row", "title": "Suggest Row", "aired_on": None},
+    ])
+    pipe = MagicMock(execute=AsyncMock())
+    redis = MagicMock(hmget=AsyncMock(return_value=[None]))
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    with patch.object(SuggestService, "redis", redis):
+        await suggest_service.index(*rows)
+
+    pipe.execute.assert_awaited_once()
+    pipe.hset.assert_called_once()
+    assert pipe.zadd.called
+
+def test_cursor_roundtrip_and_rejects_garbage():
+    anime = Anime(id=uuid4(), title="A", slug="a", score=Decimal("8.13"), score_count=42)
+    assert decode_cursor(encode_cursor(anime)) == (42, Decimal("8.13"), anime.id)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_invalidation_tags_text_edit_is_scoped_to_anime():
+    anime = Anime(id=uuid4(), title="Old", slug="old", kind="tv", status="ongoing", genres=["Экшен"])
+    tags = crud_anime.invalidation_tags(anime, {"title": "New"})
+    assert anime_tag(anime.id) in tags
+    assert SEARCH_TAG in tags
+    assert CATALOG_TAG not in tags
+    assert FACETS_TAG not in tags
+
+def test_invalidation_tags_filter_and_ordering_changes():
+    anime = Anime(id=uuid4(), title="A", slug="a", kind="tv", status="ongoing", score=Decimal("8.13"), genres=["Экшен"])
+    assert CATALOG_TAG not in crud_anime.invalidation_tags(anime, {"score": 8.13})
+
+    tags = crud_anime.invalidation_tags(anime, {"status": "released", "genres": ["Драма"], "score": 9.0})
+    assert CATALOG_TAG in tags
+    assert filter_tag("status", "ongoing") in tags
+    assert filter_tag("status", "released") in tags
+    assert genre_tag("Экшен") in tags and genre_tag("Драма") in tags
+    assert FACETS_TAG in tags
+
+def test_list_cache_tags():
+    items = [Anime(id=uuid4(), title="A", slug="a")]
+    tags = crud_anime.list_cache_tags(items, genre="Экшен", kind="tv", status=None, year=2024)
+    assert set(tags) == {CATALOG_TAG, anime_tag(items[0].id), genre_tag("Экшен"), filter_tag("kind", "tv"), filter_tag("year", 2024)}
+
+@pytest.mark.asyncio
+async def test_catalog_queries_do_not_load_episodes(db_session: AsyncSession):
+    from sqlalchemy import event
+    from app.models.episode import Episode
+
+    anime = await crud_anime.create(db_session, obj_in=AnimeCreate(title="Lazy Eps", slug="lazy-eps"))
+    db_session.add(Episode(anime_id=anime.id, season=1, episode=1))
+    await db_session.commit()
+    db_session.expire_all()
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        await crud_anime.get_multi_paginated(db_session, limit=20)
+        assert len(statements) == 2
+        assert not any("FROM episodes" in s for s in statements)
+
+        statements.clear()
+        found = await crud_anime.get_by_slug(db_session, slug="lazy-eps")
+        assert len(statements) == 1
+
+        db_session.expire_all()
+        statements.clear()
+        found = await crud_anime.get_by_slug(db_session, slug="lazy-eps", with_episodes=True)
+        assert len(statements) == 2
+        assert [e.episode for e in found.episodes] == [1]
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def test_content_hash_is_stable_and_tracks_changes():
+    fields = {"title": "A", "genres": ["Экшен"], "score": 8.1, "aired_on": "2020-04-01"}
+    assert content_hash(fields) == content_hash(dict(reversed(list(fields.items()))))
+    assert content_hash(fields) == content_hash({**fields, "content_hash": "stale"})
+    assert content_hash(fields) != content_hash({**fields, "score": 8.2})
@@ -0,0 +1,52 @@
+import pytest
+from uuid import uuid4
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.crud_notification import notification as crud_notification
+from app.crud.crud_user import user as crud_user
+from app.schemas.notification import NotificationCreate
+from app.schemas.user import UserCreate
+from app.services.notification_service import notification_service
+
+@pytest.fixture
+async def recipient(db_session: AsyncSession):
+    suffix = uuid4().hex[:8]
+    return await crud_user.create(db_session, obj_in=UserCreate(
+        email=f"notify-{suffix}@example.com", username=f"notify-{suffix}", password="secret-pass"
+    ))
+
+@pytest.mark.asyncio
+async def test_unread_counter_follows_writes(db_session: AsyncSession, recipient):
+    first = await crud_notification.create(db_session, obj_in=NotificationCreate(user_id=recipient.id, title="A", type="system"))
+    await crud_notification.create(db_session, obj_in=NotificationCreate(user_id=recipient.id, title="B", type="system"))
+    assert await crud_notification.get_unread_count(db_session, user_id=recipient.id) == 2
+
+    read = await crud_notification.mark_as_read(db_session, id=first.id, user_id=recipient.id)
+    assert read.is_read
+    # Marking twice must not decrement twice
+    await crud_notification.mark_as_read(db_session, id=first.id, user_id=recipient.id)
+    assert await crud_notification.get_unread_count(db_session, user_id=recipient.id) == 1
+
+    await notification_service.broadcast_to_users(db_session, [recipient.id], title="C", message="M")
+    assert await crud_notification.get_unread_count(db_session, user_id=recipient.id) == 2
+
+    await crud_notification.mark_all_as_read(db_session, user_id=recipient.id)
+    assert await crud_notification.get_unread_count(db_session, user_id=recipient.id) == 0
+
+@pytest.mark.asyncio
+async def test_create_pushes_after_commit():
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    calls = []
+    db = MagicMock(flush=AsyncMock(), refresh=AsyncMock())
+    db.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+    user_id = uuid4()
+    push = AsyncMock(side_effect=lambda *a, **kw: calls.append("push"))
+    with patch.object(crud_notification, "increment_unread", AsyncMock(return_value={user_id: 3})), \
+         patch("app.crud.crud_notification.push_notification", push):
+        created = await crud_notification.create(db, obj_in=NotificationCreate(user_id=user_id, title="A", type="system"))
+
+    assert calls == ["commit", "push"]
+    push.assert_awaited_once()
+    assert push.call_args.args == ({user_id: 3},)
+    assert push.call_args.kwargs["title"] == "A"
+    assert push.call_args.kwargs["created_at"] is created.created_at
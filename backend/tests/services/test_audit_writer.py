@@ -0,0 +1,42 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.config import settings
+from app.services.audit_service import AuditService
+
+@pytest.mark.asyncio
+async def test_events_are_batched_and_flushed_on_stop():
+    service = AuditService()
+    db = MagicMock()
+    with patch.object(AuditService, "_write", new_callable=AsyncMock) as write:
+        service.start()
+        for i in range(5):
+            await service.log_action(db, actor_id=None, action=f"a{i}", resource_type="test")
+        await service.stop()
+
+    db.add.assert_not_called()
+    written = [e["action"] for call in write.await_args_list for e in call.args[0]]
+    assert written == [f"a{i}" for i in range(5)]
+    assert service.get_stats()["written"] == 5
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_INTERVAL_MS", 10000)
+    service = AuditService()
+    with patch.object(AuditService, "_write", new_callable=AsyncMock):
+        service.start()
+        for i in range(5):
+            await service.log_action(MagicMock(), actor_id=None, action="x", resource_type="test")
+        stats = service.get_stats()
+        await service.stop()
+
+    assert stats["dropped"] >= 2
+    assert stats["enqueued"] + stats["dropped"] == 5
+
+@pytest.mark.asyncio
+async def test_writes_inline_without_running_writer():
+    service = AuditService()
+    db = MagicMock(commit=AsyncMock())
+    await service.log_action(db, actor_id=None, action="login_fail", resource_type="auth", actor_ip="127.0.0.1")
+    db.add.assert_called_once()
+    db.commit.assert_awaited_once()
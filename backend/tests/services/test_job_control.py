@@ -0,0 +1,18 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.parsers.control import JobControlService, ControlUnavailable
+
+@pytest.mark.asyncio
+async def test_request_without_redis_raises_unavailable():
+    service = JobControlService()
+    with patch('app.services.parsers.control.cache.redis', None):
+        with pytest.raises(ControlUnavailable):
+            await service.request("job-1", "pause")
+        assert await service.get("job-1") is None
+
+@pytest.mark.asyncio
+async def test_request_records_action_with_ttl():
+    redis = MagicMock(set=AsyncMock())
+    with patch('app.services.parsers.control.cache.redis', redis):
+        await JobControlService().request("job-1", "cancel")
+    redis.set.assert_awaited_once_with("job_control:job-1", "cancel", ex=86400)
@@ -1,9 +1,15 @@
 
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from app.services.parsers.kodik import KodikParserService
 from app.schemas.anime import AnimeCreate
 from app.crud.crud_anime import anime as crud_anime
+from app.crud.crud_parser import parser_job as crud_jobs
+from app.crud.crud_release import release as crud_release
+from app.models.episode import Episode
+from app.models.release import Release
+from app.models.parser import ParserJobLog
+from sqlalchemy import func, select
 from uuid import uuid4
 
 @pytest.fixture
@@ -21,11 +27,11 @@ async def ongoing_anime(db_session):
 async def test_sync_ongoing_releases(db_session, ongoing_anime):
     service = KodikParserService()
     
-    # Mock API Response
-    mock_response = AsyncMock()
-    # Structure: seasons -> season_num -> episode_num -> [translations]
-    mock_response.json.return_value = {
+    # Feed page; structure: seasons -> season_num -> episode_num -> [translations]
+    service._fetch_list_page = AsyncMock(return_value={
         'results': [{
+            'id': '123',
+            'updated_at': '2024-06-20T10:00:00Z',
             'link': 'http://video',
             'seasons': {
                 '1': {
@@ -33,24 +39,165 @@ async def test_sync_ongoing_releases(db_session, ongoing_anime):
                     '2': [{'id': 't2', 'title': 'Voice', 'type': 'voice'}]
                 }
             }
-        }]
-    }
-    mock_response.raise_for_status = lambda: None
-    
-    service.client.post = AsyncMock(return_value=mock_response)
+        }],
+        'next_page': None
+    })
     service.api_key = "test_key" # Ensure key is set for test
 
-    # Mock Notification Service to avoid DB constraints on user/favorites during simple service test
-    with patch('app.services.parsers.kodik.notification_service.notify_users_new_episode', new_callable=AsyncMock) as mock_notify:
-        
-        await service.sync_ongoing_releases(db_session)
-        
-        # Refresh anime
-        await db_session.refresh(ongoing_anime)
-        
-        # Expect episodes updated to 2
-        assert ongoing_anime.episodes_aired == 2
-        
-        # Expect notification trigger
-        assert mock_notify.called
-        assert mock_notify.call_args[0][3] == 2 # episode number
+    # Fan-out is dispatched by the task layer; the service only reports it
+    announcements = await service.sync_ongoing_releases(db_session)
+    
+    # Refresh anime
+    await db_session.refresh(ongoing_anime)
+    
+    # Expect episodes updated to 2
+    assert ongoing_anime.episodes_aired == 2
+    
+    # Expect notification trigger
+    assert announcements == [(str(ongoing_anime.id), 2)] # episode number
+
+def _feed(updated_at, episodes, kodik_id='123'):
+    return {
+        'results': [{
+            'id': kodik_id,
+            'updated_at': updated_at,
+            'link': '//kodik.info/serial/1',
+            'seasons': {str(season): {'episodes': {str(e): f'//s{season}e{e}' for e in eps}} for season, eps in episodes.items()}
+        }],
+        'next_page': None
+    }
+
+async def _count(db, model, *filters):
+    return (await db.execute(select(func.count()).select_from(model).filter(*filters))).scalar()
+
+@pytest.mark.asyncio
+async def test_pulse_provisions_episodes_and_releases_once(db_session, ongoing_anime):
+    job = await crud_jobs.create(db_session, obj_in={"parser_name": "kodik", "job_type": "release_updates"})
+    service = KodikParserService()
+    service._fetch_list_page = AsyncMock(return_value=_feed('2024-06-20T10:00:00Z', {1: [1, 2], 2: [1]}))
+
+    first = await service.sync_ongoing_releases(db_session, str(job.id))
+    # Same feed again: the watermark stops the scan before anything is written
+    second = await service.sync_ongoing_releases(db_session, str(job.id))
+
+    episodes = Episode.anime_id == ongoing_anime.id
+    assert await _count(db_session, Episode, episodes) == 3
+    assert await _count(db_session, Release, Release.episode_id.in_(select(Episode.id).filter(episodes))) == 3
+    assert first == [(str(ongoing_anime.id), 1)] and second == []
+
+    # A newer material repeats known episodes; ON CONFLICT keeps only the new one
+    service._fetch_list_page = AsyncMock(return_value=_feed('2024-06-21T10:00:00Z', {1: [1, 2], 2: [1, 2]}))
+    third = await service.sync_ongoing_releases(db_session, str(job.id))
+
+    assert await _count(db_session, Episode, episodes) == 4
+    assert await _count(db_session, Release, Release.episode_id.in_(select(Episode.id).filter(episodes))) == 4
+    assert third == [(str(ongoing_anime.id), 2)]
+    await db_session.refresh(ongoing_anime)
+    assert ongoing_anime.episodes_aired == 4
+
+    summaries = await _count(
+        db_session, ParserJobLog, ParserJobLog.parser_job_id == job.id, ParserJobLog.message.like("Provisioning:%")
+    )
+    assert summaries == 2  # One per pulse that provisioned anything, not one per episode
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_pulse_rolls_back_only_the_failing_title(db_session, ongoing_anime):
+    other = await crud_anime.create(db_session, obj_in=AnimeCreate(
+        title="Ongoing Other", slug="ongoing-other", kodik_id="456", status="ongoing"
+    ))
+    service = KodikParserService()
+    feed = _feed('2024-06-20T10:00:00Z', {1: [1]})
+    feed['results'].append(_feed('2024-06-20T09:00:00Z', {1: [1, 2]}, kodik_id='456')['results'][0])
+    service._fetch_list_page = AsyncMock(return_value=feed)
+
+    real_create_many = crud_release.create_many
+    calls = []
+
+    async def flaky_create_many(db, rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise RuntimeError("release insert failed")
+        await real_create_many(db, rows)
+
+    with patch('app.services.parsers.kodik.crud_release.create_many', side_effect=flaky_create_many), \
+         patch('app.services.parsers.kodik.crud_settings.set_watermark', AsyncMock()) as set_watermark:
+        announcements = await service.sync_ongoing_releases(db_session)
+
+    assert await _count(db_session, Episode, Episode.anime_id == ongoing_anime.id) == 0
+    assert await _count(db_session, Episode, Episode.anime_id == other.id) == 2
+    assert announcements == [(str(other.id), 2)]
+    set_watermark.assert_not_awaited()  # The failed title is retried next pulse
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_update_feed_stops_at_watermark_and_keeps_newest_material():
+    service = KodikParserService()
+    pages = [
+        {'results': [
+            {'id': 'serial-1', 'updated_at': '2024-06-20T12:00:00Z', 'seasons': {'1': {'episodes': {'5': 'l'}}}},
+            {'id': 'serial-9', 'updated_at': '2024-06-20T11:00:00Z'},
+        ], 'next_page': 'https://kodikapi.com/list?next=abc'},
+        {'results': [
+            {'id': 'serial-1', 'updated_at': '2024-06-20T10:00:00Z', 'seasons': {'1': {'episodes': {'4': 'l'}}}},
+            {'id': 'serial-2', 'updated_at': '2024-06-19T00:00:00Z'},
+        ], 'next_page': 'https://kodikapi.com/list?next=def'},
+    ]
+    service._fetch_list_page = AsyncMock(side_effect=pages)
+
+    materials, newest, complete = await service._collect_updates({'serial-1', 'serial-2'}, '2024-06-19T23:00:00Z', 10)
+
+    assert list(materials) == ['serial-1']
+    assert materials['serial-1']['seasons']['1']['episodes'] == {'5': 'l'}
+    assert newest == '2024-06-20T12:00:00Z'
+    assert complete
+    assert service._fetch_list_page.await_count == 2
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_update_feed_reports_capped_scan_without_a_mark():
+    service = KodikParserService()
+    service._fetch_list_page = AsyncMock(return_value={
+        'results': [{'id': 'serial-9', 'updated_at': '2024-06-20T12:00:00Z'}],
+        'next_page': 'https://kodikapi.com/list?next=abc'
+    })
+
+    materials, newest, complete = await service._collect_updates({'serial-1'}, None, 2)
+
+    assert materials == {}
+    assert newest == '2024-06-20T12:00:00Z'
+    assert not complete
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_titles_missed_by_a_capped_scan_are_probed():
+    service = KodikParserService()
+    reached = MagicMock(id=uuid4(), kodik_id='serial-1', episodes_aired=5)
+    missed = MagicMock(id=uuid4(), kodik_id='serial-2', episodes_aired=5)
+    db = AsyncMock(add=MagicMock())
+    db.execute.return_value = MagicMock(scalars=lambda: MagicMock(all=lambda: [reached, missed]))
+    service._collect_updates = AsyncMock(return_value=({'serial-1': {'seasons': {}}}, '2024-06-20T12:00:00Z', False))
+    service._probe_all = AsyncMock(return_value=({}, 0))
+
+    with patch('app.services.parsers.kodik.crud_settings.get_watermark', AsyncMock(return_value=None)), \
+         patch('app.services.parsers.kodik.crud_settings.set_watermark', AsyncMock()) as set_watermark, \
+         patch('app.services.parsers.kodik.cache.invalidate', AsyncMock()):
+        await service.sync_ongoing_releases(db)
+
+    service._probe_all.assert_awaited_once_with([missed], 8)
+    set_watermark.assert_awaited_once_with(db, "kodik", {"updated_at": '2024-06-20T12:00:00Z'})
+    await service.close()
+
+def test_cdn_episodes_reads_real_season_keys():
+    material = {
+        'link': '//kodik.info/serial/1/hash/720p',
+        'seasons': {
+            '1': {'link': '//s1', 'episodes': {'1': '//s1e1', '2': '//s1e2'}},
+            '2': {'link': '//s2', 'episodes': {'1': '//s2e1'}},
+            'special': {'episodes': {'1': '//sp'}},
+        }
+    }
+    assert KodikParserService._cdn_episodes(material) == {(1, 1): '//s1e1', (1, 2): '//s1e2', (2, 1): '//s2e1'}
+
+    flat = {'seasons': {'1': {'3': [{'id': 't1'}]}}}
+    assert KodikParserService._cdn_episodes(flat) == {(1, 3): None}
@@ -0,0 +1,29 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock
+from app.services.notification_service import NotificationService
+
+@pytest.mark.asyncio
+async def test_broadcast_to_users_is_one_batched_insert():
+    user = uuid4()
+    result = MagicMock(all=MagicMock(return_value=[(user, 1)]))
+    db = MagicMock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+    report = await NotificationService().broadcast_to_users(db, [user, uuid4(), user], title="T", message="M")
+
+    # One multi-row insert plus one counter upsert, one commit
+    insert_call, counter_call = db.execute.await_args_list
+    assert len(insert_call.args[1]) == 2 and report["recipients"] == 2
+    assert "notification_counters" in str(counter_call.args[0])
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_broadcast_to_watchers_inserts_from_favorites():
+    result = MagicMock(all=MagicMock(return_value=[(uuid4(), 1) for _ in range(3)]))
+    db = MagicMock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+    report = await NotificationService().broadcast_to_watchers(db, uuid4(), title="T", message="M", type="new_episode")
+
+    db.execute.assert_awaited_once()
+    sql = str(db.execute.await_args.args[0])
+    assert "INSERT INTO notifications" in sql and "FROM favorites" in sql
+    assert "INSERT INTO notification_counters" in sql
+    assert report["recipients"] == 3
@@ -4,6 +4,7 @@ from app.services.parsers.shikimori import ShikimoriParserService
 from app.crud.crud_parser import parser_job as crud_jobs
 from app.crud.crud_anime import anime as crud_anime
 from app.models.parser import ParserJob
+from types import SimpleNamespace
 from uuid import uuid4
 
 @pytest.fixture
@@ -74,3 +75,318 @@ async def test_parser_ingestion_lifecycle(db_session, mock_shiki_node):
         assert job.status == 'completed'
         assert job.items_created == 1
         assert job.progress == 100
+
+@pytest.fixture
+def collaborators():
+    """
+    Patches everything ``_run_pipeline`` talks to besides the Shikimori API and
+    returns the mocks; by default no anime exist yet and every upsert creates.
+    """
+    target = 'app.services.parsers.shikimori'
+    mocks = SimpleNamespace(
+        existing=AsyncMock(return_value={}),
+        hashes=AsyncMock(return_value={}),
+        upsert=AsyncMock(side_effect=lambda db, rows: [MagicMock(id=uuid4(), created=True) for _ in rows]),
+        media=AsyncMock(return_value="/media/p.webp"),
+        save_checkpoint=AsyncMock(),
+        control=AsyncMock(return_value=None),
+        invalidate=AsyncMock(),
+        index=AsyncMock(),
+        record_shard=AsyncMock(),
+        publish=AsyncMock(),
+    )
+    with patch(f'{target}.crud_anime.get_many_by_shikimori_ids', mocks.existing), \
+         patch(f'{target}.crud_anime.get_content_hashes', mocks.hashes), \
+         patch(f'{target}.crud_anime.upsert_many', mocks.upsert), \
+         patch(f'{target}.media_service.process_image', mocks.media), \
+         patch(f'{target}.crud_jobs.save_checkpoint', mocks.save_checkpoint), \
+         patch(f'{target}.job_control.get', mocks.control), \
+         patch(f'{target}.cache.invalidate', mocks.invalidate), \
+         patch(f'{target}.suggest_service.index', mocks.index), \
+         patch(f'{target}.job_progress.record_shard', mocks.record_shard), \
+         patch(f'{target}.publish_job_progress', mocks.publish):
+        yield mocks
+
+def new_stats(**counts):
+    return {"proc": 0, "create": 0, "update": 0, "unchanged": 0, "fail": 0, "skip": 0, **counts}
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_detail_fetches_and_serializes_writes(mock_shiki_node, collaborators):
+    """Detail fetches run concurrently while DB writes stay on the single writer."""
+    import asyncio
+    service = ShikimoriParserService()
+    nodes = [{**mock_shiki_node, 'id': i, 'name': f'Node {i}'} for i in range(1, 21)]
+    in_flight = {"details": 0, "details_peak": 0, "writes": 0, "writes_peak": 0}
+
+    async def fetch_details(external_id):
+        in_flight["details"] += 1
+        in_flight["details_peak"] = max(in_flight["details_peak"], in_flight["details"])
+        await asyncio.sleep(0.01)
+        in_flight["details"] -= 1
+        return next(n for n in nodes if str(n['id']) == external_id)
+
+    async def upsert_many(db, rows):
+        in_flight["writes"] += 1
+        in_flight["writes_peak"] = max(in_flight["writes_peak"], in_flight["writes"])
+        await asyncio.sleep(0)
+        in_flight["writes"] -= 1
+        return [MagicMock(id=uuid4(), created=True) for _ in rows]
+
+    collaborators.upsert.side_effect = upsert_many
+    stats = new_stats()
+    config = {'async_semaphores': 5, 'localize_images': False, 'request_delay_ms': 0}
+    with patch.object(service, '_fetch_page', AsyncMock(side_effect=[nodes[:10], nodes[10:], []])), \
+         patch.object(service, 'get_full_data', side_effect=fetch_details), \
+         patch.object(service, '_add_log', AsyncMock()):
+        db = AsyncMock()
+        await service._run_pipeline(db, str(uuid4()), config, "full", 3, stats, set(), {})
+
+    assert stats["proc"] == 20 and stats["create"] == 20
+    # One write transaction per completed page, carrying its checkpoint
+    assert collaborators.upsert.call_count == 2 and db.commit.await_count == 2
+    assert in_flight["details_peak"] > 1
+    assert in_flight["writes_peak"] == 1
+
+@pytest.mark.asyncio
+async def test_unchanged_items_skip_media_localization(mock_shiki_node, collaborators):
+    service = ShikimoriParserService()
+    nodes = [{**mock_shiki_node, 'id': i, 'name': f'Node {i}'} for i in (1, 2)]
+    written = []
+
+    async def upsert_many(db, rows):
+        written.extend(rows)
+        return [MagicMock(id=uuid4(), created=True) for _ in rows]
+
+    async def run(known_hashes):
+        collaborators.hashes.return_value = known_hashes
+        collaborators.media.reset_mock()
+        stats = new_stats()
+        with patch.object(service, '_fetch_page', AsyncMock(side_effect=[nodes, []])), \
+             patch.object(service, 'get_full_data', AsyncMock(side_effect=lambda external_id: nodes[int(external_id) - 1])):
+            await service._run_pipeline(AsyncMock(), str(uuid4()), {}, "full", 5, stats, set(), {})
+        return stats
+
+    collaborators.upsert.side_effect = upsert_many
+    stats = await run({})
+    assert stats["create"] == 2 and collaborators.media.await_count == 2
+    # Stored hashes come from the source fields, not the localized poster
+    assert all(row['poster_url'] == "/media/p.webp" for row in written)
+
+    stats = await run({row['shikimori_id']: row['content_hash'] for row in written})
+    assert stats["unchanged"] == 2 and stats["create"] == 0
+    collaborators.media.assert_not_awaited()
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_forced_media_reprocess_bypasses_unchanged_skip(mock_shiki_node, collaborators):
+    service = ShikimoriParserService()
+    nodes = [{**mock_shiki_node, 'id': i, 'name': f'Node {i}'} for i in (1, 2)]
+    first = []
+
+    async def capture(db, rows):
+        first.extend(rows)
+        return [MagicMock(id=uuid4(), created=True) for _ in rows]
+
+    async def run(config):
+        stats = new_stats()
+        with patch.object(service, '_fetch_page', AsyncMock(side_effect=[nodes, []])), \
+             patch.object(service, 'get_full_data', AsyncMock(side_effect=lambda external_id: nodes[int(external_id) - 1])):
+            await service._run_pipeline(AsyncMock(), str(uuid4()), config, "full", 5, stats, set(), {})
+        return stats
+
+    collaborators.upsert.side_effect = capture
+    await run({})
+    stored = {row['shikimori_id']: row['content_hash'] for row in first}
+    collaborators.hashes.return_value = stored
+    collaborators.existing.return_value = {
+        k: MagicMock(content_hash=h, episodes_total=24, score=8.8, status='released') for k, h in stored.items()
+    }
+    collaborators.media.reset_mock()
+    collaborators.upsert.reset_mock()
+    collaborators.upsert.side_effect = lambda db, rows: []
+
+    await run({'force_reprocess_media': True})
+    assert collaborators.media.await_count == 2
+    assert len(collaborators.upsert.call_args.args[1]) == 2
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_failed_localization_leaves_title_due_for_retry(mock_shiki_node, collaborators):
+    service = ShikimoriParserService()
+    nodes = [{**mock_shiki_node, 'id': 1}]
+    written = []
+
+    async def upsert_many(db, rows):
+        written.extend(rows)
+        return [MagicMock(id=uuid4(), created=True) for _ in rows]
+
+    async def run():
+        stats = new_stats()
+        with patch.object(service, '_fetch_page', AsyncMock(side_effect=[nodes, []])), \
+             patch.object(service, 'get_full_data', AsyncMock(return_value=nodes[0])):
+            await service._run_pipeline(AsyncMock(), str(uuid4()), {}, "full", 5, stats, set(), {})
+        return stats
+
+    # process_image gives the source URL back when the download fails
+    collaborators.media.side_effect = lambda url, *args: url
+    collaborators.upsert.side_effect = upsert_many
+    await run()
+    row = written[-1]
+    assert row['poster_url'].endswith('/posters/test.jpg')
+
+    collaborators.hashes.return_value = {row['shikimori_id']: row['content_hash']}
+    collaborators.media.reset_mock()
+    collaborators.media.side_effect = None
+    stats = await run()
+    assert collaborators.media.await_count == 1 and stats["unchanged"] == 0
+    assert written[-1]['poster_url'] == "/media/p.webp"
+    assert written[-1]['content_hash'] != row['content_hash']
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_incremental_pipeline_skips_details_after_reaching_watermark(mock_shiki_node, collaborators):
+    from datetime import datetime
+    service = ShikimoriParserService()
+    nodes = {i: {**mock_shiki_node, 'id': i, 'name': f'Node {i}', 'updated_at': "2024-06-01T10:00:00.000+03:00"} for i in range(1, 6)}
+    watermark = (datetime(2024, 6, 26, 7, 0), 99)
+
+    stats = new_stats()
+    config = {'async_semaphores': 1, 'localize_images': False}
+    with patch.object(service, '_fetch_page', AsyncMock(side_effect=[list(nodes.values())])) as fetch_page, \
+         patch.object(service, 'get_full_data', AsyncMock(side_effect=lambda external_id: nodes[int(external_id)])) as details:
+        newest, stopped = await service._run_pipeline(
+            AsyncMock(), str(uuid4()), config, "incremental", 20, stats, set(), {}, watermark=watermark
+        )
+
+    # The first item is already below the mark; the rest of the page is never fetched
+    assert details.await_count == 1 and fetch_page.call_count == 1
+    assert stats["proc"] == 1 and stats["unchanged"] == 1
+    assert newest == watermark and stopped is None
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_incremental_pipeline_stops_paging_at_watermark(mock_shiki_node, collaborators):
+    from datetime import datetime
+    service = ShikimoriParserService()
+    stamp = lambda day: f"2024-06-{day:02d}T10:00:00.000+03:00"
+    nodes = {i: {**mock_shiki_node, 'id': i, 'name': f'Node {i}', 'updated_at': stamp(30 - i)} for i in range(1, 7)}
+    listing = [[nodes[1], nodes[2]], [nodes[3], nodes[4]], [nodes[5], nodes[6]]]
+    watermark = (datetime(2024, 6, 26, 7, 0), 4)  # node 4, already synced
+
+    stats = new_stats()
+    config = {'localize_images': False}
+    with patch.object(service, '_fetch_page', AsyncMock(side_effect=listing)) as fetch_page, \
+         patch.object(service, 'get_full_data', AsyncMock(side_effect=lambda external_id: nodes[int(external_id)])):
+        newest, stopped = await service._run_pipeline(
+            AsyncMock(), str(uuid4()), config, "incremental", 20, stats, set(), {}, watermark=watermark
+        )
+
+    assert fetch_page.call_count == 2
+    assert stats["create"] == 3 and stats["unchanged"] == 1
+    assert newest == (datetime(2024, 6, 29, 7, 0), 1) and stopped is None
+
+@pytest.mark.asyncio
+async def test_pipeline_checkpoints_pages_and_stops_on_pause(mock_shiki_node, collaborators):
+    import asyncio
+    service = ShikimoriParserService()
+    nodes = {i: {**mock_shiki_node, 'id': i, 'name': f'Node {i}'} for i in range(1, 25)}
+    listing = [[nodes[i], nodes[i + 1]] for i in range(5, 25, 2)]
+    polls = iter([None])
+
+    async def fetch_details(external_id):
+        await asyncio.sleep(0.02)
+        return nodes[int(external_id)]
+
+    async def control(job_id):
+        await asyncio.sleep(0.01)
+        return next(polls, "pause")
+
+    collaborators.control.side_effect = control
+    stats = new_stats(proc=4, create=4)
+    config = {'localize_images': False, 'pipeline_queue_size': 1}
+    with patch.object(service, '_fetch_page', AsyncMock(side_effect=listing)) as fetch_page, \
+         patch.object(service, 'get_full_data', side_effect=fetch_details), \
+         patch('app.services.parsers.shikimori.CONTROL_POLL_SECONDS', 0):
+        # Resuming after pages 1-2
+        newest, stopped = await service._run_pipeline(
+            AsyncMock(), str(uuid4()), config, "full", 12, stats, set(), {}, start_page=3
+        )
+
+    assert stopped == "pause" and newest is None
+    assert fetch_page.call_args_list[0].args[0]['page'] == 3
+    assert fetch_page.call_count < len(listing)
+    checkpoints = [c.args[2] for c in collaborators.save_checkpoint.call_args_list]
+    assert [c["page"] for c in checkpoints] == list(range(3, 3 + len(checkpoints)))
+    assert checkpoints[0]["stats"]["create"] == 6
+
+@pytest.mark.asyncio
+async def test_shard_publishes_progress_aggregated_over_the_whole_job(mock_shiki_node, collaborators):
+    service = ShikimoriParserService()
+    nodes = [{**mock_shiki_node, 'id': i, 'name': f'Node {i}'} for i in range(1, 5)]
+    job_id = str(uuid4())
+    collaborators.record_shard.side_effect = [(6, {"proc": 12}), (7, {"proc": 14})]
+    with patch.object(service, '_fetch_page', AsyncMock(side_effect=[nodes[:2], nodes[2:]])), \
+         patch.object(service, 'get_full_data', AsyncMock(side_effect=lambda external_id: nodes[int(external_id) - 1])):
+        # Shard 1 owns pages 3-4 of a 10-page job
+        await service._run_pipeline(
+            AsyncMock(), job_id, {'localize_images': False}, "full", 4, new_stats(), set(), {},
+            start_page=3, range_start=3, shard=1, total_pages=10
+        )
+
+    assert [c.args[2] for c in collaborators.record_shard.call_args_list] == [1, 2]
+    assert [c.args for c in collaborators.publish.call_args_list] == [(job_id, 60, {"proc": 12}), (job_id, 70, {"proc": 14})]
+    await service.close()
+
+def test_full_sync_shard_plan_covers_every_page_once():
+    plan = ShikimoriParserService.plan_shards(50, 4)
+    assert plan == [(1, 13), (14, 26), (27, 38), (39, 50)]
+    assert ShikimoriParserService.plan_shards(3, 8) == [(1, 1), (2, 2), (3, 3)]
+
+@pytest.mark.asyncio
+async def test_finalize_shards_aggregates_stats_and_keeps_pause():
+    job = MagicMock(id=uuid4(), progress=40, started_at=None)
+    results = [
+        {"shard": 0, "stats": {"proc": 10, "create": 4, "update": 6}, "stopped": None, "error": None},
+        {"shard": 1, "stats": {"proc": 5, "create": 5, "fail": 1}, "stopped": "pause", "error": None},
+    ]
+    service = ShikimoriParserService()
+    with patch('app.services.parsers.shikimori.crud_jobs.get', AsyncMock(return_value=job)), \
+         patch('app.services.parsers.shikimori.crud_jobs.update', AsyncMock()) as update, \
+         patch('app.services.parsers.shikimori.job_control.clear', AsyncMock()), \
+         patch('app.services.parsers.shikimori.publish_job_progress', AsyncMock()):
+        await service.finalize_shards(AsyncMock(add=MagicMock()), str(job.id), results)
+
+    fields = update.call_args.kwargs["obj_in"]
+    assert fields["status"] == "paused"
+    assert fields["items_processed"] == 15
+    assert fields["items_created"] == 9
+    assert fields["items_failed"] == 1
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_full_sync_plan_records_dispatch_and_ignores_redelivery():
+    from app.tasks.parsers import _plan_full_sync
+    job = MagicMock(status="pending", checkpoint=None, started_at=None)
+    session = MagicMock(__aenter__=AsyncMock(return_value=AsyncMock()), __aexit__=AsyncMock(return_value=False))
+    config = ({'deep_sync_pages': 10, 'sync_shards': 2}, None)
+
+    async def update(db, db_obj, obj_in):
+        for field, value in obj_in.items():
+            setattr(db_obj, field, value)
+
+    with patch('app.tasks.parsers.AsyncSessionLocal', return_value=session), \
+         patch('app.tasks.parsers.parser_job.get', AsyncMock(return_value=job)), \
+         patch('app.tasks.parsers.parser_job.update', side_effect=update), \
+         patch('app.tasks.parsers._load_config', AsyncMock(return_value=config)):
+        assert await _plan_full_sync(str(uuid4()), "chord-1") == [[1, 5], [6, 10]]
+        assert job.status == "running" and job.checkpoint["dispatch"] == "chord-1"
+        # Redelivered before the ack: the chord is already out
+        assert await _plan_full_sync(str(uuid4()), "chord-2") is None
+        assert job.checkpoint["dispatch"] == "chord-1"
+
+def test_redelivered_full_sync_does_not_dispatch_a_second_chord():
+    from app.tasks.parsers import run_full_sync_task
+    with patch('app.tasks.parsers.run_async', side_effect=lambda coro: coro.close()), \
+         patch('app.tasks.parsers.chord') as dispatch:
+        run_full_sync_task.run(str(uuid4()))
+    dispatch.assert_not_called()
@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.suggest_service import SuggestService, normalize, prefixes, MAX_PREFIX_LEN
+
+def test_normalize_folds_case_and_yo():
+    assert normalize("Ёжик  в Тумане!") == "ежик в тумане"
+    assert normalize(None) == ""
+
+def test_prefixes_cover_every_word_start():
+    result = prefixes(["атака титанов"])
+    assert {"а", "ата", "атака", "атака т", "т", "тит", "титанов"} <= result
+    assert all(len(p) <= MAX_PREFIX_LEN for p in prefixes(["a" * 40]))
+
+@pytest.mark.asyncio
+async def test_suggest_reads_prefix_key_and_documents():
+    redis = AsyncMock()
+    redis.zrevrange.return_value = [b"1"]
+    redis.hmget.return_value = [b'{"id": "1", "slug": "aot", "title": "AoT", "poster_url": null, "names": ["aot"]}']
+    service = SuggestService()
+    with patch.object(SuggestService, "redis", redis):
+        result = await service.suggest(None, "AO", limit=5)
+
+    redis.zrevrange.assert_awaited_once_with("suggest:p:ao", 0, 4)
+    assert result == [{"id": "1", "slug": "aot", "title": "AoT", "poster_url": None}]
+
+@pytest.mark.asyncio
+async def test_suggest_falls_back_to_db_when_redis_fails():
+    redis = AsyncMock()
+    redis.zrevrange.side_effect = ConnectionError("redis down")
+    service = SuggestService()
+    rows = [{"id": "1", "slug": "aot", "title": "AoT", "poster_url": None}]
+    with patch.object(SuggestService, "redis", redis), \
+         patch.object(SuggestService, "_suggest_from_db", AsyncMock(return_value=rows)) as from_db:
+        assert await service.suggest(None, "ao", limit=5) == rows
+    from_db.assert_awaited_once_with(None, "ao", 5)
+
+@pytest.mark.asyncio
+async def test_index_writes_do_not_raise_when_redis_fails():
+    from types import SimpleNamespace
+    redis = AsyncMock()
+    redis.hmget.side_effect = ConnectionError("redis down")
+    anime = SimpleNamespace(
+        id=1, slug="aot", title="AoT", title_en=None, title_romaji=None, synonyms=None,
+        poster_url=None, views_count=0, score_count=0
+    )
+    service = SuggestService()
+    with patch.object(SuggestService, "redis", redis):
+        await service.index(anime)
+        await service.remove(1)
+    assert redis.hmget.await_count == 2